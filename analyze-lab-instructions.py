@@ -1,27 +1,37 @@
 """
 Script to analyze and update lab instructions for non-Cloud Slice courses.
 Removes Azure Portal and resource creation tasks from courses without requiresAzurePortal flag.
+
+Use --stream to read lab-instructions.ts one course block at a time (bounded memory).
 """
 
 import re
 import json
+import argparse
+
+from labtools import AZURE_KEYWORDS, MOCK_DATA_PATH, BlockIndex, course_entries
+from labtools.courses import CourseCatalog
+from labtools.fileio import read_text, write_text
+from labtools.keywords import KeywordIndex
+from labtools.stream import StreamBlock, iter_segments, segment_text
+
+parser = argparse.ArgumentParser(description="Analyze which courses need Azure tasks removed")
+parser.add_argument('--stream', action='store_true',
+                    help="stream lab-instructions.ts one course block at a time (bounded memory)")
+args = parser.parse_args()
 
 # Step 1: Read mock-data.ts to get courses with and without Cloud Slice
 print("Step 1: Analyzing courses...")
-with open('src/lib/mock-data.ts', 'r', encoding='utf-8') as f:
-    mock_data = f.read()
+catalog = CourseCatalog(read_text(MOCK_DATA_PATH))
 
 # Find all courses with requiresAzurePortal: true
-cloud_slice_courses = set()
-pattern = r"id:\s*'([^']+)'[^}]*requiresAzurePortal:\s*true"
-matches = re.findall(pattern, mock_data, re.DOTALL)
-cloud_slice_courses.update(matches)
+cloud_slice_courses = set(catalog.cloud_slice_ids())
 
 print(f"Found {len(cloud_slice_courses)} courses WITH Cloud Slice (keep Azure tasks)")
 print("Sample:", list(cloud_slice_courses)[:5])
 
 # Find all courses
-all_courses = set(re.findall(r"id:\s*'([^']+)'", mock_data))
+all_courses = set(catalog.by_id)
 non_cloud_slice_courses = all_courses - cloud_slice_courses
 
 print(f"\nFound {len(non_cloud_slice_courses)} courses WITHOUT Cloud Slice (remove Azure tasks)")
@@ -29,13 +39,28 @@ print("Sample:", list(non_cloud_slice_courses)[:5])
 
 # Step 2: Read lab-instructions.ts
 print("\nStep 2: Reading lab instructions...")
-with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
-    lab_instructions = f.read()
+keyword_counts = dict.fromkeys(AZURE_KEYWORDS, 0)
+if args.stream:
+    # Collect course ids and keyword counts block by block
+    courses_with_instructions = set()
+    with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
+        for segment in iter_segments(f):
+            if isinstance(segment, StreamBlock):
+                courses_with_instructions.add(segment.course_id)
+            text = segment_text(segment)
+            for keyword in AZURE_KEYWORDS:
+                keyword_counts[keyword] += len(re.findall(keyword, text, re.IGNORECASE))
+else:
+    lab_instructions = read_text('src/data/lab-instructions.ts')
+    lab_index = BlockIndex(lab_instructions, with_comments=False)
+    courses_with_instructions = {course_id for course_id, _ in course_entries(lab_index.instructions)}
+    # Keyword counts come from the keyword index cached next to the file
+    keyword_index = KeywordIndex.cached('src/data/lab-instructions.ts', text=lab_instructions, block_index=lab_index)
+    for keyword in AZURE_KEYWORDS:
+        keyword_counts[keyword] = keyword_index.count(keyword)
 
 # Step 3: Find which courses have lab instructions
 print("\nStep 3: Finding courses with lab instructions...")
-course_id_pattern = r"courseId:\s*'([^']+)'"
-courses_with_instructions = set(re.findall(course_id_pattern, lab_instructions))
 
 print(f"Found {len(courses_with_instructions)} courses with lab instructions")
 print("Courses:", sorted(courses_with_instructions))
@@ -52,19 +77,7 @@ else:
 
 # Step 5: Check for Azure Portal references
 print("\nStep 5: Checking for Azure Portal references...")
-azure_keywords = [
-    'Azure Portal',
-    'portal.azure.com',
-    'Cloud Shell',
-    'Create resource',
-    'Resource Group',
-    'App Service',
-    'Virtual Network',
-    'Storage Account'
-]
-
-for keyword in azure_keywords:
-    count = len(re.findall(keyword, lab_instructions, re.IGNORECASE))
+for keyword, count in keyword_counts.items():
     if count > 0:
         print(f"  '{keyword}': {count} occurrences")
 
@@ -84,7 +97,6 @@ report = {
     "non_cloud_with_instructions": sorted(non_cloud_with_instructions)
 }
 
-with open('lab-instructions-analysis.json', 'w') as f:
-    json.dump(report, f, indent=2)
+write_text('lab-instructions-analysis.json', json.dumps(report, indent=2))
 
 print("\n✅ Analysis complete! Report saved to lab-instructions-analysis.json")
@@ -0,0 +1,232 @@
+"""
+Benchmark the lab-maintenance tooling on synthetic catalogs.
+
+Generates `lab-instructions.ts` / `mock-data.ts` pairs of increasing size and
+times the analyze, clean, replace and verify phases separately, recording
+the best wall time and the peak traced memory of each phase. Results can be
+saved as a baseline and later runs fail (exit code 1) when a phase gets
+slower or bigger than the baseline by more than --threshold.
+
+    python benchmark-lab-tools.py --sizes 10,100,1000 --save-baseline
+    python benchmark-lab-tools.py --sizes 10,100,1000          # compare
+    python benchmark-lab-tools.py --generate /tmp/catalog --courses 500
+
+--profile-scaling runs every phase once per size under the rule profiler and
+fails when a rule's cost grows faster than linearly with its input size.
+
+    python benchmark-lab-tools.py --sizes 50,200,800 --profile-scaling
+"""
+
+import re
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from labtools import (
+    profile,
+    AZURE_KEYWORDS,
+    BlockIndex,
+    BlockEditor,
+    parse_lab_instructions,
+    parse_mock_courses,
+    course_entries,
+    course_ids,
+    cloud_slice_course_ids,
+)
+from labtools.clean import CLEAN_RULES, clean_course_section, count_references
+from labtools.synth import generate_catalog, write_catalog
+
+DEFAULT_BASELINE = 'benchmark-baseline.json'
+
+# Ignore time differences below this many seconds; they are timer noise.
+TIME_NOISE_FLOOR = 0.005
+# Ignore memory differences below this many bytes.
+MEMORY_NOISE_FLOOR = 256 * 1024
+
+
+def phase_analyze(lab, mock):
+    courses = parse_mock_courses(mock)
+    cloud_slice = set(cloud_slice_course_ids(courses))
+    non_cloud = set(course_ids(courses)) - cloud_slice
+    with_instructions = {course_id for course_id, _ in course_entries(parse_lab_instructions(lab))}
+    for keyword in AZURE_KEYWORDS:
+        len(profile.findall(keyword, lab, re.IGNORECASE))
+    return with_instructions & non_cloud
+
+
+def phase_clean(lab, non_cloud):
+    index = BlockIndex(lab)
+    editor = BlockEditor(index)
+    for course_id in non_cloud:
+        if course_id in index:
+            editor.replace_block(course_id, clean_course_section(index.block(course_id)))
+    return editor.render()
+
+
+def phase_replace(content, non_cloud):
+    editor = BlockEditor(BlockIndex(content))
+    CLEAN_RULES.apply(editor, non_cloud)
+    return editor.render()
+
+
+def phase_verify(content):
+    counts = count_references(content)
+    index = BlockIndex(content, with_comments=False)
+    for course_id in index:
+        len(profile.findall(r'Azure Portal', index.block(course_id), re.IGNORECASE))
+    return counts
+
+
+def run_phases(lab, mock):
+    """Return ``[(phase, callable)]`` with each phase bound to its real input."""
+    non_cloud = phase_analyze(lab, mock)
+    cleaned = phase_clean(lab, non_cloud)
+    replaced = phase_replace(cleaned, non_cloud)
+    return [
+        ('analyze', lambda: phase_analyze(lab, mock)),
+        ('clean', lambda: phase_clean(lab, non_cloud)),
+        ('replace', lambda: phase_replace(cleaned, non_cloud)),
+        ('verify', lambda: phase_verify(replaced)),
+    ]
+
+
+def measure(func, repeat):
+    """Best wall time over *repeat* runs, then peak memory of one traced run."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def profile_scaling(sizes, seed, max_exponent):
+    """Profile every phase once per size and fit each rule's cost exponent."""
+    reports = {}
+    for size in sizes:
+        lab, mock = generate_catalog(size, seed)
+        with profile.Profiler() as profiler:
+            for _, func in run_phases(lab, mock):
+                func()
+        reports[str(size)] = profiler.report()
+    return reports, profile.scaling_report(reports, max_exponent)
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions against *baseline*."""
+    regressions = []
+    for size, phases in results.items():
+        for phase, current in phases.items():
+            previous = baseline.get(size, {}).get(phase)
+            if previous is None:
+                continue
+            for metric, floor in (('seconds', TIME_NOISE_FLOOR), ('peak_bytes', MEMORY_NOISE_FLOOR)):
+                limit = previous[metric] * (1 + threshold)
+                if current[metric] > limit and current[metric] - previous[metric] > floor:
+                    regressions.append(
+                        f"{phase} @ {size} courses: {metric} {current[metric]:.4g} "
+                        f"> {previous[metric]:.4g} (+{threshold:.0%} allowed)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lab-maintenance tooling on synthetic catalogs")
+    parser.add_argument('--sizes', default='10,100,1000',
+                        help="comma-separated catalog sizes in courses (default: 10,100,1000)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per phase; the best is kept")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic catalogs")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative regression before failing (default: 0.25)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results to PATH")
+    parser.add_argument('--generate', metavar='DIR', help="only write a synthetic catalog into DIR and exit")
+    parser.add_argument('--courses', type=int, default=100, help="catalog size for --generate")
+    parser.add_argument('--profile-scaling', action='store_true',
+                        help="profile rules across --sizes and fail on super-linear ones")
+    parser.add_argument('--max-exponent', type=float, default=1.25,
+                        help="largest allowed cost exponent for --profile-scaling (default: 1.25)")
+    args = parser.parse_args()
+
+    if args.generate:
+        for path in write_catalog(args.generate, args.courses, args.seed):
+            print(f"✅ Wrote {path}")
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    if args.profile_scaling:
+        reports, scaling = profile_scaling(sizes, args.seed, args.max_exponent)
+        print("="*70)
+        print("RULE SCALING PROFILE")
+        print("="*70)
+        print(f"\n{'exponent':>8}  rule")
+        for row in scaling:
+            flag = '❌' if row['super_linear'] else '  '
+            print(f"{row['exponent']:>8.2f} {flag} {row['rule'][:90]}")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'profiles': reports, 'scaling': scaling}, f, indent=2)
+        flagged = [row for row in scaling if row['super_linear']]
+        if flagged:
+            print(f"\n❌ {len(flagged)} rule(s) scale worse than n^{args.max_exponent}")
+            return 1
+        print(f"\n✅ All rules scale at most n^{args.max_exponent}")
+        return 0
+
+    results = {}
+
+    print("="*70)
+    print("LAB TOOLING BENCHMARK")
+    print("="*70)
+    print(f"\n{'courses':>8} {'size':>9} {'phase':>8} {'seconds':>10} {'peak MB':>9}")
+    for size in sizes:
+        lab, mock = generate_catalog(size, args.seed)
+        results[str(size)] = {}
+        for phase, func in run_phases(lab, mock):
+            seconds, peak = measure(func, args.repeat)
+            results[str(size)][phase] = {'seconds': seconds, 'peak_bytes': peak}
+            print(f"{size:>8} {len(lab) / 1e6:>7.2f}MB {phase:>8} {seconds:>10.4f} {peak / 1e6:>9.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
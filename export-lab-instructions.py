@@ -0,0 +1,41 @@
+"""
+Export LAB_INSTRUCTIONS as one JSON shard per course plus a manifest, so the
+lab UI can load a single course's instructions on demand:
+
+    public/lab-instructions/manifest.json       ids, titles, hashes and sizes
+    public/lab-instructions/<courseId>.json     one LabInstruction each
+
+Only shards whose content changed are rewritten.
+
+    python export-lab-instructions.py
+    python export-lab-instructions.py --input src/data/lab-instructions.ts --output-dir /tmp/shards
+"""
+
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH, parse_lab_instructions
+from labtools.fileio import read_text
+from labtools.shards import DEFAULT_SHARD_DIR, MANIFEST_NAME, export_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the lab instructions as per-course JSON shards")
+    parser.add_argument('--input', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions to export (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--output-dir', default=DEFAULT_SHARD_DIR,
+                        help=f"directory for the shards and {MANIFEST_NAME} (default: {DEFAULT_SHARD_DIR})")
+    parser.add_argument('--force', action='store_true', help="rewrite every shard")
+    args = parser.parse_args()
+
+    instructions = parse_lab_instructions(read_text(args.input))
+    written, unchanged, removed = export_shards(instructions, args.output_dir, args.input, args.force)
+
+    print(f"📦 Exported {len(written) + len(unchanged)} courses from {args.input} to {args.output_dir}/")
+    print(f"  - written: {len(written)}")
+    print(f"  - unchanged: {len(unchanged)}")
+    if removed:
+        print(f"  - removed: {', '.join(removed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Export the lab catalog as batched NDJSON for bulk database seeding.
+
+Each course of LAB_INSTRUCTIONS becomes one Lab document (see src/models/Lab.ts)
+with its course metadata from MOCK_COURSES. The documents are written to
+seed/labs/batch-00001.ndjson, ... with a stable _id per course, so every batch
+can be loaded with one call:
+
+    mongoimport --uri "$MONGODB_URI" --collection labs --mode upsert --file seed/labs/batch-00001.ndjson
+
+or with insertMany() after EJSON.parse() of each line (the _id is Extended JSON,
+which JSON.parse() would leave a plain object). --delta exports only
+courses that were added or changed since the last export and lists removed
+courses in seed/labs/deleted.json; load each export before running the next.
+
+    python export-lab-seed.py
+    python export-lab-seed.py --delta --batch-size 500
+"""
+
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH, MOCK_DATA_PATH
+from labtools.courses import CourseCatalog
+from labtools.fileio import read_text
+from labtools.seed import DEFAULT_SEED_DIR, DELETED_NAME, export_seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the lab catalog as NDJSON batches for seeding")
+    parser.add_argument('--input', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions to export (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--mock-data', default=MOCK_DATA_PATH,
+                        help=f"mock course data for titles, codes and prices (default: {MOCK_DATA_PATH})")
+    parser.add_argument('--output-dir', default=DEFAULT_SEED_DIR,
+                        help=f"directory for the batch files (default: {DEFAULT_SEED_DIR})")
+    parser.add_argument('--batch-size', type=int, default=1000, metavar='N',
+                        help="documents per batch file (default: 1000)")
+    parser.add_argument('--delta', action='store_true',
+                        help="only export courses added or changed since the last export")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    catalog = CourseCatalog(read_text(args.mock_data))
+    result = export_seed(args.input, args.output_dir, catalog, args.batch_size, args.delta)
+
+    mode = "changed" if args.delta else "all"
+    print(f"📦 Exported {len(result['exported'])} courses ({mode}) in {len(result['files'])} batch file(s)"
+          f" to {args.output_dir}/")
+    if args.delta:
+        print(f"  - unchanged, skipped: {len(result['unchanged'])}")
+    if result['deleted']:
+        print(f"  - removed since the last export: {', '.join(result['deleted'])}"
+              f" (ids in {args.output_dir}/{DELETED_NAME})")
+    missing = [course_id for course_id in result['exported'] if course_id not in catalog]
+    if missing:
+        print(f"⚠️  {len(missing)} courses are not in {args.mock_data}; they get the default code, topic and price: "
+              f"{', '.join(missing[:8])}{' ...' if len(missing) > 8 else ''}")
+    for path in result['files']:
+        print(f"  mongoimport --collection labs --mode upsert --file {path}")
+
+
+if __name__ == '__main__':
+    main()
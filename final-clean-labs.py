@@ -1,211 +1,333 @@
 """
 FINAL COMPREHENSIVE SCRIPT - Remove ALL Azure Portal tasks from non-Cloud Slice courses
 This will completely clean Windows Server 2025 and all other non-Cloud Slice courses.
+
+The run starts from the original lab instructions: the newest snapshot
+update-lab-instructions.py took before it edited the file, read back from
+.lab-snapshots.sqlite (--from-snapshot N for another generation, --input PATH
+to read a file instead). A checkout with no snapshot store yet starts one from
+src/data/lab-instructions.ts.backup, the unedited copy older runs left behind.
+
+The replacements after the per-course pass are the rule files in
+lab-rules/final-clean-labs/, each applied only to the course blocks in its scope
+(VM-only, Cloud Slice, a course family or listed courses).
+
+Use --stream to process the file one course block at a time with bounded memory,
+or --jobs N to clean course blocks on N worker processes. --profile PATH writes
+per-rule timings, match counts and scanned bytes (overall and per course) as JSON.
+
+Cleaned course blocks are cached in .lab-clean-cache.sqlite keyed by block hash,
+rule-set hash and classification, so a rerun only cleans blocks that changed
+(--no-cache to disable). Every mode cleans each segment the same way, through
+labtools.clean.clean_segments(), so they all write the same file.
+
+--dry-run writes nothing and instead reports every change the run would make,
+per course, task and instruction step, with the rule that made it and the
+text before and after, and the syntax check of the result; it exits 1 if the
+check fails, like a real run (--dry-run-json PATH saves the changes and the
+problems as JSON).
+
+Before anything is written, the course blocks the run changed (and only
+those) are re-parsed and checked against the LabInstruction shape; a run
+that would leave broken TypeScript reports the course, task and step it
+broke and writes nothing (--no-verify writes it anyway).
+
+The written file is snapshotted into .lab-snapshots.sqlite (--no-snapshot to
+skip); only the course blocks the run changed are stored, and lab-snapshots.py
+restores any course or the whole file to an earlier generation.
 """
 
 import re
+import sys
 import json
+import time
+import argparse
+import contextlib
+
+from labtools import BlockIndex, profile
+from labtools.clean import CLEAN_RULES, clean_segments, count_references
+from labtools.cache import DEFAULT_CACHE_PATH, CleanCache
+from labtools.dryrun import dry_run, format_changes
+from labtools.fileio import write_text
+from labtools.keywords import KeywordIndex
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, SnapshotStore, open_original
+from labtools.stream import StreamBlock, iter_segments, segment_text, stream_rewrite
+from labtools.syntax import SyntaxCheckError, check_segment, edit_list, report_problems, verify_or_exit
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove Azure Portal tasks from non-Cloud Slice courses")
+    parser.add_argument('--stream', action='store_true',
+                        help="stream lab-instructions.ts one course block at a time (bounded memory)")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help="clean course blocks on N worker processes")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write a per-rule regex profile to PATH (JSON); disables the cache")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, metavar='PATH',
+                        help=f"cleaned-block cache (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="clean every block without the cache")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="write nothing; report the changes per course, task and step")
+    parser.add_argument('--dry-run-json', metavar='PATH', help="with --dry-run, also save the changes and problems as JSON")
+    parser.add_argument('--no-verify', action='store_true',
+                        help="write the output even if the syntax check of the changed blocks fails")
+    parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                        help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument('--no-snapshot', action='store_true', help="take no snapshot of the written file")
+    parser.add_argument('--from-snapshot', type=int, metavar='N',
+                        help="start from snapshot N, or the N-th newest for -N (default: the newest original "
+                             "taken by update-lab-instructions.py)")
+    parser.add_argument('--input', metavar='PATH', help="start from this file instead of a snapshot")
+    args = parser.parse_args()
+    if args.dry_run_json and not args.dry_run:
+        parser.error("--dry-run-json requires --dry-run")
+    if args.input and args.from_snapshot is not None:
+        parser.error("--input cannot be combined with --from-snapshot")
+    if not args.input:
+        # Pin the generation now, so a missing store or snapshot fails before any work
+        try:
+            with open_original(args.snapshots, args.from_snapshot) as (snapshot, _):
+                args.from_snapshot = snapshot.id
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            sys.exit(1)
+    if args.dry_run:
+        report_dry_run(args)
+        return
+    if args.stream and args.jobs > 1:
+        parser.error("--jobs cannot be combined with --stream")
+    if args.profile and args.jobs > 1:
+        parser.error("--profile cannot be combined with --jobs")
+
+    try:
+        if args.profile:
+            with profile.Profiler() as profiler:
+                run(args)
+            profiler.dump(args.profile)
+            print(f"\n📈 Rule profile saved to {args.profile}")
+        else:
+            run(args)
+    except SyntaxCheckError as e:
+        # Raised by the streamed check, which abandons the output mid-file
+        report_problems(e.problems)
+
+
+@contextlib.contextmanager
+def open_input(args):
+    """Open the text the run starts from (see the module docstring) as a read() stream."""
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            print(f"✅ Reading {args.input}\n")
+            yield f
+        return
+    with open_original(args.snapshots, args.from_snapshot) as (snapshot, stream):
+        print(f"✅ Reading snapshot #{snapshot.id} ({snapshot.label}, {snapshot.taken_at})\n")
+        yield stream
+
+
+def report_dry_run(args):
+    with open('lab-instructions-analysis.json', 'r') as f:
+        report = json.load(f)
+    non_cloud_courses = set(report['non_cloud_with_instructions'])
+
+    with open_input(args) as f:
+        content = f.read()
+    changes, problems = dry_run(content, non_cloud_courses)
+
+    print("="*70)
+    print("DRY RUN: changes the cleaning run would make (nothing is written)")
+    print("="*70 + "\n")
+    for line in format_changes(changes, problems=problems):
+        print(line)
+
+    by_rule = {}
+    for change in changes:
+        by_rule[change.rule] = by_rule.get(change.rule, 0) + 1
+    courses = {change.course_id for change in changes if change.course_id is not None}
+    print(f"\n📊 {len(changes)} changes in {len(courses)} courses:")
+    for rule, count in sorted(by_rule.items(), key=lambda item: -item[1]):
+        print(f"  - {rule[:50]}: {count}")
+
+    if problems:
+        print(f"\n❌ Syntax check found {len(problems)} problem(s): the real run would write nothing "
+              f"(--no-verify writes anyway)")
+    else:
+        print(f"\n🔎 Syntax check of the changed blocks passed")
+
+    if args.dry_run_json:
+        write_text(args.dry_run_json, json.dumps({
+            'changes': [change.to_dict() for change in changes],
+            'problems': [problem.to_dict() for problem in problems],
+        }, indent=2))
+        print(f"\n✅ Dry-run report saved to {args.dry_run_json}")
+    if problems and not args.no_verify:
+        sys.exit(1)
+
+
+def run(args):
+
+    # Load analysis report
+    with open('lab-instructions-analysis.json', 'r') as f:
+        report = json.load(f)
+
+    non_cloud_courses = set(report['non_cloud_with_instructions'])
+    cloud_courses = set(report['cloud_slice_courses'])
 
-# Load analysis report
-with open('lab-instructions-analysis.json', 'r') as f:
-    report = json.load(f)
-
-non_cloud_courses = set(report['non_cloud_with_instructions'])
-cloud_courses = set(report['cloud_slice_courses'])
-
-print("="*70)
-print("FINAL COMPREHENSIVE AZURE TASK REMOVAL")
-print("="*70)
-print(f"\n📋 Processing {len(non_cloud_courses)} non-Cloud Slice courses")
-print(f"✅ Keeping Azure tasks in {len(cloud_courses)} Cloud Slice courses\n")
-
-# Read from backup
-with open('src/data/lab-instructions.ts.backup', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-print("✅ Loaded original backup file\n")
-
-# For each non-Cloud Slice course, completely rewrite Azure-heavy sections
-courses_to_clean = {
-    'ws011wv-2025': {
-        'new_objectives': [
-            'Configure Windows Server 2025 core services',
-            'Set up Windows Admin Center',
-            'Implement Hotpatching',
-            'Configure server roles and features'
-        ],
-        'new_prerequisites': [
-            'Basic knowledge of Windows Server administration',
-            'RDP client installed'
-        ],
-        'remove_tasks_with': ['Azure', 'portal', 'Cloud', 'Arc', 'resource group']
-    }
-}
-
-# Strategy: For each non-Cloud Slice course, remove Azure-specific content
-def clean_course_section(content, course_id):
-    """Remove Azure content from a specific course section"""
-    
-    # Find the course block - more flexible pattern
-    pattern = f"'{course_id}':\\s*{{(.*?)(?=\\n\\s*'[a-z0-9-]+':\\s*{{|\\n}};)"
-    match = re.search(pattern, content, re.DOTALL)
-    
-    if not match:
-        return content, False
-    
-    course_block = match.group(0)
-    original_block = course_block
-    
-    # Remove Azure-specific content
-    # 1. Remove Azure from objectives
-    course_block = re.sub(
-        r"'Deploy.*?Azure.*?',?\n",
-        "",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    course_block = re.sub(
-        r"'.*?Azure Arc.*?',?\n",
-        "",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    # 2. Remove Azure from prerequisites
-    course_block = re.sub(
-        r"'Access to Azure Portal'",
-        "'RDP access to the lab VM'",
-        course_block
-    )
-    
-    # 3. Remove Azure from description
-    course_block = re.sub(
-        r"set up hybrid management with Azure Arc",
-        "configure local server management",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    # 4. Remove entire tasks that are Azure-specific
-    # Remove tasks with Azure Portal in action
-    course_block = re.sub(
-        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Azure Portal[^']*'\s*\},?\n?",
-        "",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    course_block = re.sub(
-        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Create.*?Azure[^']*'\s*\},?\n?",
-        "",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    course_block = re.sub(
-        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Cloud Shell[^']*'\s*\},?\n?",
-        "",
-        course_block,
-        flags=re.IGNORECASE
-    )
-    
-    # 5. Clean up comments
-    course_block = re.sub(
-        r"/\*\*\n\s*\*.*?Azure Portal Access.*?\n\s*\*/\n",
-        "/**\n     * VM-ONLY LAB: No Azure Portal access required\n     */\n",
-        course_block,
-        flags=re.DOTALL
-    )
-    
-    # 6. Clean up trailing commas
-    course_block = re.sub(r',\s*,', ',', course_block)
-    course_block = re.sub(r',\s*\]', ']', course_block)
-    course_block = re.sub(r',\s*\}', '}', course_block)
-    
-    # Replace in content
-    if course_block != original_block:
-        content = content.replace(original_block, course_block)
-        return content, True
-    
-    return content, False
-
-# Process all non-Cloud Slice courses
-print("🔧 Cleaning courses:\n")
-updated_count = 0
-
-for course_id in sorted(non_cloud_courses):
-    content, updated = clean_course_section(content, course_id)
-    if updated:
-        updated_count += 1
-        print(f"  ✅ {course_id}")
-
-print(f"\n✅ Updated {updated_count} courses\n")
-
-# Global text replacements for any remaining references
-print("🔧 Applying global replacements...\n")
-
-replacements = [
-    # Azure Portal
-    (r'Open the Azure Portal and search for', 'On the VM, open Server Manager and navigate to'),
-    (r'Open Azure Portal', 'Connect to the VM using RDP'),
-    (r'In the Azure Portal,?\s*', 'In the VM, '),
-    (r'Navigate to the Azure Portal', 'Open Server Manager'),
-    (r'portal\.azure\.com', 'the VM desktop'),
-    
-    # Cloud Shell
-    (r'Open Cloud Shell', 'Open PowerShell'),
-    (r'In Cloud Shell,?\s*', 'In PowerShell, '),
-    (r'Cloud Shell', 'PowerShell'),
-    
-    # Resource creation
-    (r'Create a resource group', 'Use the pre-configured environment'),
-    (r'Create.*?Azure.*?virtual machine', 'Use the provided VM'),
-    (r'Deploy.*?to Azure', 'Configure on the local VM'),
-    
-    # Azure Arc
-    (r'Onboard.*?to Azure Arc', 'Configure local management tools'),
-    (r'Azure Arc', 'local management'),
-    
-    # General Azure references
-    (r'in Azure', 'on the VM'),
-    (r'Azure resource', 'VM resource'),
-]
-
-for pattern, replacement in replacements:
-    before_count = len(re.findall(pattern, content, re.IGNORECASE))
-    if before_count > 0:
-        content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
-        print(f"  Replaced '{pattern[:40]}...' ({before_count} times)")
-
-# Write the cleaned content
-with open('src/data/lab-instructions.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
-
-print("\n" + "="*70)
-print("✅ TASK COMPLETE!")
-print("="*70)
-
-# Final verification
-azure_portal_count = len(re.findall(r'Azure Portal', content, re.IGNORECASE))
-create_azure_count = len(re.findall(r'Create.*?Azure', content, re.IGNORECASE))
-cloud_shell_count = len(re.findall(r'Cloud Shell', content, re.IGNORECASE))
-
-print(f"\n📊 Final Statistics:")
-print(f"  - Courses updated: {updated_count}/{len(non_cloud_courses)}")
-print(f"  - 'Azure Portal' references: {azure_portal_count}")
-print(f"  - 'Create Azure' references: {create_azure_count}")
-print(f"  - 'Cloud Shell' references: {cloud_shell_count}")
-
-print(f"\n✅ File saved: src/data/lab-instructions.ts")
-print(f"✅ Backup available: src/data/lab-instructions.ts.backup")
-
-# Verify Windows Server 2025 specifically
-if 'ws011wv-2025' in content:
-    ws_section = re.search(r"'ws011wv-2025':.*?(?='[a-z0-9-]+':|};)", content, re.DOTALL)
-    if ws_section:
-        ws_content = ws_section.group(0)
-        ws_azure_count = len(re.findall(r'Azure Portal', ws_content, re.IGNORECASE))
+    print("="*70)
+    print("FINAL COMPREHENSIVE AZURE TASK REMOVAL")
+    print("="*70)
+    print(f"\n📋 Processing {len(non_cloud_courses)} non-Cloud Slice courses")
+    print(f"✅ Keeping Azure tasks in {len(cloud_courses)} Cloud Slice courses\n")
+
+    updated = []
+    hit_counts = {rule.name: 0 for rule in CLEAN_RULES}
+    output_segments = None
+    cached_file = None
+    # A profile must see every rule run, so it bypasses the cache
+    cache = None if args.no_cache or args.profile else CleanCache(args.cache)
+
+    def clean(segments):
+        """
+        Every mode cleans through here: clean_segments() over ``(course_id,
+        text)`` *segments* (from the cache, on the pool with --jobs),
+        tallying the courses changed and the rule hits.
+        """
+        results = clean_segments(
+            [(text, course_id in non_cloud_courses, course_id) for course_id, text in segments],
+            args.jobs,
+            cache
+        )
+        for (course_id, _), (_, changed, hits) in zip(segments, results):
+            if changed:
+                updated.append(course_id)
+            for name, count in hits.items():
+                hit_counts[name] += count
+        return [text for text, _, _ in results]
+
+    print("🔧 Cleaning courses:\n")
+
+    if args.stream:
+
+        # Clean, check and write one segment at a time
+        problems = []
+        check_time = [0.0]
+
+        def clean_stream_segment(segment):
+            course_id = getattr(segment, 'course_id', None)
+            text = segment_text(segment)
+            before = len(updated)
+            cleaned, = clean([(course_id, text)])
+            if len(updated) > before:
+                print(f"  ✅ {course_id}")
+            start = time.perf_counter()
+            found = check_segment(course_id, text, cleaned)
+            check_time[0] += time.perf_counter() - start
+            if found and not args.no_verify:
+                # Abandons the temporary output; the file is left as it was
+                raise SyntaxCheckError(found)
+            problems.extend(found)
+            return cleaned
+
+        # The input is streamed too, one block at a time from the snapshot store
+        with open_input(args) as src:
+            written = stream_rewrite(src, 'src/data/lab-instructions.ts', clean_stream_segment)
+
+        print(f"\n✅ Updated {len(updated)} courses\n")
+        report_problems(problems, check_time[0], args.no_verify)
+    else:
+        with open_input(args) as f:
+            content = f.read()
+
+        # An unchanged input with unchanged rules needs no parse at all
+        file_key = cache.file_key(content, non_cloud_courses) if cache is not None else None
+        cached_file = cache.get_file(file_key) if file_key is not None else None
+
+        if cached_file is not None:
+            content, updated[:], hit_counts = cached_file
+        else:
+            # Index every course block in one parse of LAB_INSTRUCTIONS and
+            # splice the cleaned segments back in file order
+            segments = BlockIndex(content).segments()
+            cleaned = clean(segments)
+            content = ''.join(cleaned)
+            output_segments = [(course_id, text) for (course_id, _), text in zip(segments, cleaned)]
+            problems = verify_or_exit(segments, edit_list(segments, cleaned), content, args.no_verify)
+            if cache is not None and not problems:
+                # Only a verified file may be reused without checking it again
+                cache.put_file(file_key, content, updated, hit_counts)
+
+        for course_id in sorted(updated):
+            print(f"  ✅ {course_id}")
+        print(f"\n✅ Updated {len(updated)} courses\n")
+
+        # Write the cleaned content
+        # Replaced atomically, and left untouched when nothing changed
+        written = write_text('src/data/lab-instructions.ts', content)
+
+    for pattern, before_count in hit_counts.items():
+        if before_count > 0:
+            print(f"  Replaced '{pattern[:40]}...' ({before_count} times)")
+
+    snapshot = None
+    if not args.no_snapshot:
+        with SnapshotStore(args.snapshots) as store:
+            if args.stream:
+                # Stored block by block from the written file
+                with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
+                    snapshot = store.snapshot(None, 'final-clean-labs', segments=(
+                        (getattr(segment, 'course_id', None), segment_text(segment)) for segment in iter_segments(f)))
+            else:
+                snapshot = store.snapshot(content, 'final-clean-labs', segments=output_segments)
+
+    if cache is not None:
+        cache.close()
+        if cached_file is not None:
+            print(f"\n♻️  Cache: input and rules unchanged, reused the cleaned file")
+        else:
+            print(f"\n♻️  Cache: reused {cache.hits} cleaned segments, cleaned {cache.misses}")
+
+    print("\n" + "="*70)
+    print("✅ TASK COMPLETE!")
+    print("="*70)
+
+    # Final verification
+    ws_azure_count = None
+    if args.stream:
+        # Re-read the written file block by block instead of holding it in memory
+        azure_portal_count = create_azure_count = cloud_shell_count = 0
+        with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
+            for segment in iter_segments(f):
+                counts = count_references(segment_text(segment))
+                azure_portal_count += counts[0]
+                create_azure_count += counts[1]
+                cloud_shell_count += counts[2]
+                if isinstance(segment, StreamBlock) and segment.course_id == 'ws011wv-2025':
+                    ws_azure_count = len(re.findall(r'Azure Portal', segment.body, re.IGNORECASE))
+    else:
+        # One keyword index of the output answers every count below; it is
+        # cached next to the file and reused while the output is unchanged
+        keywords = KeywordIndex.cached('src/data/lab-instructions.ts', text=content)
+        azure_portal_count = keywords.count('Azure Portal')
+        create_azure_count = keywords.count('Create.*?Azure')
+        cloud_shell_count = keywords.count('Cloud Shell')
+        if 'ws011wv-2025' in keywords.course_ids:
+            ws_azure_count = keywords.count('Azure Portal', 'ws011wv-2025')
+
+    print(f"\n📊 Final Statistics:")
+    print(f"  - Courses updated: {len(updated)}/{len(non_cloud_courses)}")
+    print(f"  - 'Azure Portal' references: {azure_portal_count}")
+    print(f"  - 'Create Azure' references: {create_azure_count}")
+    print(f"  - 'Cloud Shell' references: {cloud_shell_count}")
+
+    if written:
+        print(f"\n✅ File saved: src/data/lab-instructions.ts")
+    else:
+        print(f"\n✅ File unchanged, not rewritten: src/data/lab-instructions.ts")
+    if snapshot is not None:
+        print(f"📸 Snapshot #{snapshot.id}: {snapshot.changed} courses changed, {snapshot.added} added, "
+              f"{snapshot.removed} removed ({snapshot.stored:,} bytes stored, restore with lab-snapshots.py)")
+
+    # Verify Windows Server 2025 specifically
+    if ws_azure_count is not None:
         print(f"\n🔍 Windows Server 2025 verification:")
         print(f"  - 'Azure Portal' in WS2025: {ws_azure_count}")
         if ws_azure_count == 0:
@@ -213,4 +335,8 @@ if 'ws011wv-2025' in content:
         else:
             print(f"  ⚠️  Still has {ws_azure_count} Azure Portal references")
 
-print("\n🎉 All non-Cloud Slice courses now have VM-only instructions!")
+    print("\n🎉 All non-Cloud Slice courses now have VM-only instructions!")
+
+
+if __name__ == '__main__':
+    main()
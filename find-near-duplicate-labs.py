@@ -0,0 +1,72 @@
+"""
+Find near-identical tasks (or whole courses) across the lab instructions.
+
+Cloned courses drift apart as fixes land in one copy only. This lists clusters
+of tasks whose text (title, description and instruction steps) overlaps by at
+least --threshold (Jaccard similarity of word shingles), found with MinHash
+and LSH instead of comparing every pair, so it stays fast on large catalogs.
+
+    python find-near-duplicate-labs.py                       # task clusters, similarity >= 0.8
+    python find-near-duplicate-labs.py --level course --threshold 0.6
+    python find-near-duplicate-labs.py --cross-course --json near-duplicates.json
+"""
+
+import json
+import time
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH
+from labtools.fileio import write_text
+from labtools.neardup import find_near_duplicates, lab_units
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate lab tasks or courses")
+    parser.add_argument('--input', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions to scan (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--level', choices=('task', 'course'), default='task',
+                        help="compare single tasks or whole courses (default: task)")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="minimum Jaccard similarity of a near-duplicate pair (default: 0.8)")
+    parser.add_argument('--num-perm', type=int, default=128, metavar='N',
+                        help="MinHash signature length (default: 128)")
+    parser.add_argument('--shingle-size', type=int, default=3, metavar='N',
+                        help="words per shingle (default: 3)")
+    parser.add_argument('--cross-course', action='store_true',
+                        help="only report clusters that span more than one course")
+    parser.add_argument('--json', metavar='PATH', help="also save the clusters as JSON")
+    args = parser.parse_args()
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be in (0, 1]")
+    if args.num_perm < 1 or args.shingle_size < 1:
+        parser.error("--num-perm and --shingle-size must be positive")
+
+    start = time.perf_counter()
+    with open(args.input, 'r', encoding='utf-8') as f:
+        clusters, stats = find_near_duplicates(lab_units(f, args.level), args.threshold, args.num_perm,
+                                               args.shingle_size)
+    seconds = time.perf_counter() - start
+    if args.cross_course:
+        clusters = [cluster for cluster in clusters if len(cluster.courses) > 1]
+
+    units = stats['units']
+    print(f"🔍 {units} {args.level}s, {stats['bands']} bands x {stats['rows']} rows: "
+          f"{stats['candidates']} of {units * (units - 1) // 2} pairs compared, "
+          f"{stats['confirmed']} confirmed ({seconds:.2f}s)")
+    if not clusters:
+        print(f"✅ No near-duplicate {args.level}s at similarity >= {args.threshold}")
+    for n, cluster in enumerate(clusters, 1):
+        print(f"\n#{n}: {len(cluster.units)} {args.level}s in {len(cluster.courses)} course(s), "
+              f"similarity >= {cluster.min_similarity:.2f}")
+        for unit in cluster.units:
+            print(f"  - {unit.label}: {unit.title}")
+        print(f"  courses: {','.join(cluster.courses)}")
+
+    if args.json:
+        write_text(args.json, json.dumps({'stats': stats, 'clusters': [cluster.to_dict() for cluster in clusters]},
+                                         indent=2, ensure_ascii=False))
+        print(f"\n✅ Clusters saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
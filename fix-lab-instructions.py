@@ -1,10 +1,47 @@
 """
 Aggressive script to completely remove Azure Portal tasks from non-Cloud Slice courses.
 This will properly clean Windows Server 2025 and all other non-Cloud Slice courses.
+
+The replacements that follow the per-course pass are the rule files in
+lab-rules/fix-lab-instructions/; each applies only to the courses in its scope.
+
+Use --profile PATH to write per-rule regex timings and match counts as JSON.
+
+The course blocks the run changed are re-parsed and checked against the
+LabInstruction shape before anything is written; a run that would leave broken
+TypeScript reports what it broke and writes nothing (--no-verify writes it anyway).
+
+Like final-clean-labs.py it starts over from the generation
+update-lab-instructions.py snapshotted before editing (--from-snapshot N picks
+another one, --input PATH a plain file), so reruns do not compound.
 """
 
 import re
+import sys
 import json
+import argparse
+
+from labtools import BlockIndex, BlockEditor, profile
+from labtools.fileio import read_text, write_text
+from labtools.scoped import ScopedRules
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, read_original
+from labtools.syntax import verify_or_exit
+
+parser = argparse.ArgumentParser(description="Remove Azure Portal tasks from non-Cloud Slice courses")
+parser.add_argument('--profile', metavar='PATH', help="write a per-rule regex profile to PATH (JSON)")
+parser.add_argument('--no-verify', action='store_true',
+                    help="write the output even if the syntax check of the changed blocks fails")
+parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                    help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+parser.add_argument('--from-snapshot', type=int, metavar='N',
+                    help="start from snapshot N, or the N-th newest for -N (default: the newest original "
+                         "taken by update-lab-instructions.py)")
+parser.add_argument('--input', metavar='PATH', help="start from this file instead of a snapshot")
+args = parser.parse_args()
+if args.input and args.from_snapshot is not None:
+    parser.error("--input cannot be combined with --from-snapshot")
+
+profiler = profile.Profiler().start() if args.profile else None
 
 # Load analysis report
 with open('lab-instructions-analysis.json', 'r') as f:
@@ -14,84 +51,79 @@ non_cloud_courses = set(report['non_cloud_with_instructions'])
 
 print(f"Removing Azure tasks from {len(non_cloud_courses)} non-Cloud Slice courses...")
 
-# Read lab instructions
-with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Restore from backup if exists
-try:
-    with open('src/data/lab-instructions.ts.backup', 'r', encoding='utf-8') as f:
-        content = f.read()
-    print("✅ Restored from backup for fresh start")
-except:
-    print("⚠️  No backup found, working with current file")
+# Start from the original, not from a file an earlier run already cleaned
+if args.input:
+    content = read_text(args.input)
+    print(f"✅ Reading {args.input}")
+else:
+    try:
+        original, content = read_original(args.snapshots, args.from_snapshot)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+    print(f"✅ Reading snapshot #{original.id} ({original.label}, {original.taken_at})")
 
 # For each non-Cloud Slice course, we need to find and remove Azure Portal tasks
 # Strategy: Find each course block and remove Azure-specific instructions
 
-def remove_azure_tasks_from_course(course_id, content):
+def remove_azure_tasks_from_course(course_block):
     """Remove Azure Portal tasks from a specific course"""
     
-    # Find the course block
-    pattern = f"'{course_id}':\\s*{{([^}}]*?courseId:\\s*'{course_id}'.*?)}},\\s*(?='[a-z0-9-]+':|}}\\s*;)"
-    
-    match = re.search(pattern, content, re.DOTALL)
-    if not match:
-        return content, False
-    
-    course_block = match.group(0)
-    original_block = course_block
-    
-    # Remove Azure Portal specific instructions
+    # Remove Azure Portal specific instructions: a whole step object whose
+    # action string mentions the phrase, never text past the end of the step
+    action = r"(?:(?!\1)[^\\\n]|\\.)*?"
     azure_patterns_to_remove = [
-        # Remove entire instruction steps that mention Azure Portal
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?Azure Portal.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?portal\.azure\.com.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?Create.*?Azure.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?Cloud Shell.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?resource group.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?App Service.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?Virtual Network.*?[\'"].*?\},?',
-        r'\{\s*step:\s*\d+,\s*action:\s*[\'"].*?Storage Account.*?[\'"].*?\},?',
+        r"\{\s*step:\s*\d+,\s*action:\s*(['\"])" + action + phrase + action + r"\1[^{}]*\},?"
+        for phrase in (
+            r'Azure Portal',
+            r'portal\.azure\.com',
+            r'Create' + action + r'Azure',
+            r'Cloud Shell',
+            r'resource group',
+            r'App Service',
+            r'Virtual Network',
+            r'Storage Account',
+        )
     ]
-    
+
     for pattern in azure_patterns_to_remove:
-        course_block = re.sub(pattern, '', course_block, flags=re.IGNORECASE | re.DOTALL)
-    
+        course_block = profile.sub(pattern, '', course_block, flags=re.IGNORECASE)
+
     # Clean up any double commas or trailing commas
-    course_block = re.sub(r',\s*,', ',', course_block)
-    course_block = re.sub(r',\s*\]', ']', course_block)
+    course_block = profile.sub(r',\s*,', ',', course_block)
+    course_block = profile.sub(r',\s*\]', ']', course_block)
     
-    # Replace in content
-    if course_block != original_block:
-        content = content.replace(original_block, course_block)
-        return content, True
-    
-    return content, False
+    return course_block
+
+# Index every course block in one parse of LAB_INSTRUCTIONS
+index = BlockIndex(content, with_comments=False)
+editor = BlockEditor(index)
 
 # Process each non-Cloud Slice course
 total_updated = 0
 for course_id in sorted(non_cloud_courses):
-    content, updated = remove_azure_tasks_from_course(course_id, content)
-    if updated:
+    if course_id not in index:
+        continue
+    with profile.course(course_id):
+        cleaned = remove_azure_tasks_from_course(index.block(course_id))
+    if editor.replace_block(course_id, cleaned):
         total_updated += 1
         print(f"  ✅ Cleaned {course_id}")
 
-# Additional global replacements for any remaining Azure references
-global_replacements = [
-    (r'Open the Azure Portal', 'Connect to the VM using RDP'),
-    (r'In the Azure Portal,?\s*', 'In the VM, '),
-    (r'portal\.azure\.com', 'the VM desktop'),
-    (r'Cloud Shell', 'PowerShell'),
-    (r'Azure resource', 'VM resource'),
-]
+# Replacements for any remaining Azure references, applied only to the
+# courses in scope of lab-rules/fix-lab-instructions/
+scoped_replacements = ScopedRules.load('fix-lab-instructions')
 
-for pattern, replacement in global_replacements:
-    content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+# Recorded as more edits on the original text; the file is materialized once
+scoped_replacements.apply(editor, non_cloud_courses)
+content = editor.render()
+
+# Check the changed blocks before anything is written
+verify_or_exit(index.segments(), editor.edits(), content, args.no_verify)
 
 # Write updated content
-with open('src/data/lab-instructions.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if not write_text('src/data/lab-instructions.ts', content):
+    print("\n✅ File already up to date, not rewritten")
 
 print(f"\n✅ Updated {total_updated} courses")
 print("✅ Removed all Azure Portal references")
@@ -102,3 +134,8 @@ azure_count = len(re.findall(r'Azure Portal', content, re.IGNORECASE))
 print(f"\n📊 Remaining 'Azure Portal' references: {azure_count}")
 if azure_count > 0:
     print("⚠️  Some references remain (likely in Cloud Slice courses)")
+
+if profiler is not None:
+    profiler.stop()
+    profiler.dump(args.profile)
+    print(f"📈 Rule profile saved to {args.profile}")
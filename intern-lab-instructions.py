@@ -0,0 +1,96 @@
+"""
+Hoist content repeated across courses in the generated lab-instructions module
+into shared constant tables the courses reference (SHARED_TEXT, SHARED_STEPS,
+SHARED_KNOWLEDGE...), and report the bundle and heap savings per course family.
+
+Run it last, on the cleaned module: the other lab tools expect literal values,
+and an already interned module is refused. The interned module is a build
+artifact written next to the source, never over it: --output must be given and
+may not be the input or src/data/lab-instructions.ts, which stays the editable
+copy the other tools work on.
+
+Interning shrinks the module and the heap, but the references and tables can
+compress worse than the repeated text they replace. When the interned module
+gzips larger than the input it is not written unless --force is given.
+
+    python intern-lab-instructions.py --output src/data/lab-instructions.interned.ts
+    python intern-lab-instructions.py --report-only    # only report what it would save
+    python intern-lab-instructions.py --report-only --min-bytes 64 --json intern-report.json
+"""
+
+import os
+import json
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH
+from labtools.fileio import read_text, write_text
+from labtools.intern import intern_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hoist duplicated lab content into shared constant tables")
+    parser.add_argument('--input', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions module to intern (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--output', metavar='PATH',
+                        help="where to write the interned module (required unless --report-only; "
+                             "not the input or the editable source)")
+    parser.add_argument('--min-bytes', type=int, default=1, metavar='N',
+                        help="hoist a value only if that saves at least N bytes (default: 1)")
+    parser.add_argument('--report-only', action='store_true', help="write nothing; only report the savings")
+    parser.add_argument('--json', metavar='PATH', help="also save the report as JSON")
+    parser.add_argument('--force', action='store_true', help="write the module even if it gzips larger than the input")
+    args = parser.parse_args()
+    if not args.report_only:
+        if not args.output:
+            parser.error("--output is required unless --report-only")
+        if os.path.abspath(args.output) in (os.path.abspath(args.input), os.path.abspath(LAB_INSTRUCTIONS_PATH)):
+            parser.error(f"--output {args.output} would overwrite the editable source; write the interned "
+                         f"module somewhere else")
+
+    text = read_text(args.input)
+    try:
+        new_text, report = intern_catalog(text, args.min_bytes)
+    except ValueError as e:
+        print(f"❌ {args.input}: {e}")
+        raise SystemExit(1)
+
+    print("="*70)
+    print("SHARED-CONTENT INTERNING")
+    print("="*70)
+    counts = {}
+    for value in report['values']:
+        counts[value['type']] = counts.get(value['type'], 0) + 1
+    copies = sum(value['copies'] for value in report['values'])
+    print(f"\n📋 {len(report['values'])} values hoisted, replacing {copies} copies:")
+    for type_name, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  - {type_name}: {count}")
+
+    print(f"\n📊 Savings per course family:")
+    print(f"  {'family':<8} {'courses':>7} {'copies':>7} {'bytes':>9} {'heap (est.)':>12}")
+    for family, saved in report['families'].items():
+        print(f"  {family:<8} {saved['courses']:>7} {saved['copies']:>7} {saved['bytes']:>9,} {saved['heap']:>12,}")
+    heap = sum(saved['heap'] for saved in report['families'].values())
+    print(f"  {'tables':<8} {'':>7} {'':>7} {-report['table_bytes']:>9,}")
+
+    before, after = report['bytes_before'], report['bytes_after']
+    print(f"\n  Module: {before:,} -> {after:,} bytes ({before - after:,} saved, {(before - after) / before:.1%})")
+    print(f"  Gzipped: {report['gzip_before']:,} -> {report['gzip_after']:,} bytes")
+    print(f"  Heap: about {heap:,} bytes fewer objects and arrays allocated")
+
+    if args.json:
+        write_text(args.json, json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\n✅ Report saved to {args.json}")
+    if args.report_only or not report['values']:
+        return
+    if report['gzip_after'] > report['gzip_before'] and not args.force:
+        print(f"\n⚠️  The interned module gzips {report['gzip_after'] - report['gzip_before']:,} bytes larger; "
+              f"not writing {args.output} (--force to write it anyway)")
+        return
+    if write_text(args.output, new_text):
+        print(f"\n✅ File saved: {args.output}")
+    else:
+        print(f"\n✅ File unchanged, not rewritten: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
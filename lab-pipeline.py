@@ -0,0 +1,343 @@
+"""
+Run the lab-maintenance workflow as one in-process pipeline:
+
+    analyze  -> which courses are non-Cloud Slice and have lab instructions
+    clean    -> remove Azure Portal tasks from those courses, apply global replacements
+    verify   -> count the remaining Azure references, overall and per VM-only course
+
+Both TypeScript files are read and parsed once and every stage shares that
+model, so a full run reads each input once and writes the cleaned file once.
+No lab-instructions-analysis.json round trip is needed (use --report to
+save it anyway).
+
+Like final-clean-labs.py, the run starts from the original lab instructions
+in .lab-snapshots.sqlite (--from-snapshot N for another generation, --input
+PATH to read a file instead), so the cleaned file is never cleaned again.
+
+    python lab-pipeline.py                                  # all stages
+    python lab-pipeline.py --stages analyze                 # report only
+    python lab-pipeline.py --stages verify --input src/data/lab-instructions.ts
+
+With --watch the pipeline keeps running and reprocesses the inputs whenever
+they change (inotify, or polling with --poll), redoing the per-block work only
+for the courses whose block changed. It follows the file given by --input, or
+src/data/lab-instructions.ts without the clean stage.
+
+    python lab-pipeline.py --watch --input drafts/lab-instructions.ts
+    python lab-pipeline.py --watch --stages analyze,verify
+
+With --catalogs the stages run over many catalog directories (one per
+white-label tenant, laid out like the repository root) in one process;
+--input, --mock-data, --output, --report and --snapshots are then relative
+to each directory. Files are read and written on a thread pool of --threads.
+
+    python lab-pipeline.py --catalogs 'tenants/*'
+
+The clean stage syntax-checks the course blocks it changed before writing;
+on a problem it names the course, task and step and writes nothing
+(--no-verify writes anyway; in --watch mode the output waits for a fix).
+"""
+
+import os
+import json
+import time
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH, LAB_INSTRUCTIONS_BACKUP_PATH, MOCK_DATA_PATH, TSSyntaxError
+from labtools.batch import catalog_dirs, run_batch
+from labtools.cache import DEFAULT_CACHE_PATH, CleanCache
+from labtools.fileio import read_text, write_text
+from labtools.pipeline import STAGES, CatalogModel, IncrementalPipeline, analyze, clean, verify
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, read_original
+from labtools.syntax import SyntaxCheckError, check_edits, edit_list
+from labtools.watch import watch, inotify_available
+
+
+def parse_stages(value):
+    stages = [stage.strip() for stage in value.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown or not stages:
+        raise argparse.ArgumentTypeError(f"stages must be a comma-separated subset of {','.join(STAGES)}")
+    return set(stages)
+
+
+def print_changes(result, label):
+    changed = result['changed']
+    stamp = time.strftime('%H:%M:%S')
+    shown = ', '.join(changed[:8]) + (f" (+{len(changed) - 8} more)" if len(changed) > 8 else '')
+    print(f"\n[{stamp}] 🔁 {label}: {len(changed)} changed course(s){': ' + shown if changed else ''}")
+    if result['removed']:
+        print(f"  - removed: {', '.join(result['removed'])}")
+    if result['updated']:
+        print(f"  - cleaned as VM-only: {', '.join(result['updated'])}")
+    vm_only = set(result['report']['non_cloud_with_instructions'])
+    for course_id in changed:
+        counts = result['per_course'].get(course_id)
+        if course_id in vm_only and counts and counts[0]:
+            print(f"  ⚠️  {course_id} still mentions the Azure Portal {counts[0]} time(s)")
+    if result['problems']:
+        print(f"  ❌ Syntax check failed, output not written:")
+        for problem in result['problems']:
+            print(f"    - {problem}")
+    azure_portal_count, create_azure_count, cloud_shell_count = result['totals']
+    print(f"  📊 'Azure Portal': {azure_portal_count}, 'Create Azure': {create_azure_count}, "
+          f"'Cloud Shell': {cloud_shell_count}")
+    if result['written']:
+        print(f"  ✅ Output saved")
+    print(f"  ⏱️  {result['seconds'] * 1000:.1f} ms")
+
+
+def watch_catalog(args):
+    output = args.output if 'clean' in args.stages else None
+    cache = None if args.no_cache or output is None else CleanCache(args.cache)
+    pipeline = IncrementalPipeline(args.input, args.mock_data, output, cache, args.jobs)
+    print_changes(pipeline.run(), "Initial run")
+
+    mode = "polling" if args.poll or not inotify_available() else "inotify"
+    print(f"\n👀 Watching {args.input} and {args.mock_data} ({mode}); press Ctrl+C to stop")
+    try:
+        for paths in watch([args.input, args.mock_data], args.interval, poll=args.poll):
+            try:
+                result = pipeline.run()
+            except (TSSyntaxError, ValueError) as e:
+                # Authors save half-finished edits; wait for the next save
+                print(f"\n⚠️  Skipped, {', '.join(sorted(paths))} does not parse: {e}")
+                continue
+            print_changes(result, ', '.join(sorted(paths)))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def process_catalog(args, cache, root, texts):
+    """Run the selected stages on one catalog's *texts*; return ``(outputs, summary)``."""
+    if args.input:
+        lab_text = texts[args.input]
+    else:
+        _, lab_text = read_original(os.path.join(root, args.snapshots), args.from_snapshot,
+                                    backup=os.path.join(root, LAB_INSTRUCTIONS_BACKUP_PATH))
+    model = CatalogModel(lab_text, texts[args.mock_data])
+    report = analyze(model, keywords=False)
+    vm_only = set(report['non_cloud_with_instructions'])
+    outputs = {}
+    summary = {'courses': len(model.index), 'vm_only': len(vm_only), 'updated': None, 'totals': None,
+               'remaining': None}
+    if 'analyze' in args.stages and args.report:
+        outputs[args.report] = json.dumps(report, indent=2)
+
+    segments = model.index.segments()
+    if 'clean' in args.stages:
+        original = segments
+        segments, updated, _ = clean(model, vm_only, args.jobs, cache)
+        output = ''.join(text for _, text in segments)
+        problems = check_edits(original, edit_list(original, [text for _, text in segments]), output)
+        if problems and not args.no_verify:
+            raise SyntaxCheckError(problems)
+        outputs[args.output] = output
+        summary['updated'] = len(updated)
+    if 'verify' in args.stages:
+        totals, per_course = verify(segments)
+        summary['totals'] = totals
+        summary['remaining'] = sum(1 for course_id in vm_only if per_course.get(course_id, (0,))[0])
+    return outputs, summary
+
+
+def batch_catalogs(args, roots):
+    if not roots:
+        print("No catalog directories matched")
+        return 1
+    print("="*70)
+    print(f"LAB INSTRUCTIONS PIPELINE: {len(roots)} catalogs, "
+          + " -> ".join(stage for stage in STAGES if stage in args.stages))
+    print("="*70)
+
+    start = time.perf_counter()
+    cache = None if args.no_cache or 'clean' not in args.stages else CleanCache(args.cache)
+    try:
+        inputs = [args.input, args.mock_data] if args.input else [args.mock_data]
+        results = run_batch(roots, inputs, lambda root, texts: process_catalog(args, cache, root, texts),
+                            args.threads)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    totals = [0, 0, 0]
+    failed = 0
+    print()
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            print(f"  ❌ {result.root}: {result.error}")
+            continue
+        summary = result.summary
+        line = f"  ✅ {result.root}: {summary['courses']} courses, {summary['vm_only']} VM-only"
+        if summary['updated'] is not None:
+            line += f", {summary['updated']} cleaned"
+        if summary['totals'] is not None:
+            line += f", {summary['totals'][0]} 'Azure Portal' left"
+            for i, count in enumerate(summary['totals']):
+                totals[i] += count
+        line += f", {len(result.written)} file(s) written"
+        print(line)
+
+    print(f"\n📊 Summary: {len(results) - failed}/{len(results)} catalogs processed"
+          f" in {time.perf_counter() - start:.2f}s")
+    if 'verify' in args.stages:
+        remaining = sum(result.summary['remaining'] for result in results if result.error is None)
+        print(f"  - 'Azure Portal' references: {totals[0]}")
+        print(f"  - 'Create Azure' references: {totals[1]}")
+        print(f"  - 'Cloud Shell' references: {totals[2]}")
+        print(f"  - VM-only courses still mentioning the Azure Portal: {remaining}")
+    if cache is not None:
+        print(f"♻️  Cache: reused {cache.hits} cleaned segments, cleaned {cache.misses}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze, clean and verify lab instructions in one run")
+    parser.add_argument('--stages', type=parse_stages, default=set(STAGES),
+                        help="comma-separated stages to run (default: analyze,clean,verify)")
+    parser.add_argument('--input', metavar='PATH',
+                        help="lab instructions to read (default: the original in the snapshot store)")
+    parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                        help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument('--from-snapshot', type=int, metavar='N',
+                        help="start from snapshot N, or the N-th newest for -N (default: the newest original "
+                             "taken by update-lab-instructions.py)")
+    parser.add_argument('--mock-data', default=MOCK_DATA_PATH,
+                        help=f"mock course data to read (default: {MOCK_DATA_PATH})")
+    parser.add_argument('--output', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"where the clean stage writes (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help="clean course blocks on N worker processes")
+    parser.add_argument('--report', metavar='PATH', help="also save the analysis report to PATH")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, metavar='PATH',
+                        help=f"cleaned-block cache (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="clean every block without the cache")
+    parser.add_argument('--no-verify', action='store_true',
+                        help="write the cleaned file even if the syntax check of the changed blocks fails")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and reprocess the changed course blocks after every edit")
+    parser.add_argument('--poll', action='store_true', help="with --watch, poll instead of using inotify")
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help="polling interval in seconds (default: 0.5)")
+    parser.add_argument('--catalogs', nargs='+', metavar='DIR',
+                        help="run over these catalog directories (globs allowed) instead of the repository")
+    parser.add_argument('--threads', type=int, default=8, metavar='N',
+                        help="with --catalogs, read and write files on N threads (default: 8)")
+    args = parser.parse_args()
+    if args.input and args.from_snapshot is not None:
+        parser.error("--input cannot be combined with --from-snapshot")
+
+    if args.catalogs:
+        if args.watch:
+            parser.error("--watch and --catalogs cannot be combined")
+        try:
+            roots = catalog_dirs(args.catalogs)
+        except ValueError as e:
+            parser.error(str(e))
+        raise SystemExit(batch_catalogs(args, roots))
+
+    if args.watch:
+        if args.from_snapshot is not None:
+            parser.error("--watch follows a file; use --input instead of --from-snapshot")
+        if args.input is None:
+            if 'clean' in args.stages:
+                parser.error(f"--watch needs --input, the file to clean into --output "
+                             f"(or --stages analyze,verify to watch {LAB_INSTRUCTIONS_PATH})")
+            args.input = LAB_INSTRUCTIONS_PATH
+        if 'clean' in args.stages and os.path.abspath(args.input) == os.path.abspath(args.output):
+            parser.error("--watch needs --input and --output to be different files")
+        watch_catalog(args)
+        return
+
+    print("="*70)
+    print("LAB INSTRUCTIONS PIPELINE: " + " -> ".join(stage for stage in STAGES if stage in args.stages))
+    print("="*70)
+
+    if args.input:
+        model = CatalogModel.load(args.input, args.mock_data)
+        source = args.input
+    else:
+        try:
+            snapshot, lab_text = read_original(args.snapshots, args.from_snapshot)
+        except KeyError as e:
+            print(f"\n❌ {e.args[0]}")
+            raise SystemExit(1)
+        model = CatalogModel(lab_text, read_text(args.mock_data))
+        source = f"snapshot #{snapshot.id} ({snapshot.label}, {snapshot.taken_at})"
+    print(f"\n✅ Loaded {source} ({len(model.index)} courses) and {args.mock_data}")
+
+    report = analyze(model)
+    vm_only = set(report['non_cloud_with_instructions'])
+
+    if 'analyze' in args.stages:
+        print("\n📋 Analysis:")
+        print(f"  - Cloud Slice courses: {len(report['cloud_slice_courses'])}")
+        print(f"  - Non-Cloud Slice courses: {len(report['non_cloud_slice_courses'])}")
+        print(f"  - Courses with lab instructions: {len(report['courses_with_instructions'])}")
+        print(f"  - Non-Cloud Slice courses needing update: {len(vm_only)}")
+        for keyword, count in report['keyword_counts'].items():
+            if count > 0:
+                print(f"  '{keyword}': {count} occurrences")
+        if args.report:
+            write_text(args.report, json.dumps(
+                {key: value for key, value in report.items() if key != 'keyword_counts'}, indent=2))
+            print(f"\n✅ Report saved to {args.report}")
+
+    segments = model.index.segments()
+    if 'clean' in args.stages:
+        print("\n🔧 Cleaning courses:\n")
+        cache = None if args.no_cache else CleanCache(args.cache)
+        original = segments
+        segments, updated, hit_counts = clean(model, vm_only, args.jobs, cache)
+        for course_id in sorted(updated):
+            print(f"  ✅ {course_id}")
+        print(f"\n✅ Updated {len(updated)}/{len(vm_only)} courses")
+        for pattern, count in hit_counts.items():
+            if count > 0:
+                print(f"  Replaced '{pattern[:40]}...' ({count} times)")
+        if cache is not None:
+            cache.close()
+            print(f"♻️  Cache: reused {cache.hits} cleaned segments, cleaned {cache.misses}")
+
+        output = ''.join(text for _, text in segments)
+        start = time.perf_counter()
+        problems = check_edits(original, edit_list(original, [text for _, text in segments]), output)
+        if problems:
+            print(f"\n❌ Syntax check found {len(problems)} problem(s) in the cleaned blocks:")
+            for problem in problems:
+                print(f"  - {problem}")
+            if not args.no_verify:
+                print(f"\nNothing written to {args.output} (use --no-verify to write anyway)")
+                raise SystemExit(1)
+        else:
+            print(f"\n🔎 Syntax check of changed blocks passed ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+        if write_text(args.output, output):
+            print(f"\n✅ File saved: {args.output}")
+        else:
+            print(f"\n✅ File unchanged, not rewritten: {args.output}")
+
+    if 'verify' in args.stages:
+        (azure_portal_count, create_azure_count, cloud_shell_count), per_course = verify(segments)
+        print(f"\n📊 Verification:")
+        print(f"  - 'Azure Portal' references: {azure_portal_count}")
+        print(f"  - 'Create Azure' references: {create_azure_count}")
+        print(f"  - 'Cloud Shell' references: {cloud_shell_count}")
+        remaining = {
+            course_id: counts[0] for course_id, counts in per_course.items()
+            if course_id in vm_only and counts[0]
+        }
+        if remaining:
+            print(f"\n⚠️  {len(remaining)} VM-only courses still mention the Azure Portal:")
+            for course_id, count in sorted(remaining.items()):
+                print(f"  - {course_id}: {count}")
+        else:
+            print(f"\n✅ All {len(vm_only)} VM-only courses are free of Azure Portal references")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Generations of the lab instructions, kept in a content-addressed snapshot store.
+
+update-lab-instructions.py and final-clean-labs.py take a snapshot of what they
+read and write; this takes one by hand, shows the run log, and puts a single
+course or the whole file back as it was in any earlier generation. Only
+changed course blocks are stored, as compressed deltas, in .lab-snapshots.sqlite.
+
+    python lab-snapshots.py log                          # run log, newest first
+    python lab-snapshots.py take --label "before manual edit"
+    python lab-snapshots.py diff 3                       # courses changed since #3
+    python lab-snapshots.py show 3 --course ws011wv-2025
+    python lab-snapshots.py restore 3 --course ws011wv-2025 --course az-104
+    python lab-snapshots.py restore -2                   # the whole file, one generation back
+
+A generation is a snapshot id, or -N for the N-th newest snapshot of the file.
+"""
+
+import sys
+import time
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH
+from labtools.fileio import read_text, write_text
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, SnapshotStore
+
+
+def print_snapshot(snapshot):
+    print(f"  #{snapshot.id:<4} {snapshot.taken_at}  {snapshot.label:<36} "
+          f"{snapshot.courses:>4} courses  +{snapshot.added} ~{snapshot.changed} -{snapshot.removed}  "
+          f"{snapshot.stored:>8,} bytes stored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot, list and restore generations of the lab instructions")
+    parser.add_argument('--store', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                        help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument('--file', default=LAB_INSTRUCTIONS_PATH, metavar='PATH',
+                        help=f"file the snapshots are of (default: {LAB_INSTRUCTIONS_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    take = commands.add_parser('take', help="snapshot the file as it is now")
+    take.add_argument('--label', default='lab-snapshots.py', help="what the snapshot is for, shown in the log")
+    take.add_argument('--codec', choices=('zlib', 'lzma'), default='zlib',
+                      help="compression of new blocks (default: zlib, stored as deltas)")
+
+    log = commands.add_parser('log', help="list the snapshots taken, newest first")
+    log.add_argument('-n', type=int, default=20, metavar='N', help="show the N newest (default: 20)")
+
+    diff = commands.add_parser('diff', help="courses added, changed and removed between two generations")
+    diff.add_argument('generation', type=int)
+    diff.add_argument('other', type=int, nargs='?', default=-1, help="(default: the latest, -1)")
+
+    show = commands.add_parser('show', help="print a generation of the file or of one course")
+    show.add_argument('generation', type=int)
+    show.add_argument('--course', metavar='ID', help="print only this course block")
+
+    restore = commands.add_parser('restore', help="put courses, or the whole file, back as they were")
+    restore.add_argument('generation', type=int)
+    restore.add_argument('--course', action='append', metavar='ID',
+                         help="restore only this course (repeatable); other courses are left as they are")
+    restore.add_argument('--output', metavar='PATH', help="write here instead of --file")
+    args = parser.parse_args()
+
+    with SnapshotStore(args.store, getattr(args, 'codec', 'zlib')) as store:
+        try:
+            run(args, store)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            sys.exit(1)
+
+
+def run(args, store):
+    if args.command == 'take':
+        start = time.perf_counter()
+        snapshot = store.snapshot(read_text(args.file), args.label, args.file)
+        print(f"📸 Snapshot #{snapshot.id} of {args.file} ({(time.perf_counter() - start) * 1000:.1f} ms):")
+        print_snapshot(snapshot)
+
+    elif args.command == 'log':
+        snapshots = store.log(args.file, args.n)
+        if not snapshots:
+            print(f"No snapshots of {args.file} in {args.store}")
+            return
+        print(f"📜 Snapshots of {args.file}:")
+        for snapshot in snapshots:
+            print_snapshot(snapshot)
+        stats = store.stats()
+        print(f"\n  {stats['snapshots']} snapshots, {stats['blobs']} blocks: "
+              f"{stats['raw_bytes']:,} bytes stored in {stats['stored_bytes']:,}")
+
+    elif args.command == 'diff':
+        old, new = store.get(args.generation, args.file), store.get(args.other, args.file)
+        changes = store.diff(old.id, new.id)
+        print(f"🔍 #{old.id} -> #{new.id}:")
+        for kind, mark in (('added', '+'), ('changed', '~'), ('removed', '-')):
+            for course_id in changes[kind]:
+                print(f"  {mark} {course_id}")
+        if not any(changes.values()):
+            print("  no course changed")
+
+    elif args.command == 'show':
+        if args.course:
+            block = store.block(args.generation, args.course, args.file)
+            if block is None:
+                raise KeyError(f"{args.course} is not in snapshot {args.generation}")
+            sys.stdout.write(block + '\n')
+        else:
+            sys.stdout.write(store.text(args.generation, args.file))
+
+    elif args.command == 'restore':
+        output = args.output or args.file
+        start = time.perf_counter()
+        snapshot = store.get(args.generation, args.file)
+        if args.course:
+            text, segments = store.restore(snapshot.id, read_text(args.file), args.course, args.file)
+            label = f"restore {','.join(args.course)} from #{snapshot.id}"
+        else:
+            text, segments = store.text(snapshot.id), None
+            label = f"restore #{snapshot.id}"
+        seconds = time.perf_counter() - start
+        if not write_text(output, text):
+            print(f"✅ {output} already matches #{snapshot.id}, not rewritten")
+            return
+        print(f"✅ Restored {', '.join(args.course) if args.course else 'the whole file'} "
+              f"from #{snapshot.id} into {output} ({seconds * 1000:.1f} ms)")
+        if output == args.file:
+            print_snapshot(store.snapshot(text, label, args.file, segments))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""
+Shared tooling for the lab-instruction maintenance scripts.
+
+The top-level ``*-lab-instructions.py`` / ``*-labs.py`` scripts are thin
+drivers around these modules; run them from the repository root.
+"""
+
+from .tslex import TSSyntaxError, parse_module, parse_value, find_export, tokenize
+from .catalog import (
+    LAB_INSTRUCTIONS_PATH,
+    LAB_INSTRUCTIONS_BACKUP_PATH,
+    MOCK_DATA_PATH,
+    ANALYSIS_REPORT_PATH,
+    AZURE_KEYWORDS,
+    parse_lab_instructions,
+    parse_mock_courses,
+    course_entries,
+    course_blocks,
+    course_ids,
+    cloud_slice_course_ids,
+)
+from .blocks import BlockIndex, BlockEditor
+from .rules import Rule, RuleSet
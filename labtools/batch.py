@@ -0,0 +1,90 @@
+"""
+Run one transformation over many catalog directories in a single process.
+
+Each white-label tenant keeps its own copy of the data files under a
+catalog directory laid out like the repository root (``src/lib/mock-data.ts``,
+``src/data/lab-instructions.ts``...). run_batch() reads the inputs of all
+catalogs on a thread pool, runs the transformation for each catalog on
+the calling thread as soon as its inputs are in, and hands the outputs
+back to the pool to be written, so disk round-trips overlap with parsing
+and cleaning instead of adding up one tenant after another.
+"""
+
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+
+from .fileio import read_text, write_text
+
+__all__ = ['catalog_dirs', 'BatchResult', 'run_batch']
+
+
+def catalog_dirs(patterns):
+    """Expand directory names and glob *patterns* into sorted, unique catalog directories."""
+    dirs = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if not os.path.isdir(path):
+                raise ValueError(f"Not a catalog directory: {path}")
+            dirs.add(os.path.normpath(path))
+    return sorted(dirs)
+
+
+class BatchResult:
+    """Outcome for one catalog: the transformation's ``summary``, the ``written`` paths or the ``error``."""
+
+    __slots__ = ('root', 'summary', 'written', 'error')
+
+    def __init__(self, root, summary=None, written=(), error=None):
+        self.root = root
+        self.summary = summary
+        self.written = list(written)
+        self.error = error
+
+    def __repr__(self):
+        return f"<BatchResult {self.root} {'error' if self.error else 'ok'}>"
+
+
+def _read_all(root, names):
+    return {name: read_text(os.path.join(root, name)) for name in names}
+
+
+def _write_all(root, outputs):
+    return [name for name, text in outputs.items() if write_text(os.path.join(root, name), text)]
+
+
+def run_batch(roots, inputs, transform, threads=8):
+    """
+    Run ``transform(root, texts)`` for every catalog directory in *roots*.
+
+    *inputs* lists the file names, relative to each root, to read; *texts*
+    maps them to their contents. *transform* returns ``(outputs, summary)``
+    where *outputs* maps relative file names to the text to write (files
+    whose content is unchanged are not rewritten). A catalog that fails to
+    read, parse or write gets its error in the result and does not stop
+    the others.
+
+    Returns the BatchResults in the order of *roots*.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        reads = [pool.submit(_read_all, root, inputs) for root in roots]
+        writes = []
+        for root, read in zip(roots, reads):
+            try:
+                outputs, summary = transform(root, read.result())
+            except (OSError, ValueError, KeyError) as e:
+                results.append(BatchResult(root, error=e))
+                writes.append(None)
+                continue
+            results.append(BatchResult(root, summary))
+            writes.append(pool.submit(_write_all, root, outputs))
+        for result, write in zip(results, writes):
+            if write is None:
+                continue
+            try:
+                result.written = write.result()
+            except OSError as e:
+                result.error = e
+    return results
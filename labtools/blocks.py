@@ -0,0 +1,260 @@
+"""
+Course-block offset index and splice-based editing of LAB_INSTRUCTIONS.
+
+The index is built once per run from a single parse and maps each courseId
+to the ``(start, end)`` span of its block in the original text. Rewrites are
+recorded against those original offsets and applied in one pass when the
+text is rendered, so cleaning N courses costs O(file) instead of
+O(N x file), and identical blocks can never be confused with each other.
+
+BlockEditor is a piece table over the original text: rule tables are
+applied to it as more splices (apply()), and the edited text is only
+materialized once, by render() or write().
+"""
+
+from bisect import bisect_right
+
+from .catalog import parse_lab_instructions, course_entries
+
+__all__ = ['BlockIndex', 'BlockEditor']
+
+
+def _value(node):
+    return node.to_python() if node is not None and node.kind in ('string', 'template', 'number') else None
+
+
+class BlockIndex:
+    """
+    Map of courseId -> ``(start, end)`` span of the course block in ``text``.
+
+    Spans cover the course's header comment, its key and its object value
+    unless *with_comments* is false, in which case they start at the key.
+    Iteration yields course ids in file order.
+    """
+
+    def __init__(self, text, instructions=None, with_comments=True):
+        if instructions is None:
+            instructions = parse_lab_instructions(text)
+        self.text = text
+        self.instructions = instructions
+        self.spans = {}
+        self.props = {}
+        for course_id, prop in course_entries(instructions):
+            start = prop.doc_start if with_comments else prop.start
+            self.spans[course_id] = (start, prop.end)
+            self.props[course_id] = prop
+        self._order = sorted(self.spans, key=self.spans.__getitem__)
+        self._starts = [self.spans[c][0] for c in self._order]
+        self._ranges = None
+        self._range_starts = None
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, course_id):
+        return course_id in self.spans
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __getitem__(self, course_id):
+        return self.spans[course_id]
+
+    def get(self, course_id, default=None):
+        return self.spans.get(course_id, default)
+
+    def block(self, course_id):
+        """Text of the course block, or None if the course is not present."""
+        span = self.spans.get(course_id)
+        if span is None:
+            return None
+        return self.text[span[0]:span[1]]
+
+    def segments(self):
+        """
+        Split the text into ``(course_id, text)`` pairs in file order.
+
+        Text between and around the course blocks comes out with a
+        course_id of None; joining all texts gives back the original.
+        """
+        segments = []
+        pos = 0
+        for course_id in self._order:
+            start, end = self.spans[course_id]
+            if start > pos:
+                segments.append((None, self.text[pos:start]))
+            segments.append((course_id, self.text[start:end]))
+            pos = end
+        segments.append((None, self.text[pos:]))
+        return segments
+
+    def course_at(self, offset):
+        """Return the courseId whose block contains *offset*, or None."""
+        i = bisect_right(self._starts, offset) - 1
+        if i < 0:
+            return None
+        course_id = self._order[i]
+        return course_id if offset < self.spans[course_id][1] else None
+
+    def _task_ranges(self):
+        """Return sorted ``(start, end, task_id, step)`` ranges of tasks and steps."""
+        ranges = []
+        for course_id in self._order:
+            tasks = self.props[course_id].value.get('tasks')
+            if tasks is None or tasks.kind != 'array':
+                continue
+            for n, task in enumerate(tasks.children, 1):
+                if task.kind != 'object':
+                    continue
+                task_id = _value(task.get('id')) or str(n)
+                ranges.append((task.start, task.end, task_id, None))
+                steps = task.get('instructions')
+                if steps is None or steps.kind != 'array':
+                    continue
+                for m, step in enumerate(steps.children, 1):
+                    if step.kind == 'object':
+                        ranges.append((step.start, step.end, task_id, _value(step.get('step')) or m))
+        ranges.sort()
+        return ranges
+
+    def locate(self, offset):
+        """
+        Return ``(course_id, task_id, step)`` for *offset*; each is None
+        where the offset is outside a course, task or instruction step.
+        """
+        course_id = self.course_at(offset)
+        task_id = step = None
+        if course_id is not None:
+            if self._ranges is None:
+                self._ranges = self._task_ranges()
+                self._range_starts = [start for start, _, _, _ in self._ranges]
+            ranges = self._ranges
+            # Steps nest inside tasks: the containing range that starts
+            # last is the innermost one
+            course_start = self.spans[course_id][0]
+            i = bisect_right(self._range_starts, offset) - 1
+            while i >= 0 and ranges[i][0] >= course_start:
+                _, end, range_task, range_step = ranges[i]
+                if offset < end:
+                    task_id, step = range_task, range_step
+                    break
+                i -= 1
+        return course_id, task_id, step
+
+
+class BlockEditor:
+    """
+    Records non-overlapping edits against the original text of an index.
+
+    Offsets always refer to the original text, so edits can be recorded in
+    any order; ``render()`` stitches the result together in a single pass.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.text = index.text
+        self._edits = {}
+
+    def __len__(self):
+        return len(self._edits)
+
+    def splice(self, start, end, replacement):
+        """Replace ``text[start:end]`` of the original text with *replacement*."""
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Invalid splice range {start}:{end}")
+        self._edits[start] = (end, replacement)
+
+    def replace_block(self, course_id, new_block):
+        """Replace the whole block of *course_id*; a no-op if it is unchanged."""
+        start, end = self.index[course_id]
+        if self.text[start:end] == new_block:
+            self._edits.pop(start, None)
+            return False
+        self.splice(start, end, new_block)
+        return True
+
+    def edits(self):
+        """The recorded ``(start, end, replacement)`` edits, in original-text order."""
+        return [(start,) + self._edits[start] for start in sorted(self._edits)]
+
+    def render(self):
+        """Return the edited text."""
+        text = self.text
+        parts = []
+        pos = 0
+        for start in sorted(self._edits):
+            end, replacement = self._edits[start]
+            if start < pos:
+                raise ValueError(f"Overlapping edits at offset {start}")
+            parts.append(text[pos:start])
+            parts.append(replacement)
+            pos = end
+        parts.append(text[pos:])
+        return ''.join(parts)
+
+    def pieces(self):
+        """Yield the pieces of the edited text in order, without joining them."""
+        text = self.text
+        pos = 0
+        for start in sorted(self._edits):
+            end, replacement = self._edits[start]
+            if start < pos:
+                raise ValueError(f"Overlapping edits at offset {start}")
+            if start > pos:
+                yield text[pos:start]
+            if replacement:
+                yield replacement
+            pos = end
+        if pos < len(text):
+            yield text[pos:]
+
+    def write(self, f):
+        """Write the edited text to file object *f* piece by piece."""
+        for piece in self.pieces():
+            f.write(piece)
+
+    def apply(self, ruleset, pos=0, endpos=None):
+        """
+        Apply a RuleSet to the edited text without rendering it.
+
+        Original text between edits is scanned in place and each match is
+        recorded as a splice; replacement pieces are rewritten on their
+        own. A match never spans an edit boundary. With *pos* and *endpos*
+        only ``text[pos:endpos]`` and the edits starting in it are
+        rewritten. Returns the rule hits.
+        """
+        text = self.text
+        if endpos is None:
+            endpos = len(text)
+        counts = {rule.name: 0 for rule in ruleset}
+        edits = {}
+        inside = []
+        for start, edit in self._edits.items():
+            if pos <= start < endpos:
+                inside.append(start)
+            else:
+                edits[start] = edit
+                # Original text an earlier edit replaces is not there to scan
+                if start < pos < edit[0]:
+                    pos = edit[0]
+        inside.sort()
+        for start in inside + [None]:
+            gap_end = endpos if start is None else start
+            if gap_end > pos:
+                matches, hits = ruleset.edits(text, pos, gap_end)
+                for match_start, match_end, replacement in matches:
+                    edits[match_start] = (match_end, replacement)
+                for name, count in hits.items():
+                    counts[name] += count
+            if start is None:
+                break
+            end, replacement = self._edits[start]
+            if start < pos:
+                raise ValueError(f"Overlapping edits at offset {start}")
+            replacement, hits = ruleset.subn(replacement)
+            edits[start] = (end, replacement)
+            for name, count in hits.items():
+                counts[name] += count
+            pos = end
+        self._edits = edits
+        return counts
@@ -0,0 +1,130 @@
+"""
+Content-addressed cache of cleaned segments.
+
+CleanCache stores clean_segment() results in SQLite under the key
+(SHA-256 of the segment, rules_digest(), VM-only flag). Unchanged blocks
+are looked up instead of cleaned; changing a block only misses that
+block, and changing any rule changes the digest and misses everything.
+Rows left over from other rule versions are dropped when the cache opens.
+
+The result for the last whole file is kept as well, keyed by the file's
+hash and the set of VM-only courses, so rerunning on unchanged input
+costs one hash and one lookup.
+"""
+
+import json
+import sqlite3
+import hashlib
+
+from .clean import rules_digest
+
+__all__ = ['DEFAULT_CACHE_PATH', 'CleanCache']
+
+DEFAULT_CACHE_PATH = '.lab-clean-cache.sqlite'
+
+# Bump to invalidate every cache when the cleaning engine itself changes
+_CACHE_VERSION = 1
+
+# SQLite allows at most 999 host parameters in older builds
+_BATCH = 500
+
+
+class CleanCache:
+    """SQLite-backed ``key -> (cleaned_text, changed, {rule: hits})`` store."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, digest=None):
+        self.path = path
+        self.digest = f"{_CACHE_VERSION}:{digest or rules_digest()}"
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " block_hash TEXT NOT NULL, rules_hash TEXT NOT NULL, vm_only INTEGER NOT NULL,"
+            " cleaned TEXT NOT NULL, changed INTEGER NOT NULL, hits TEXT NOT NULL,"
+            " PRIMARY KEY (block_hash, rules_hash, vm_only)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file_hash TEXT NOT NULL, courses_hash TEXT NOT NULL, rules_hash TEXT NOT NULL,"
+            " cleaned TEXT NOT NULL, updated TEXT NOT NULL, hits TEXT NOT NULL)"
+        )
+        with self._db:
+            self._db.execute("DELETE FROM segments WHERE rules_hash != ?", (self.digest,))
+            self._db.execute("DELETE FROM files WHERE rules_hash != ?", (self.digest,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._db.close()
+
+    def key(self, text, vm_only):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest(), bool(vm_only)
+
+    def file_key(self, text, vm_only_courses):
+        courses = '\n'.join(sorted(vm_only_courses))
+        return (hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                hashlib.sha256(courses.encode('utf-8')).hexdigest())
+
+    def get_file(self, key):
+        """Return ``(cleaned_text, updated, {rule: hits})`` for a whole file, or None."""
+        row = self._db.execute(
+            "SELECT cleaned, updated, hits FROM files WHERE file_hash = ? AND courses_hash = ? AND rules_hash = ?",
+            key + (self.digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), json.loads(row[2])
+
+    def put_file(self, key, cleaned, updated, hit_counts):
+        """Keep *cleaned* as the result for a whole file, replacing the previous one."""
+        with self._db:
+            self._db.execute("DELETE FROM files")
+            self._db.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                key + (self.digest, cleaned, json.dumps(list(updated)), json.dumps(hit_counts))
+            )
+
+    def get(self, key):
+        """Return the cached result for *key*, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return ``{key: result}`` for the *keys* in the cache."""
+        wanted = set(keys)
+        found = {}
+        hashes = sorted({block_hash for block_hash, _ in wanted})
+        for i in range(0, len(hashes), _BATCH):
+            batch = hashes[i:i + _BATCH]
+            rows = self._db.execute(
+                "SELECT block_hash, vm_only, cleaned, changed, hits FROM segments"
+                f" WHERE rules_hash = ? AND block_hash IN ({','.join('?' * len(batch))})",
+                [self.digest] + batch
+            )
+            for block_hash, vm_only, cleaned, changed, hits in rows:
+                key = (block_hash, bool(vm_only))
+                if key in wanted:
+                    found[key] = (cleaned, bool(changed), json.loads(hits))
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def put(self, key, result):
+        self.put_many({key: result})
+
+    def put_many(self, results):
+        """Store ``{key: (cleaned_text, changed, {rule: hits})}``."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (block_hash, self.digest, int(vm_only), cleaned, int(changed),
+                     json.dumps({name: count for name, count in hits.items() if count}))
+                    for (block_hash, vm_only), (cleaned, changed, hits) in results.items()
+                ]
+            )
@@ -0,0 +1,99 @@
+"""
+Access to the two TypeScript data files the lab-maintenance scripts work on.
+
+`LAB_INSTRUCTIONS` (src/data/lab-instructions.ts) maps a courseId to its
+LabInstruction object; `MOCK_COURSES` (src/lib/mock-data.ts) is the array of
+Course objects that carries the `requiresAzurePortal` (Cloud Slice) flag.
+"""
+
+from .tslex import find_export
+
+LAB_INSTRUCTIONS_PATH = 'src/data/lab-instructions.ts'
+LAB_INSTRUCTIONS_BACKUP_PATH = 'src/data/lab-instructions.ts.backup'
+MOCK_DATA_PATH = 'src/lib/mock-data.ts'
+ANALYSIS_REPORT_PATH = 'lab-instructions-analysis.json'
+
+# Keywords whose presence means a lab still depends on the Azure Portal
+AZURE_KEYWORDS = [
+    'Azure Portal',
+    'portal.azure.com',
+    'Cloud Shell',
+    'Create resource',
+    'Resource Group',
+    'App Service',
+    'Virtual Network',
+    'Storage Account'
+]
+
+
+def parse_lab_instructions(text):
+    """Return the object Node of `LAB_INSTRUCTIONS`."""
+    node = find_export(text, 'LAB_INSTRUCTIONS')
+    if node.kind != 'object':
+        raise ValueError("LAB_INSTRUCTIONS is not an object literal")
+    return node
+
+
+def parse_mock_courses(text):
+    """Return the array Node of `MOCK_COURSES`."""
+    node = find_export(text, 'MOCK_COURSES')
+    if node.kind != 'array':
+        raise ValueError("MOCK_COURSES is not an array literal")
+    return node
+
+
+def _string(node):
+    return node.to_python() if node is not None and node.kind in ('string', 'template') else None
+
+
+def course_entries(instructions):
+    """Yield ``(course_id, Property)`` for every course in LAB_INSTRUCTIONS."""
+    for prop in instructions.children:
+        if prop.key is None:
+            continue
+        yield _string(prop.value.get('courseId')) or prop.key, prop
+
+
+def block_span(prop):
+    """Source span of a course block: its header comment, key and object."""
+    return prop.doc_start, prop.end
+
+
+def course_blocks(text, instructions=None, with_comments=True):
+    """
+    Return ``{course_id: block_text}`` for every course in *text*.
+
+    Blocks include the course's header comment unless *with_comments* is false.
+    """
+    if instructions is None:
+        instructions = parse_lab_instructions(text)
+    blocks = {}
+    for course_id, prop in course_entries(instructions):
+        start = prop.doc_start if with_comments else prop.start
+        blocks[course_id] = text[start:prop.end]
+    return blocks
+
+
+def course_ids(courses):
+    """Ids of the top-level Course objects in MOCK_COURSES."""
+    ids = []
+    for item in courses.children:
+        if item.kind == 'object':
+            course_id = _string(item.get('id'))
+            if course_id:
+                ids.append(course_id)
+    return ids
+
+
+def cloud_slice_course_ids(courses):
+    """Ids of the courses flagged with ``requiresAzurePortal: true``."""
+    ids = []
+    for item in courses.children:
+        if item.kind != 'object':
+            continue
+        flag = item.get('requiresAzurePortal')
+        if flag is not None and flag.to_python() is True:
+            course_id = _string(item.get('id'))
+            if course_id:
+                ids.append(course_id)
+    return ids
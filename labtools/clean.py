@@ -0,0 +1,172 @@
+"""
+VM-only cleaning rules for non-Cloud Slice courses.
+
+clean_course_section() rewrites one course block; CLEAN_RULES, the rule
+files in lab-rules/final-clean-labs/, are applied afterwards, each only
+to the blocks in its scope (labtools.scoped). Course blocks are
+independent, so clean_segments() can spread them over a process pool and
+splice the results back in their original order, and skip the segments a
+CleanCache already holds.
+"""
+
+import re
+import inspect
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profile
+from .scoped import ScopedRules
+
+__all__ = ['clean_course_section', 'CLEAN_RULES', 'rules_digest', 'clean_segment', 'clean_segments',
+           'count_references']
+
+
+def clean_course_section(course_block):
+    """Remove Azure content from a specific course section"""
+
+    # Remove Azure-specific content
+    # 1. Remove Azure from objectives: whole array elements on lines of
+    # their own, never the value of a `key: '...'` property
+    course_block = profile.sub(
+        r"^[ \t]*'Deploy(?:[^'\\\n]|\\.)*?Azure(?:[^'\\\n]|\\.)*',?[ \t]*\n",
+        "",
+        course_block,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+
+    course_block = profile.sub(
+        r"^[ \t]*'(?:[^'\\\n]|\\.)*?Azure Arc(?:[^'\\\n]|\\.)*',?[ \t]*\n",
+        "",
+        course_block,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+
+    # 2. Remove Azure from prerequisites
+    course_block = profile.sub(
+        r"'Access to Azure Portal'",
+        "'RDP access to the lab VM'",
+        course_block
+    )
+
+    # 3. Remove Azure from description
+    course_block = profile.sub(
+        r"set up hybrid management with Azure Arc",
+        "configure local server management",
+        course_block,
+        flags=re.IGNORECASE
+    )
+
+    # 4. Remove entire tasks that are Azure-specific
+    # Remove tasks with Azure Portal in action
+    course_block = profile.sub(
+        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Azure Portal[^']*'\s*\},?\n?",
+        "",
+        course_block,
+        flags=re.IGNORECASE
+    )
+
+    course_block = profile.sub(
+        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Create.*?Azure[^']*'\s*\},?\n?",
+        "",
+        course_block,
+        flags=re.IGNORECASE
+    )
+
+    course_block = profile.sub(
+        r"\{\s*step:\s*\d+,\s*action:\s*'[^']*Cloud Shell[^']*'\s*\},?\n?",
+        "",
+        course_block,
+        flags=re.IGNORECASE
+    )
+
+    # 5. Clean up comments
+    course_block = profile.sub(
+        r"/\*\*\n\s*\*.*?Azure Portal Access.*?\n\s*\*/\n",
+        "/**\n     * VM-ONLY LAB: No Azure Portal access required\n     */\n",
+        course_block,
+        flags=re.DOTALL
+    )
+
+    # 6. Clean up trailing commas
+    course_block = profile.sub(r',\s*,', ',', course_block)
+    course_block = profile.sub(r',\s*\]', ']', course_block)
+    course_block = profile.sub(r',\s*\}', '}', course_block)
+
+    return course_block
+
+
+# Replacements for any remaining references, scoped per course class
+CLEAN_RULES = ScopedRules.load('final-clean-labs')
+
+
+def rules_digest():
+    """
+    Hash of the cleaning rules: the source of clean_course_section() and
+    every rule file of CLEAN_RULES with its scope. Editing any rule or
+    scope changes it.
+    """
+    digest = hashlib.sha256(inspect.getsource(clean_course_section).encode('utf-8'))
+    digest.update(repr(CLEAN_RULES.describe()).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def clean_segment(text, vm_only, course_id=None):
+    """
+    Clean one segment of the file, the block of *course_id* (None for
+    text outside the courses): the VM-only course rules if *vm_only*,
+    then the CLEAN_RULES in scope.
+
+    Returns ``(cleaned_text, course_rules_changed_it, {rule: hits})``.
+    """
+    with profile.course(course_id):
+        cleaned = clean_course_section(text) if vm_only else text
+        changed = cleaned != text
+        cleaned, hits = CLEAN_RULES.subn(cleaned, course_id, vm_only)
+    return cleaned, changed, hits
+
+
+def _clean_segment_star(item):
+    return clean_segment(*item)
+
+
+def clean_segments(items, jobs=1, cache=None):
+    """
+    Run clean_segment() over ``(text, vm_only, course_id)`` *items*.
+
+    With *jobs* > 1 the segments are cleaned on a ProcessPoolExecutor;
+    results always come back in input order, so joining them gives the
+    same text as the serial path. With a *cache*, only segments it does
+    not hold yet are cleaned, and their results are added to it. A
+    block's text names its course, so the cache needs no course id.
+    """
+    if cache is None:
+        return _clean_segments(items, jobs)
+    keys = [cache.key(text, vm_only) for text, vm_only, _ in items]
+    results = cache.get_many(keys)
+    missing = {}
+    for key, item in zip(keys, items):
+        if key not in results:
+            missing[key] = item
+    if missing:
+        cleaned = _clean_segments(list(missing.values()), jobs)
+        new = dict(zip(missing, cleaned))
+        cache.put_many(new)
+        results.update(new)
+    return [results[key] for key in keys]
+
+
+def _clean_segments(items, jobs):
+    if jobs <= 1:
+        return [clean_segment(*item) for item in items]
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_clean_segment_star, items, chunksize=chunksize))
+
+
+def count_references(text):
+    """Remaining 'Azure Portal', 'Create ... Azure' and 'Cloud Shell' references"""
+    return (
+        len(profile.findall(r'Azure Portal', text, re.IGNORECASE)),
+        len(profile.findall(r'Create.*?Azure', text, re.IGNORECASE)),
+        len(profile.findall(r'Cloud Shell', text, re.IGNORECASE)),
+    )
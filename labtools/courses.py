@@ -0,0 +1,198 @@
+"""
+Indexed, in-memory model of `MOCK_COURSES`.
+
+CourseCatalog parses the array once into compact Course records (one
+``__slots__`` object per top-level course, mirroring the TypeScript
+``Course`` interface) and builds secondary indexes by id, code, category,
+level, tag and the ``requiresAzurePortal`` flag, so catalog queries are
+set lookups instead of scans of mock-data.ts. Nested objects that happen
+to carry an ``id`` are never mistaken for courses.
+
+set_flag() updates ``requiresAzurePortal`` on many courses in one pass,
+splicing only the affected property (or inserting it after the course's
+last property) and leaving the rest of the file byte-for-byte intact.
+"""
+
+import sys
+
+from .catalog import parse_mock_courses
+
+__all__ = ['Course', 'CourseCatalog']
+
+
+def _string(node):
+    if node is None or node.kind not in ('string', 'template'):
+        return None
+    return sys.intern(node.to_python())
+
+
+class Course:
+    """One entry of MOCK_COURSES; ``node`` is its object node in the source."""
+
+    __slots__ = ('id', 'code', 'title', 'description', 'price', 'image', 'category', 'tags', 'level',
+                 'requires_azure_portal', 'node')
+
+    def __init__(self, node):
+        self.node = node
+        self.id = _string(node.get('id'))
+        self.code = _string(node.get('code'))
+        self.title = _string(node.get('title'))
+        self.description = _string(node.get('description'))
+        price = node.get('price')
+        self.price = price.to_python() if price is not None and price.kind == 'number' else None
+        self.image = _string(node.get('image'))
+        self.category = _string(node.get('category'))
+        tags = node.get('tags')
+        self.tags = tuple(_string(tag) for tag in tags.children if _string(tag)) \
+            if tags is not None and tags.kind == 'array' else ()
+        self.level = _string(node.get('level'))
+        flag = node.get('requiresAzurePortal')
+        self.requires_azure_portal = flag.to_python() if flag is not None else None
+
+    def __repr__(self):
+        return f"<Course {self.id}>"
+
+    @property
+    def cloud_slice(self):
+        """True if the course has ``requiresAzurePortal: true``."""
+        return self.requires_azure_portal is True
+
+
+class CourseCatalog:
+    """
+    The courses of MOCK_COURSES in file order, with lookup indexes.
+
+    ``by_id`` maps an id to its Course; ``query()`` intersects the other
+    indexes. Iteration yields the courses in file order.
+    """
+
+    def __init__(self, text, courses=None):
+        self._load(text, courses)
+
+    def _load(self, text, courses=None):
+        """(Re)build the course list and the indexes from *text*."""
+        if courses is None:
+            courses = parse_mock_courses(text)
+        self.text = text
+        self.courses = []
+        for item in courses.children:
+            if item.kind == 'object':
+                course = Course(item)
+                if course.id:
+                    self.courses.append(course)
+        self.by_id = {}
+        self.by_code = {}
+        self.by_category = {}
+        self.by_level = {}
+        self.by_tag = {}
+        self.by_flag = {True: set(), False: set(), None: set()}
+        for course in self.courses:
+            self.by_id.setdefault(course.id, course)
+            if course.code:
+                self.by_code.setdefault(course.code.lower(), set()).add(course.id)
+            self.by_category.setdefault(course.category, set()).add(course.id)
+            self.by_level.setdefault(course.level, set()).add(course.id)
+            for tag in course.tags:
+                self.by_tag.setdefault(tag.lower(), set()).add(course.id)
+            flag = course.requires_azure_portal
+            self.by_flag[flag if flag in (True, False) else None].add(course.id)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def __iter__(self):
+        return iter(self.courses)
+
+    def __contains__(self, course_id):
+        return course_id in self.by_id
+
+    def __getitem__(self, course_id):
+        return self.by_id[course_id]
+
+    def get(self, course_id, default=None):
+        return self.by_id.get(course_id, default)
+
+    def ids(self):
+        """Course ids in file order."""
+        return [course.id for course in self.courses]
+
+    def cloud_slice_ids(self):
+        """Ids of the courses with ``requiresAzurePortal: true``."""
+        return self.by_flag[True]
+
+    def query(self, code=None, category=None, level=None, tag=None, requires_azure_portal=...):
+        """
+        Ids of the courses matching every given filter. Codes and tags
+        match case-insensitively; *requires_azure_portal* may be True,
+        False or None (flag absent).
+        """
+        found = None
+        for index, key in ((self.by_code, code and code.lower()), (self.by_category, category),
+                           (self.by_level, level), (self.by_tag, tag and tag.lower())):
+            if key is None:
+                continue
+            ids = index.get(key, set())
+            found = set(ids) if found is None else found & ids
+        if requires_azure_portal is not ...:
+            ids = self.by_flag[requires_azure_portal]
+            found = set(ids) if found is None else found & ids
+        return set(self.by_id) if found is None else found
+
+    def set_flag(self, course_ids, value=True):
+        """
+        Set ``requiresAzurePortal`` to *value* on every course in
+        *course_ids* and return the ids whose source changed.
+
+        The catalog is reloaded from the edited ``text``.
+        """
+        literal = 'true' if value else 'false'
+        edits = []
+        changed = []
+        for course_id in course_ids:
+            course = self.by_id.get(course_id)
+            if course is None:
+                raise KeyError(f"Unknown course {course_id!r}")
+            if course.requires_azure_portal is value:
+                continue
+            node = course.node
+            prop = node.prop('requiresAzurePortal')
+            if prop is not None:
+                edits.append((prop.value.start, prop.value.end, literal))
+            else:
+                edits.append(self._insertion(node, f"requiresAzurePortal: {literal},"))
+            changed.append(course_id)
+        if not edits:
+            return changed
+
+        edits.sort()
+        pieces = []
+        pos = 0
+        for start, end, replacement in edits:
+            pieces.append(self.text[pos:start])
+            pieces.append(replacement)
+            pos = end
+        pieces.append(self.text[pos:])
+        self._load(''.join(pieces))
+        return changed
+
+    def _insertion(self, node, prop_text):
+        """An edit adding *prop_text* as the last property of object *node*."""
+        text = self.text
+        if not node.children:
+            return node.start + 1, node.start + 1, f" {prop_text} "
+        last = node.children[-1]
+        line_start = text.rfind('\n', 0, last.start) + 1
+        indent = text[line_start:last.start]
+        if indent.strip():
+            indent = ' '
+        pos = last.end
+        # Keep the trailing comma (and any comment after it) on the last line
+        rest = text[pos:node.end - 1]
+        comma = rest.find(',')
+        if comma != -1 and not rest[:comma].strip():
+            pos += comma + 1
+            newline = text.find('\n', pos, node.end - 1)
+            if newline != -1 and text[pos:newline].strip().startswith('//'):
+                pos = newline
+            return pos, pos, f"\n{indent}{prop_text}"
+        return pos, pos, f",\n{indent}{prop_text}"
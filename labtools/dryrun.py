@@ -0,0 +1,193 @@
+"""
+Structural dry run of the cleaning rules.
+
+dry_run() runs clean_course_section() and the CLEAN_RULES in scope over
+every segment the way a real run does, but under an EditRecorder: each
+replacement a rule makes is logged with the rule, the text it matched
+and its replacement, and its offset mapped back through the earlier
+rules to the original file. Every change is then attributed to its
+course, task and instruction step with one BlockIndex lookup.
+
+Nothing is written, and no text diff of the old and new file is needed:
+building the report costs time proportional to the number of changes.
+
+The simulated output is then checked the way a real run checks what it
+is about to write (syntax.check_edits()), so the report also lists the
+problems that would make the real run refuse to write. Only the changed
+blocks are re-parsed, but assembling the simulated file for the check
+copies it once, so the check costs O(file) on top of the report.
+"""
+
+import re
+from bisect import bisect_right
+
+from . import profile
+from .blocks import BlockIndex
+from .clean import CLEAN_RULES, clean_course_section
+from .syntax import check_edits, edit_list
+
+__all__ = ['Change', 'EditRecorder', 'dry_run', 'format_changes']
+
+
+class Change:
+    """One replacement: where in the original file, which rule, and the before/after text."""
+
+    __slots__ = ('course_id', 'task_id', 'step', 'rule', 'offset', 'before', 'after')
+
+    def __init__(self, course_id, task_id, step, rule, offset, before, after):
+        self.course_id = course_id
+        self.task_id = task_id
+        self.step = step
+        self.rule = rule
+        self.offset = offset
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f"<Change {self.course_id} {self.task_id} {self.step} {self.rule!r}>"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class EditRecorder(profile.Profiler):
+    """
+    Profiler that also logs the replacements made to one tracked text.
+
+    ``track(text)`` starts a new log; profile.sub() calls on the tracked
+    text (and on each result in turn) are logged as ``(rule, start, end,
+    before, after)`` with *start* and *end* offsets into the text first
+    passed to track().
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.text = None
+        self.log = []
+        self._passes = []
+
+    def track(self, text):
+        self.text = text
+        self.log = []
+        self._passes = []
+
+    def original(self, pos):
+        """Map offset *pos* of the current text back to the tracked text."""
+        for new_starts, edits in reversed(self._passes):
+            i = bisect_right(new_starts, pos) - 1
+            if i < 0:
+                continue
+            new_start, new_end, old_start, old_end = edits[i]
+            pos = old_start if pos < new_end else old_end + pos - new_end
+        return pos
+
+    def _record_pass(self, string, replacements):
+        """Log *replacements* ``(start, end, after, rule)`` of *string* and make the result current."""
+        parts = []
+        edits = []
+        pos = 0
+        delta = 0
+        for start, end, after, rule in replacements:
+            before = string[start:end]
+            if before != after:
+                original_start = self.original(start)
+                original_end = self.original(end - 1) + 1 if end > start else original_start
+                self.log.append((rule, original_start, original_end, before, after))
+            parts.append(string[pos:start])
+            parts.append(after)
+            edits.append((start + delta, start + delta + len(after), start, end))
+            delta += len(after) - (end - start)
+            pos = end
+        if not edits:
+            return string
+        parts.append(string[pos:])
+        self._passes.append(([edit[0] for edit in edits], edits))
+        self.text = ''.join(parts)
+        return self.text
+
+    def subn(self, pattern, repl, string, count=0, flags=0, rule=None):
+        if string is not self.text:
+            return super().subn(pattern, repl, string, count, flags, rule)
+        regex = re.compile(pattern, flags) if not isinstance(pattern, re.Pattern) else pattern
+        rule = rule or profile._rule_name(pattern, flags)
+
+        def on_match(m):
+            if isinstance(repl, str) and '\\' not in repl:
+                after = repl
+            elif callable(repl):
+                after = repl(m)
+            else:
+                after = m.expand(repl)
+            return m.start(), m.end(), after, rule
+
+        replacements = self._scan(regex, string, rule, on_match, count)
+        return self._record_pass(string, replacements), len(replacements)
+
+    def replace(self, ruleset):
+        """Apply a RuleSet to the tracked text, logging each match under its rule's name."""
+        return self._record_pass(self.text, [
+            (start, end, after, rule.name) for start, end, after, rule in ruleset.matches(self.text)
+        ])
+
+
+def dry_run(text, vm_only_courses, index=None):
+    """
+    Return ``(changes, problems)``: the Changes a cleaning run would make
+    to *text*, in file order, cleaning the courses in *vm_only_courses*
+    with the VM-only rules, and the syntax Problems of the result.
+    """
+    if index is None:
+        index = BlockIndex(text)
+    segments = index.segments()
+    new_texts = []
+    changes = []
+    offset = 0
+    with EditRecorder() as recorder:
+        for course_id, segment in segments:
+            recorder.track(segment)
+            vm_only = course_id is not None and course_id in vm_only_courses
+            if vm_only:
+                with profile.course(course_id):
+                    clean_course_section(segment)
+            ruleset = CLEAN_RULES.ruleset(course_id, vm_only)
+            if ruleset is not None:
+                recorder.replace(ruleset)
+            for rule, start, _, before, after in sorted(recorder.log, key=lambda entry: entry[1]):
+                location = index.locate(offset + start)
+                changes.append(Change(*location, rule, offset + start, before, after))
+            new_texts.append(recorder.text)
+            offset += len(segment)
+    problems = check_edits(segments, edit_list(segments, new_texts), ''.join(new_texts))
+    return changes, problems
+
+
+def _clip(text, width, quote=True):
+    if quote:
+        text = repr(text)
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def format_changes(changes, width=60, problems=()):
+    """Lines of a report grouped by course, then task and step, followed by the syntax *problems*."""
+    groups = {}
+    for change in changes:
+        groups.setdefault(change.course_id, []).append(change)
+    lines = []
+    for course_id, group in groups.items():
+        lines.append(f"{course_id or '(outside courses)'}: {len(group)} change(s)")
+        location = object()
+        for change in group:
+            here = (change.task_id, change.step)
+            if here != location:
+                location = here
+                if change.task_id is None:
+                    lines.append("  outside tasks")
+                else:
+                    lines.append(f"  task {change.task_id}" + (f", step {change.step}" if change.step is not None else ''))
+            lines.append(f"    [{_clip(change.rule, 50, quote=False)}]")
+            lines.append(f"      - {_clip(change.before, width)}")
+            lines.append(f"      + {_clip(change.after, width)}")
+    if problems:
+        lines.append(f"syntax check: {len(problems)} problem(s) in the output")
+        lines.extend(f"  - {problem}" for problem in problems)
+    return lines
@@ -0,0 +1,141 @@
+"""
+Reads through mmap and atomic, skip-if-unchanged writes for the data files.
+
+read_text() decodes a file straight from a read-only memory map. Writes go
+through AtomicWriter: output is hashed while it is written to a temporary
+file in the same directory, and only when its digest differs from the
+current file does ``os.replace`` swap it in. An unchanged file is never
+touched, so its mtime stays put and Next.js does not rebuild.
+"""
+
+import os
+import mmap
+import stat
+import hashlib
+import tempfile
+
+__all__ = ['read_bytes', 'read_text', 'file_digest', 'file_signature', 'AtomicWriter', 'write_text']
+
+
+def _mapped(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        mm = _mapped(f)
+        if mm is None:
+            return b''
+        with mm:
+            return mm[:]
+
+
+def read_text(path):
+    """Read a UTF-8 text file through mmap, with universal newlines like open()."""
+    with open(path, 'rb') as f:
+        mm = _mapped(f)
+        if mm is None:
+            return ''
+        with mm:
+            text = str(mm, 'utf-8')
+            if mm.find(b'\r') == -1:
+                return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def file_digest(path):
+    """SHA-256 hex digest of the file at *path*, or None if it does not exist."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        mm = _mapped(f)
+        if mm is None:
+            return hashlib.sha256().hexdigest()
+        with mm:
+            return hashlib.sha256(mm).hexdigest()
+
+
+def file_signature(path):
+    """``(mtime_ns, size, inode)`` of *path*, or None if it does not exist; changes whenever the file does."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class AtomicWriter:
+    """
+    Text file writer that replaces *path* atomically, and only if the new
+    content differs from the current one::
+
+        with AtomicWriter(path) as f:
+            f.write(text)
+        if not f.changed:
+            print("unchanged")
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.changed = None
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._file = None
+        self._tmp_path = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+        return self
+
+    def write(self, text):
+        data = text.encode(self.encoding)
+        self._digest.update(data)
+        self._size += len(data)
+        self._file.write(data)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._file.close()
+            if exc_type is None:
+                self.changed = self._differs()
+                if self.changed:
+                    self._copy_mode()
+                    os.replace(self._tmp_path, self.path)
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+        return False
+
+    def _differs(self):
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            return True
+        return size != self._size or file_digest(self.path) != self._digest.hexdigest()
+
+    def _copy_mode(self):
+        try:
+            mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(self._tmp_path, mode)
+
+
+def write_text(path, text):
+    """Atomically write *text* (a str or an iterable of str) to *path*; return True if it changed."""
+    with AtomicWriter(path) as f:
+        if isinstance(text, str):
+            f.write(text)
+        else:
+            for piece in text:
+                f.write(piece)
+    return f.changed
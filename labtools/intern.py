@@ -0,0 +1,283 @@
+"""
+Hoist content repeated across courses into shared constant tables.
+
+Many courses carry the same prerequisite, the same Lab Environment note or
+the same instruction step word for word. intern_catalog() walks the parsed
+LAB_INSTRUCTIONS along the LabInstruction shape (labtools.syntax), groups
+identical values by a hash of their kind and parsed value, and replaces
+every copy of a value that pays for itself with a reference into a typed
+table declared above the export:
+
+    const SHARED_TEXT = { t1: 'Connect to the VM using RDP', ... } as const;
+    const SHARED_KNOWLEDGE = { k1: { type: 'note', ... }, ... } satisfies Record<string, KnowledgeBlock>;
+
+    knowledgeBlocks: [SHARED_KNOWLEDGE.k1],
+
+Only strings, string arrays and objects of an exported interface are
+hoisted, never enum values or anything holding an expression, and larger
+values go first so a value inside a hoisted one is not hoisted again.
+
+The savings are reported per course family (the letters the course id
+starts with). Bytes are exact. Heap figures are estimates for V8 with
+pointer compression: an object costs 12 bytes plus 4 per property, an
+array 24 plus 4 per element; identical string literals of one module
+already share one heap string, so hoisting strings saves bundle bytes
+only, while each hoisted object or array is allocated once instead of
+once per copy.
+
+The interned module is build output: the cleaning and export tools read
+the un-interned source, and a module that already has shared tables is
+refused.
+"""
+
+import re
+import json
+import zlib
+import hashlib
+from bisect import bisect_left
+
+from .blocks import BlockIndex, BlockEditor
+from .syntax import INTERFACES, LAB_INSTRUCTION
+from .tslex import parse_module
+
+__all__ = ['SHARED_TABLES', 'course_family', 'intern_catalog']
+
+# Hoisted value type -> (table name, key prefix); None is a string
+SHARED_TABLES = {
+    None: ('SHARED_TEXT', 't'),
+    'string[]': ('SHARED_LISTS', 'l'),
+    'InstructionStep': ('SHARED_STEPS', 's'),
+    'KnowledgeBlock': ('SHARED_KNOWLEDGE', 'k'),
+    'CodeSnippet': ('SHARED_SNIPPETS', 'c'),
+    'TaskVerification': ('SHARED_VERIFICATIONS', 'v'),
+    'Quiz': ('SHARED_QUIZZES', 'q'),
+    'Resource': ('SHARED_RESOURCES', 'r'),
+}
+
+_SHAPE_NAMES = {id(shape): name for name, shape in INTERFACES.items()}
+_TYPES_IMPORT_RE = re.compile(r"import\s*\{([^}]*)\}\s*from\s*'@/types/lab-instructions';?")
+_INDENT = '    '
+
+
+def course_family(course_id):
+    """The family of a course: the letters its id starts with (``az``, ``sc``, ``m``...)."""
+    m = re.match(r'[A-Za-z]+', course_id)
+    return m.group(0).lower() if m else course_id
+
+
+def _size(text):
+    return len(text.encode('utf-8'))
+
+
+def _plain(node):
+    """True if *node* is a literal value with nothing computed in it."""
+    if node.kind == 'template':
+        return '${' not in node.text
+    if node.kind == 'literal':
+        return node.text in ('true', 'false', 'null')
+    if node.kind == 'expr':
+        return False
+    if node.kind == 'object':
+        return all(prop.key is not None and _plain(prop.value) for prop in node.children)
+    if node.kind == 'array':
+        return all(_plain(item) for item in node.children)
+    return True
+
+
+def _heap_size(node):
+    """Estimated V8 heap bytes of one copy of *node* (see the module docstring)."""
+    if node.kind == 'object':
+        return 12 + 4 * len(node.children) + sum(_heap_size(prop.value) for prop in node.children)
+    if node.kind == 'array':
+        return 24 + 4 * len(node.children) + sum(_heap_size(item) for item in node.children)
+    return 0
+
+
+def _candidates(node, shape, course_id, found):
+    """Collect ``(node, type, course_id)`` for every hoistable value under *node*."""
+    if node.kind in ('string', 'template'):
+        if shape == 'string' and _plain(node):
+            found.append((node, None, course_id))
+        return
+    if node.kind == 'array' and isinstance(shape, list):
+        if shape[0] == 'string' and _plain(node):
+            found.append((node, 'string[]', course_id))
+        for item in node.children:
+            _candidates(item, shape[0], course_id, found)
+    elif node.kind == 'object' and isinstance(shape, dict):
+        name = _SHAPE_NAMES.get(id(shape))
+        if name in SHARED_TABLES and _plain(node):
+            found.append((node, name, course_id))
+        for prop in node.children:
+            if prop.key is None:
+                continue
+            sub = shape.get(prop.key, shape.get(prop.key + '?'))
+            if sub is not None:
+                _candidates(prop.value, sub, course_id, found)
+
+
+def _definition_text(text, node):
+    """Source of *node* re-indented to sit one level deep in a table."""
+    line_start = text.rfind('\n', 0, node.start) + 1
+    base = text[line_start:node.start]
+    base = base[:len(base) - len(base.lstrip())]
+    lines = node.text.split('\n')
+    for i in range(1, len(lines)):
+        line = lines[i]
+        lines[i] = _INDENT + (line[len(base):] if line.startswith(base) else line.lstrip())
+    return '\n'.join(lines)
+
+
+class _Spans:
+    """Sorted, non-overlapping ``[start, end)`` spans with an overlap test."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def overlaps(self, start, end):
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.ends[i - 1] > start
+
+    def add(self, start, end):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+
+def intern_catalog(text, min_bytes=1, index=None):
+    """
+    Return ``(new_text, report)`` with the values repeated across
+    LAB_INSTRUCTIONS of *text* hoisted into shared tables.
+
+    A value is hoisted when replacing its copies saves at least
+    *min_bytes* after paying for its table entry. The report holds the
+    ``bytes_before``/``bytes_after`` of the module (and gzipped), the
+    ``table_bytes`` the tables and import cost, the hoisted ``values``
+    and the savings per course ``families``.
+    """
+    if any(name.startswith('SHARED_') for name in parse_module(text)):
+        raise ValueError("The module already has shared tables; intern the un-interned source")
+    if index is None:
+        index = BlockIndex(text)
+
+    found = []
+    for course_id in index:
+        _candidates(index.props[course_id].value, LAB_INSTRUCTION, course_id, found)
+    groups = {}
+    for node, type_name, course_id in found:
+        value = json.dumps(node.to_python(), ensure_ascii=False, separators=(',', ':'))
+        key = hashlib.sha256(f"{type_name}\0{value}".encode('utf-8')).digest()
+        groups.setdefault(key, (type_name, []))[1].append((node, course_id))
+
+    # Larger values first, so a value inside a hoisted one is left alone
+    hoisted = []
+    spans = _Spans()
+    counters = {type_name: 0 for type_name in SHARED_TABLES}
+    ordered = sorted(groups.values(), key=lambda item: -min(node.end - node.start for node, _ in item[1]))
+    for type_name, group in ordered:
+        if len(group) < 2:
+            continue
+        copies = [(node, course_id) for node, course_id in group if not spans.overlaps(node.start, node.end)]
+        if len(copies) < 2:
+            continue
+        table, prefix = SHARED_TABLES[type_name]
+        reference = f"{table}.{prefix}{counters[type_name] + 1}"
+        entry = f"{_INDENT}{prefix}{counters[type_name] + 1}: {_definition_text(text, copies[0][0])},\n"
+        saved = sum(_size(node.text) - len(reference) for node, _ in copies) - _size(entry)
+        if saved < min_bytes:
+            continue
+        counters[type_name] += 1
+        for node, _ in copies:
+            spans.add(node.start, node.end)
+        hoisted.append((type_name, copies))
+
+    # Number each table's entries in file order
+    hoisted.sort(key=lambda item: item[1][0][0].start)
+    editor = BlockEditor(index)
+    tables = {type_name: [] for type_name in SHARED_TABLES}
+    values = []
+    families = {}
+    for type_name, copies in hoisted:
+        table, prefix = SHARED_TABLES[type_name]
+        key = f"{prefix}{len(tables[type_name]) + 1}"
+        reference = f"{table}.{key}"
+        first = copies[0][0]
+        tables[type_name].append(f"{_INDENT}{key}: {_definition_text(text, first)},\n")
+        heap = _heap_size(first)
+        for n, (node, course_id) in enumerate(copies):
+            editor.splice(node.start, node.end, reference)
+            family = families.setdefault(course_family(course_id), {
+                'courses': set(), 'copies': 0, 'bytes': 0, 'heap': 0})
+            family['courses'].add(course_id)
+            family['copies'] += 1
+            family['bytes'] += _size(node.text) - len(reference)
+            if n:
+                family['heap'] += heap
+        values.append({'reference': reference, 'type': type_name or 'string', 'copies': len(copies),
+                       'preview': first.text[:80]})
+
+    declarations = _declarations(tables)
+    table_bytes = 0
+    if declarations:
+        table_bytes = _declare(editor, text, index.instructions, declarations, tables)
+    new_text = editor.render()
+
+    for family in families.values():
+        family['courses'] = len(family['courses'])
+    report = {
+        'bytes_before': _size(text),
+        'bytes_after': _size(new_text),
+        'gzip_before': len(zlib.compress(text.encode('utf-8'), 9)),
+        'gzip_after': len(zlib.compress(new_text.encode('utf-8'), 9)),
+        'table_bytes': table_bytes,
+        'values': values,
+        'families': dict(sorted(families.items())),
+    }
+    return new_text, report
+
+
+def _declarations(tables):
+    """The TypeScript of the non-empty tables."""
+    parts = []
+    for type_name, entries in tables.items():
+        if not entries:
+            continue
+        table = SHARED_TABLES[type_name][0]
+        if type_name is None:
+            suffix = " as const"
+        else:
+            suffix = f" satisfies Record<string, {type_name}>"
+        parts.append(f"const {table} = {{\n{''.join(entries)}}}{suffix};\n")
+    return parts
+
+
+def _declare(editor, text, instructions, declarations, tables):
+    """Splice the tables and the interface imports they need in front of the export; return their size."""
+    header = "// Content shared by several courses, hoisted by intern-lab-instructions.py\n"
+    block = header + '\n'.join(declarations) + '\n'
+    needed = {type_name for type_name, entries in tables.items() if entries and type_name in INTERFACES}
+    export_start = text.rfind('\n', 0, instructions.start) + 1
+    m = None
+    for m in _TYPES_IMPORT_RE.finditer(text, 0, export_start):
+        pass
+    size = _size(block)
+    if m is not None:
+        names = [name.strip() for name in m.group(1).split(',') if name.strip()]
+        missing = sorted(needed - set(names))
+        if missing:
+            statement = "import { " + ', '.join(names + missing) + " } from '@/types/lab-instructions';"
+            editor.splice(m.start(), m.end(), statement)
+            size += _size(statement) - _size(m.group(0))
+        pos = text.find('\n', m.end())
+        pos = len(text) if pos == -1 else pos + 1
+        block = '\n' + block
+        size += 1
+    else:
+        pos = 0
+        if needed:
+            statement = "import { " + ', '.join(sorted(needed)) + " } from '@/types/lab-instructions';\n\n"
+            block = statement + block
+            size += _size(statement)
+    editor.splice(pos, pos, block)
+    return size
@@ -0,0 +1,164 @@
+"""
+Keyword inverted index over the lab instructions.
+
+KeywordIndex finds every occurrence of the Azure keywords in one scan of
+the text and records, per keyword, where it occurs: the course, the task
+id and the instruction step number (None where the text is outside a
+course, task or step). Course header comments are outside the course.
+
+Counts match ``len(re.findall(keyword, text, re.IGNORECASE))`` for each
+keyword. A single scan finds every offset where any keyword starts; each
+keyword then accepts the first of its matches that starts at or after
+the end of its previous match, as findall does.
+
+KeywordIndex.cached() keeps the index in ``.lab-keywords.json`` in the
+working directory, beside the snapshot store and the clean cache rather
+than in src/. The cache is reused while it is for the same source file and
+that file's size and mtime (or, failing that, its SHA-256) and the keyword
+list are unchanged.
+"""
+
+import os
+import re
+import json
+import hashlib
+
+from .blocks import BlockIndex
+from .catalog import AZURE_KEYWORDS
+from .fileio import read_text
+
+__all__ = ['DEFAULT_KEYWORDS_PATH', 'INDEX_KEYWORDS', 'KeywordIndex']
+
+# AZURE_KEYWORDS plus the extra pattern final-clean-labs.py verifies
+INDEX_KEYWORDS = AZURE_KEYWORDS + ['Create.*?Azure']
+
+DEFAULT_KEYWORDS_PATH = '.lab-keywords.json'
+
+_CACHE_VERSION = 2
+
+
+class KeywordIndex:
+    """
+    ``{keyword: [(course_id, task_id, step, offset), ...]}`` for *text*.
+
+    *block_index* may be passed to reuse an existing parse; it must be
+    built with ``with_comments=False``.
+    """
+
+    def __init__(self, text, keywords=INDEX_KEYWORDS, block_index=None):
+        self.keywords = list(keywords)
+        self.entries = {keyword: [] for keyword in self.keywords}
+        if block_index is None:
+            block_index = BlockIndex(text, with_comments=False)
+        self.course_ids = list(block_index)
+
+        regexes = [re.compile(keyword, re.IGNORECASE) for keyword in self.keywords]
+        candidates = '(?=' + '|'.join(f"(?:{k})" for k in self.keywords) + ')'
+        if all(keyword[:1].isalnum() for keyword in self.keywords):
+            # A leading character class lets the engine skip most positions
+            first = sorted({c for keyword in self.keywords for c in (keyword[0].lower(), keyword[0].upper())})
+            candidates = f"(?=[{''.join(first)}])" + candidates
+        candidates = re.compile(candidates, re.IGNORECASE)
+        next_allowed = [0] * len(regexes)
+        for candidate in candidates.finditer(text):
+            pos = candidate.start()
+            location = None
+            for i, regex in enumerate(regexes):
+                if pos < next_allowed[i]:
+                    continue
+                match = regex.match(text, pos)
+                if match is None:
+                    continue
+                # findall() moves one past an empty match
+                next_allowed[i] = match.end() if match.end() > pos else pos + 1
+                if location is None:
+                    location = block_index.locate(pos)
+                self.entries[self.keywords[i]].append(location + (pos,))
+
+    def count(self, keyword, course_id=None):
+        """Occurrences of *keyword*, in the whole file or in one course."""
+        if course_id is None:
+            return len(self.entries[keyword])
+        return sum(1 for entry in self.entries[keyword] if entry[0] == course_id)
+
+    def counts(self):
+        """Return ``{keyword: occurrences}`` for the whole file."""
+        return {keyword: len(entries) for keyword, entries in self.entries.items()}
+
+    def by_course(self, keyword):
+        """Return ``{course_id: occurrences}`` for the courses mentioning *keyword*."""
+        counts = {}
+        for course_id, _, _, _ in self.entries[keyword]:
+            if course_id is not None:
+                counts[course_id] = counts.get(course_id, 0) + 1
+        return counts
+
+    def courses(self, keyword):
+        """Courses mentioning *keyword*, in file order."""
+        return list(self.by_course(keyword))
+
+    def locations(self, keyword, course_id=None):
+        """Return ``[(course_id, task_id, step, offset)]`` for *keyword*."""
+        return [entry for entry in self.entries[keyword] if course_id is None or entry[0] == course_id]
+
+    # -- cache --------------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            'keywords': self.keywords,
+            'course_ids': self.course_ids,
+            'entries': {keyword: [list(entry) for entry in entries] for keyword, entries in self.entries.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls.__new__(cls)
+        index.keywords = data['keywords']
+        index.course_ids = data['course_ids']
+        index.entries = {keyword: [tuple(entry) for entry in entries] for keyword, entries in data['entries'].items()}
+        return index
+
+    def save(self, path, text, cache=DEFAULT_KEYWORDS_PATH):
+        """Write the *cache* file for source file *path*, whose content is *text*."""
+        stat = os.stat(path)
+        data = {
+            'version': _CACHE_VERSION,
+            'source': os.path.abspath(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        }
+        data.update(self.to_dict())
+        with open(cache, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def cached(cls, path, keywords=INDEX_KEYWORDS, text=None, block_index=None, cache=DEFAULT_KEYWORDS_PATH):
+        """
+        Return the index of file *path*, from the *cache* file when still
+        valid; otherwise build it, save the cache and return it. Pass the
+        file's *text* (and its *block_index*) when already loaded.
+        """
+        stat = os.stat(path)
+        data = None
+        try:
+            with open(cache, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if (data is not None and data.get('version') == _CACHE_VERSION and data.get('keywords') == list(keywords)
+                and data.get('source') == os.path.abspath(path)):
+            if data['size'] == stat.st_size and data['mtime_ns'] == stat.st_mtime_ns:
+                return cls.from_dict(data)
+            if text is None:
+                text = read_text(path)
+            if hashlib.sha256(text.encode('utf-8')).hexdigest() == data['sha256']:
+                # Touched but unchanged; refresh the stamp
+                index = cls.from_dict(data)
+                index.save(path, text, cache)
+                return index
+        if text is None:
+            text = read_text(path)
+        index = cls(text, keywords, block_index)
+        index.save(path, text, cache)
+        return index
@@ -0,0 +1,228 @@
+"""
+Near-duplicate tasks (or whole courses) across the lab catalog.
+
+Courses are often cloned and tweaked, and a rule fix applied to one copy
+then misses the others. find_near_duplicates() finds them without
+comparing every pair:
+
+* each unit (a task: its title, description and instruction steps; or a
+  whole course) is normalized and cut into overlapping word shingles;
+* a MinHash signature of *num_perm* values summarizes its shingle set.
+  It is a one-permutation MinHash: the 64-bit shingle hashes are split
+  into *num_perm* bins and each bin keeps its smallest hash, and an
+  empty bin borrows from the next filled one (rotation densification).
+  Two signatures agree in about as many bins as the Jaccard similarity
+  of the sets, for one pass over the shingles instead of one per hash
+  function;
+* LSH splits each signature into bands and buckets the units by band, so
+  only units that collide in some band become candidates;
+* candidates are confirmed with the exact Jaccard similarity of their
+  shingle sets and joined into clusters.
+
+Bands and rows per band are chosen so a pair at *threshold* becomes a
+candidate with 95% probability (more similar pairs even more likely).
+Within a bucket a unit is compared with one representative of each
+cluster already there, not with every member, so a bucket holding k
+copies of one task costs k - 1 comparisons rather than k(k - 1)/2. A unit
+close to some member of a cluster but not to its representative is left
+out of that bucket's cluster; the other bands usually join it anyway.
+"""
+
+import re
+import hashlib
+
+from .stream import iter_course_blocks
+
+__all__ = ['Unit', 'Cluster', 'lab_units', 'lsh_params', 'find_near_duplicates']
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['.-][a-z0-9]+)*")
+
+
+class Unit:
+    """One compared piece of a course: ``task_id`` is None for a whole course."""
+
+    __slots__ = ('course_id', 'task_id', 'title', 'text')
+
+    def __init__(self, course_id, task_id, title, text):
+        self.course_id = course_id
+        self.task_id = task_id
+        self.title = title
+        self.text = text
+
+    def __repr__(self):
+        return f"<Unit {self.label}>"
+
+    @property
+    def label(self):
+        return self.course_id if self.task_id is None else f"{self.course_id}/{self.task_id}"
+
+
+class Cluster:
+    """Near-duplicate ``units`` and the exact Jaccard similarity of each confirmed pair."""
+
+    __slots__ = ('units', 'pairs')
+
+    def __init__(self, units, pairs):
+        self.units = units
+        self.pairs = pairs
+
+    def __repr__(self):
+        return f"<Cluster of {len(self.units)}>"
+
+    @property
+    def courses(self):
+        return sorted({unit.course_id for unit in self.units})
+
+    @property
+    def min_similarity(self):
+        return min(similarity for _, _, similarity in self.pairs)
+
+    def to_dict(self):
+        return {
+            'units': [{'courseId': unit.course_id, 'taskId': unit.task_id, 'title': unit.title}
+                      for unit in self.units],
+            'courses': self.courses,
+            'minSimilarity': round(self.min_similarity, 4),
+            'pairs': [[a.label, b.label, round(similarity, 4)] for a, b, similarity in self.pairs],
+        }
+
+
+def _task_text(task):
+    parts = [task.get('title'), task.get('description')]
+    for step in task.get('instructions') or ():
+        if isinstance(step, dict):
+            parts += [step.get('action'), step.get('context')]
+    return '\n'.join(part for part in parts if isinstance(part, str))
+
+
+def lab_units(f, level='task'):
+    """
+    Yield the Units of the lab instructions file object *f*: one per task
+    with *level* ``'task'``, one per course with ``'course'``.
+    """
+    for block in iter_course_blocks(f):
+        if block.value.kind != 'object':
+            continue
+        lab = block.value.to_python()
+        tasks = [task for task in lab.get('tasks') or () if isinstance(task, dict)]
+        if level == 'course':
+            yield Unit(block.course_id, None, lab.get('title'), '\n'.join(_task_text(task) for task in tasks))
+            continue
+        for n, task in enumerate(tasks, 1):
+            task_id = task.get('id') if isinstance(task.get('id'), str) else str(n)
+            yield Unit(block.course_id, task_id, task.get('title'), _task_text(task))
+
+
+def _shingles(text, size):
+    """64-bit hashes of the *size*-word shingles of *text*, ignoring case and markup."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        words = words and [' '.join(words)]
+        size = 1
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=8).digest(), 'big')
+        for i in range(len(words) - size + 1)
+    }
+
+
+def lsh_params(num_perm, threshold, recall=0.95):
+    """
+    ``(bands, rows)`` for *num_perm* hash values: the most rows per band
+    (the fewest chance collisions) that still make a pair of similarity
+    *threshold* a candidate with probability at least *recall*.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+def _signature(hashes, num_perm):
+    bins = [None] * num_perm
+    for h in hashes:
+        i, value = h % num_perm, h // num_perm
+        if bins[i] is None or value < bins[i]:
+            bins[i] = value
+    if None in bins:
+        # Walk right to left so each empty bin sees the next filled one;
+        # the distance is folded in so different borrows never collide
+        last = next(i for i in range(num_perm - 1, -1, -1) if bins[i] is not None)
+        borrowed, distance = bins[last], 0
+        for i in range(last + num_perm - 1, last, -1):
+            i %= num_perm
+            if bins[i] is not None:
+                borrowed, distance = bins[i], 0
+            else:
+                distance += 1
+                bins[i] = (distance << 64) | borrowed
+    return tuple(bins)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(units, threshold=0.8, num_perm=128, shingle_size=3):
+    """
+    Cluster *units* whose shingle sets have a Jaccard similarity of at
+    least *threshold*. Returns ``(clusters, stats)``: the Clusters, largest
+    first, and a dict with the ``units``, ``bands``, ``rows``, LSH
+    ``candidates`` and ``confirmed`` pair counts.
+    """
+    units = list(units)
+    bands, rows = lsh_params(num_perm, threshold)
+
+    shingles = []
+    buckets = [{} for _ in range(bands)]
+    for i, unit in enumerate(units):
+        hashes = _shingles(unit.text, shingle_size)
+        shingles.append(hashes)
+        if not hashes:
+            continue
+        signature = _signature(hashes, num_perm)
+        for band in range(bands):
+            # Bands take every bands-th bin: neighbouring bins share borrowed
+            # values after densification and would make bands collide together
+            buckets[band].setdefault(signature[band:bands * rows:bands], []).append(i)
+
+    parent = list(range(len(units)))
+    pairs = []
+    candidates = 0
+    for band_buckets in buckets:
+        for members in band_buckets.values():
+            # The first member of each cluster seen in this bucket
+            representatives = []
+            for i in members:
+                joined = False
+                for j in representatives:
+                    if _find(parent, i) == _find(parent, j):
+                        joined = True
+                        continue
+                    candidates += 1
+                    a, b = shingles[i], shingles[j]
+                    similarity = len(a & b) / len(a | b)
+                    if similarity >= threshold:
+                        parent[_find(parent, i)] = _find(parent, j)
+                        pairs.append((j, i, similarity))
+                        joined = True
+                if not joined:
+                    representatives.append(i)
+
+    groups = {}
+    for i in range(len(units)):
+        groups.setdefault(_find(parent, i), []).append(i)
+    pairs_by_root = {}
+    for i, j, similarity in pairs:
+        pairs_by_root.setdefault(_find(parent, i), []).append((units[i], units[j], similarity))
+    clusters = [
+        Cluster([units[i] for i in members], pairs_by_root[root])
+        for root, members in groups.items() if len(members) > 1
+    ]
+    clusters.sort(key=lambda cluster: (-len(cluster.units), cluster.units[0].label))
+    stats = {'units': len(units), 'bands': bands, 'rows': rows, 'candidates': candidates, 'confirmed': len(pairs)}
+    return clusters, stats
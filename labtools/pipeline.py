@@ -0,0 +1,356 @@
+"""
+In-process analyze -> clean -> verify pipeline over one parsed model.
+
+CatalogModel reads `MOCK_COURSES` and `LAB_INSTRUCTIONS` once and parses
+each once. Every stage works from that model: analyze() derives the
+report that used to round-trip through lab-instructions-analysis.json,
+clean() cleans the indexed course blocks, and verify() counts what is left
+in the cleaned segments clean() returned, per course, without re-reading
+or re-parsing the output.
+
+IncrementalPipeline repeats the run after every change (see watch.py). It
+re-parses only the course blocks an edit touched and redoes the per-block
+work only for blocks whose hash changed.
+"""
+
+import re
+import time
+import hashlib
+from bisect import bisect_right
+
+from .blocks import BlockIndex
+from .catalog import (
+    AZURE_KEYWORDS,
+    LAB_INSTRUCTIONS_PATH,
+    MOCK_DATA_PATH,
+    parse_mock_courses,
+    course_entries,
+    course_ids,
+    cloud_slice_course_ids,
+)
+from .clean import CLEAN_RULES, clean_segments, count_references
+from .fileio import read_text, write_text
+from .syntax import check_edits, edit_list
+from .tslex import TSSyntaxError, parse_value, tokenize
+
+__all__ = ['STAGES', 'CatalogModel', 'IncrementalPipeline', 'analyze', 'clean', 'verify', 'block_body']
+
+STAGES = ('analyze', 'clean', 'verify')
+
+
+class CatalogModel:
+    """The parsed mock data and lab instructions shared by every stage."""
+
+    def __init__(self, lab_text, mock_text, courses=None):
+        self.lab_text = lab_text
+        self.courses = parse_mock_courses(mock_text) if courses is None else courses
+        self.index = BlockIndex(lab_text)
+
+    @classmethod
+    def load(cls, lab_path=LAB_INSTRUCTIONS_PATH, mock_path=MOCK_DATA_PATH):
+        return cls(read_text(lab_path), read_text(mock_path))
+
+
+def analyze(model, keywords=True):
+    """
+    Return the analysis report: the four course lists written to
+    lab-instructions-analysis.json plus ``keyword_counts`` (unless
+    *keywords* is false).
+    """
+    with_instructions = {course_id for course_id, _ in course_entries(model.index.instructions)}
+    report = _course_report(model.courses, with_instructions)
+    if keywords:
+        report["keyword_counts"] = {
+            keyword: len(re.findall(keyword, model.lab_text, re.IGNORECASE))
+            for keyword in AZURE_KEYWORDS
+        }
+    return report
+
+
+def _course_report(courses, with_instructions):
+    cloud_slice = set(cloud_slice_course_ids(courses))
+    non_cloud = set(course_ids(courses)) - cloud_slice
+    return {
+        "cloud_slice_courses": sorted(cloud_slice),
+        "non_cloud_slice_courses": sorted(non_cloud),
+        "courses_with_instructions": sorted(with_instructions),
+        "non_cloud_with_instructions": sorted(with_instructions & non_cloud),
+    }
+
+
+def clean(model, vm_only_courses, jobs=1, cache=None):
+    """
+    Clean every segment of the lab instructions, skipping the segments
+    held by *cache* (a CleanCache).
+
+    Returns ``(segments, updated, hit_counts)``: the cleaned
+    ``(course_id, text)`` segments in file order, the courses the VM-only
+    rules changed and the CLEAN_RULES hits.
+    """
+    return _clean(model.index.segments(), vm_only_courses, jobs, cache)
+
+
+def _clean(segments, vm_only_courses, jobs, cache):
+    results = clean_segments(
+        [(text, course_id in vm_only_courses, course_id) for course_id, text in segments],
+        jobs,
+        cache
+    )
+    cleaned = []
+    updated = []
+    hit_counts = {rule.name: 0 for rule in CLEAN_RULES}
+    for (course_id, _), (text, changed, hits) in zip(segments, results):
+        cleaned.append((course_id, text))
+        if changed:
+            updated.append(course_id)
+        for name, count in hits.items():
+            hit_counts[name] += count
+    return cleaned, updated, hit_counts
+
+
+def block_body(text):
+    """Return a course segment without its leading comments."""
+    for kind, start, _ in tokenize(text):
+        if kind not in ('ws', 'line_comment', 'block_comment'):
+            return text[start:]
+    return ''
+
+
+def verify(segments, memo=None):
+    """
+    Count the remaining references in ``(course_id, text)`` *segments*.
+
+    Returns ``(totals, per_course)``: the ``count_references()`` tuple for
+    the whole file and, for each course, the tuple for its block body.
+    *memo*, a dict, keeps the counts of segment texts across calls.
+    """
+    totals = [0, 0, 0]
+    per_course = {}
+    for course_id, text in segments:
+        if memo is not None and (course_id, text) in memo:
+            counts, body_counts = memo[course_id, text]
+            if course_id is not None:
+                per_course[course_id] = body_counts
+        elif course_id is None:
+            counts = count_references(text)
+        else:
+            body = block_body(text)
+            counts = per_course[course_id] = count_references(body)
+            if len(body) != len(text):
+                # The header comment ends on its own line, so no match spans it
+                header = count_references(text[:len(text) - len(body)])
+                counts = tuple(a + b for a, b in zip(counts, header))
+        if memo is not None:
+            memo[course_id, text] = (counts, per_course.get(course_id))
+        for i, count in enumerate(counts):
+            totals[i] += count
+    return tuple(totals), per_course
+
+
+def _common_affixes(old, new, chunk=4096):
+    """Lengths of the common prefix and (non-overlapping) suffix of two strings."""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix + chunk <= limit and old[prefix:prefix + chunk] == new[prefix:prefix + chunk]:
+        prefix += chunk
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    limit -= prefix
+    suffix = 0
+    while suffix + chunk <= limit and old[len(old) - suffix - chunk:len(old) - suffix] == new[len(new) - suffix - chunk:len(new) - suffix]:
+        suffix += chunk
+    while suffix < limit and old[len(old) - suffix - 1] == new[len(new) - suffix - 1]:
+        suffix += 1
+    return prefix, suffix
+
+
+def _splice_segments(old_text, old_segments, new_text):
+    """
+    Return ``BlockIndex(new_text).segments()`` by re-parsing only the
+    course blocks of *old_segments* that the edit from *old_text* touches.
+
+    Returns None whenever that cannot be done safely (the edit reaches the
+    header or footer, the re-parsed region does not stand on its own, or
+    course ids collide); the caller then parses the whole file.
+    """
+    prefix, suffix = _common_affixes(old_text, new_text)
+    if prefix == len(old_text) == len(new_text):
+        return old_segments
+    starts = []
+    pos = 0
+    for _, text in old_segments:
+        starts.append(pos)
+        pos += len(text)
+    lo = max(prefix - 1, 0)
+    hi = max(len(old_text) - suffix, prefix)
+    i = bisect_right(starts, lo) - 1
+    j = bisect_right(starts, hi) - 1
+    if old_segments[i][0] is None:
+        i -= 1
+    if old_segments[j][0] is None:
+        j += 1
+    if i < 1 or j >= len(old_segments) - 1:
+        return None
+
+    start = starts[i]
+    end = starts[j] + len(old_segments[j][1]) + len(new_text) - len(old_text)
+    region = '{' + new_text[start:end] + '}'
+    try:
+        node = parse_value(region)
+    except TSSyntaxError:
+        return None
+    if node.kind != 'object' or node.end != len(region) or not node.children:
+        return None
+    # Anything but whitespace around the re-parsed properties (a stray comma
+    # or comment) could read differently in context
+    if region[1:node.children[0].doc_start].strip() or region[node.children[-1].end:-1].strip():
+        return None
+
+    middle = []
+    pos = 1
+    for course_id, prop in course_entries(node):
+        if prop.doc_start > pos:
+            middle.append((None, region[pos:prop.doc_start]))
+        middle.append((course_id, region[prop.doc_start:prop.end]))
+        pos = prop.end
+    if pos < len(region) - 1:
+        middle.append((None, region[pos:-1]))
+
+    outside = {course_id for course_id, _ in old_segments[:i] + old_segments[j + 1:]}
+    ids = [course_id for course_id, _ in middle if course_id is not None]
+    if len(set(ids)) != len(ids) or outside.intersection(ids):
+        return None
+
+    segments = []
+    for course_id, text in old_segments[:i] + middle + old_segments[j + 1:]:
+        if course_id is None and segments and segments[-1][0] is None:
+            segments[-1] = (None, segments[-1][1] + text)
+        else:
+            segments.append((course_id, text))
+    return segments
+
+
+class IncrementalPipeline:
+    """
+    Analyze -> clean -> verify that can be re-run after every edit.
+
+    Each run re-reads the inputs, re-parses the course blocks an edit
+    touched (the whole file when that is not possible, the mock data only
+    when it changed) and compares block hashes with the previous run. Only
+    changed or reclassified segments are cleaned again (through *cache*, a
+    CleanCache, if given) and spliced into the previous run's output, and
+    verification counts only those again through a memo. With
+    *output_path* None nothing is cleaned or written and the input itself
+    is verified. Cleaned blocks that changed are syntax-checked first
+    (labtools.syntax); while any has a problem the output is not written.
+
+    After a run, ``text`` and ``segments`` hold the lab instructions read
+    and their (uncleaned) segments, ``courses`` the MOCK_COURSES node and
+    ``vm_only`` the courses the VM-only rules apply to.
+    """
+
+    def __init__(self, lab_path, mock_path, output_path=None, cache=None, jobs=1):
+        self.lab_path = lab_path
+        self.mock_path = mock_path
+        self.output_path = output_path
+        self.cache = cache
+        self.jobs = jobs
+        self.hashes = {}
+        self.vm_only = set()
+        self.courses = None
+        self.text = None
+        self.segments = None
+        self._mock_text = None
+        self._memo = {}
+        # clean_segments() result of each (course_id, text, vm_only) of the last run
+        self._cleaned = {}
+        # Courses whose cleaned block failed the syntax check last time
+        self._broken = set()
+
+    def run(self):
+        """
+        Process the current inputs. Returns a dict with the ``changed``
+        and ``removed`` courses, the changed courses the VM-only rules
+        ``updated``, the ``report``, the verification ``totals`` and
+        ``per_course`` counts, the syntax ``problems`` of the cleaned
+        blocks, whether the output was ``written`` and the elapsed
+        ``seconds``.
+        """
+        start = time.perf_counter()
+        mock_text = read_text(self.mock_path)
+        if mock_text != self._mock_text:
+            self._mock_text = mock_text
+            self.courses = parse_mock_courses(mock_text)
+        lab_text = read_text(self.lab_path)
+        segments = None
+        if self.segments is not None:
+            segments = _splice_segments(self.text, self.segments, lab_text)
+        if segments is None:
+            segments = BlockIndex(lab_text).segments()
+        self.text = lab_text
+        self.segments = segments
+
+        report = _course_report(self.courses, {course_id for course_id, _ in segments if course_id is not None})
+        vm_only = set(report['non_cloud_with_instructions'])
+
+        hashes = {
+            course_id: hashlib.sha256(text.encode('utf-8')).hexdigest()
+            for course_id, text in segments if course_id is not None
+        }
+        changed = [
+            course_id for course_id in hashes
+            if hashes[course_id] != self.hashes.get(course_id)
+            or (course_id in vm_only) != (course_id in self.vm_only)
+        ]
+        removed = [course_id for course_id in self.hashes if course_id not in hashes]
+
+        updated = []
+        problems = []
+        written = False
+        changed_set = set(changed)
+        if self.output_path is not None:
+            original = segments
+            segments, updated = self._clean(segments, vm_only)
+            output = ''.join(text for _, text in segments)
+            problems = check_edits(original, edit_list(original, [text for _, text in segments]), output,
+                                   changed_set | self._broken)
+            self._broken = {problem.course_id for problem in problems}
+            if not problems:
+                written = write_text(self.output_path, output)
+        updated = [course_id for course_id in updated if course_id in changed_set]
+
+        memo = self._memo
+        totals, per_course = verify(segments, memo)
+        # Keep only the counts of the current segments
+        self._memo = {key: memo[key] for key in segments}
+
+        self.hashes = hashes
+        self.vm_only = vm_only
+        return {
+            'changed': changed,
+            'removed': removed,
+            'updated': updated,
+            'report': report,
+            'totals': totals,
+            'per_course': per_course,
+            'problems': problems,
+            'written': written,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _clean(self, segments, vm_only):
+        """
+        ``(cleaned_segments, updated)`` of *segments*: the segments of the
+        last run with the same text and classification keep their cleaned
+        text, and only the others go to clean_segments().
+        """
+        keys = [(course_id, text, course_id in vm_only) for course_id, text in segments]
+        missing = [key for key in dict.fromkeys(keys) if key not in self._cleaned]
+        results = []
+        if missing:
+            results = clean_segments([(text, flag, course_id) for course_id, text, flag in missing],
+                                     self.jobs, self.cache)
+        cleaned = {key: self._cleaned[key] for key in keys if key in self._cleaned}
+        cleaned.update(zip(missing, results))
+        self._cleaned = cleaned
+        return [(key[0], cleaned[key][0]) for key in keys], [key[0] for key in keys if cleaned[key][1]]
@@ -0,0 +1,243 @@
+"""
+In-memory catalog behind the local preview service (serve-lab-preview.py).
+
+PreviewCatalog parses the lab instructions and the mock data once and
+keeps them in an IncrementalPipeline. Before answering it stats both
+files; when either changed it re-runs the pipeline, which re-parses only
+the course blocks the edit touched. Clean previews and keyword reports are
+computed on first request and memoized per course until that course's
+block or its VM-only classification changes, so repeat requests are
+dictionary lookups.
+
+Request threads share one PreviewCatalog with a single writer: refresh()
+re-runs the pipeline under ``lock`` and then publishes the new blocks and
+VM-only set together, so a request always sees one consistent
+generation. Cleaning and keyword indexing run outside the lock on the
+generation the request picked up; only storing their results in the
+memo takes the lock again. A reload that fails is retried on the next
+request, and the last good catalog is served meanwhile.
+
+make_server() wraps a PreviewCatalog in a threaded HTTP server on a TCP
+port or a Unix socket:
+
+    GET /status                         reload count, course counts, last error
+    GET /courses                        every course with its VM-only flag
+    GET /courses/<id>/preview           cleaned block, parsed LabInstruction, rule hits
+    GET /courses/<id>/keywords          keyword occurrences by task and step
+    GET /courses/<id>/keywords?cleaned=1   the same, after cleaning
+"""
+
+import json
+import time
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .blocks import BlockIndex
+from .catalog import LAB_INSTRUCTIONS_PATH, MOCK_DATA_PATH
+from .clean import clean_segment
+from .fileio import file_signature
+from .keywords import INDEX_KEYWORDS, KeywordIndex
+from .pipeline import IncrementalPipeline
+from .tslex import TSSyntaxError, parse_value
+
+__all__ = ['PreviewCatalog', 'UnknownCourseError', 'make_server']
+
+# Lets a single course block be indexed like a whole file
+_WRAPPER = 'export const LAB_INSTRUCTIONS = {\n'
+
+
+class UnknownCourseError(KeyError):
+    """The requested course id is not in the loaded catalog."""
+
+
+def _lab_object(block):
+    """The LabInstruction object of a course block, as plain Python."""
+    node = parse_value('{' + block + '}')
+    props = [prop for prop in node.children if prop.key is not None]
+    return props[0].value.to_python() if props else None
+
+
+class PreviewCatalog:
+    """The parsed catalog, refreshed from disk when the inputs change."""
+
+    def __init__(self, lab_path=LAB_INSTRUCTIONS_PATH, mock_path=MOCK_DATA_PATH):
+        self.lab_path = lab_path
+        self.mock_path = mock_path
+        self.pipeline = IncrementalPipeline(lab_path, mock_path)
+        self.lock = threading.Lock()
+        self.reloads = 0
+        self.last_reload = None
+        self.error = None
+        self._signature = None
+        # (blocks by course id, VM-only course ids) of the loaded generation
+        self._state = ({}, frozenset())
+        self._previews = {}
+        self._keywords = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reload if either input changed since the last load; return True if it did."""
+        signature = (file_signature(self.lab_path), file_signature(self.mock_path))
+        if signature == self._signature:
+            return False
+        with self.lock:
+            if signature == self._signature:
+                # Another request reloaded while this one waited
+                return False
+            try:
+                result = self.pipeline.run()
+            except (OSError, ValueError, KeyError) as e:
+                # Keep serving the last good catalog; the signature is left
+                # alone so the next request tries again
+                if self.pipeline.segments is None:
+                    raise
+                self.error = str(e)
+                return False
+            blocks = {course_id: text for course_id, text in self.pipeline.segments if course_id is not None}
+            self._state = (blocks, frozenset(self.pipeline.vm_only))
+            self._signature = signature
+            self.reloads += 1
+            self.error = None
+            self.last_reload = {'changed': result['changed'], 'removed': result['removed'],
+                                'ms': round(result['seconds'] * 1000, 2)}
+        return True
+
+    @staticmethod
+    def _block(blocks, course_id):
+        block = blocks.get(course_id)
+        if block is None:
+            raise UnknownCourseError(course_id)
+        return block
+
+    def status(self):
+        blocks, vm_only = self._state
+        return {
+            'labInstructions': self.lab_path,
+            'mockData': self.mock_path,
+            'courses': len(blocks),
+            'vmOnly': len(vm_only),
+            'reloads': self.reloads,
+            'lastReload': self.last_reload,
+            'error': self.error,
+        }
+
+    def courses(self):
+        blocks, vm_only = self._state
+        return [{'courseId': course_id, 'vmOnly': course_id in vm_only} for course_id in blocks]
+
+    def _cleaned(self, course_id, state):
+        block = self._block(state[0], course_id)
+        vm_only = course_id in state[1]
+        cached = self._previews.get(course_id)
+        if cached is not None and cached[0] == block and cached[1] == vm_only:
+            return cached[2]
+        cleaned, changed, hits = clean_segment(block, vm_only, course_id)
+        preview = {
+            'courseId': course_id,
+            'vmOnly': vm_only,
+            'changed': changed or cleaned != block,
+            'replacements': {name: count for name, count in hits.items() if count},
+            'block': cleaned,
+            'lab': _lab_object(cleaned),
+        }
+        with self.lock:
+            self._previews[course_id] = (block, vm_only, preview)
+        return preview
+
+    def preview(self, course_id):
+        """The course after cleaning: its TypeScript block, parsed object and rule hits."""
+        return self._cleaned(course_id, self._state)
+
+    def keywords(self, course_id, cleaned=False):
+        """Keyword occurrences in the course block (or its cleaned version) by task and step."""
+        state = self._state
+        block = self._cleaned(course_id, state)['block'] if cleaned else self._block(state[0], course_id)
+        key = (course_id, cleaned)
+        cached = self._keywords.get(key)
+        if cached is not None and cached[0] == block:
+            return cached[1]
+        text = _WRAPPER + block + '\n};\n'
+        index = KeywordIndex(text, INDEX_KEYWORDS, BlockIndex(text, with_comments=False))
+        report = {
+            'courseId': course_id,
+            'cleaned': cleaned,
+            'counts': index.counts(),
+            'occurrences': {
+                keyword: [
+                    {'taskId': task_id, 'step': step, 'offset': offset - len(_WRAPPER)}
+                    for _, task_id, step, offset in index.locations(keyword)
+                ]
+                for keyword in INDEX_KEYWORDS if index.count(keyword)
+            },
+        }
+        with self.lock:
+            self._keywords[key] = (block, report)
+        return report
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'LabPreview/1.0'
+    catalog = None
+    quiet = False
+
+    def address_string(self):
+        # Unix-socket peers have no address
+        return self.client_address[0] if self.client_address else 'local'
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = parse_qs(url.query)
+        catalog = self.catalog
+        try:
+            catalog.refresh()
+            if parts == ['status']:
+                body = catalog.status()
+            elif parts == ['courses']:
+                body = catalog.courses()
+            elif len(parts) == 3 and parts[0] == 'courses' and parts[2] == 'preview':
+                body = catalog.preview(parts[1])
+            elif len(parts) == 3 and parts[0] == 'courses' and parts[2] == 'keywords':
+                cleaned = query.get('cleaned', ['0'])[0] not in ('0', 'false', '')
+                body = catalog.keywords(parts[1], cleaned)
+            else:
+                return self._send(404, {'error': f"Unknown endpoint {url.path}"}, start)
+        except UnknownCourseError as e:
+            return self._send(404, {'error': f"Unknown course {e.args[0]}"}, start)
+        except (TSSyntaxError, OSError, ValueError, KeyError) as e:
+            # Includes a first load that failed in refresh(): nothing to serve yet
+            return self._send(500, {'error': str(e)}, start)
+        self._send(200, body, start)
+
+    def _send(self, status, body, start):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Server-Timing', f"app;dur={(time.perf_counter() - start) * 1000:.2f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(catalog, host='127.0.0.1', port=8765, socket_path=None, quiet=False):
+    """Return an HTTP server answering from *catalog*, on *socket_path* if given, else on *host*:*port*."""
+    handler = type('Handler', (_Handler,), {'catalog': catalog, 'quiet': quiet})
+    if socket_path is not None:
+        return _UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
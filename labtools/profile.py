@@ -0,0 +1,272 @@
+"""
+Per-rule regex profiling for the cleaning scripts.
+
+Rule call sites use the drop-in wrappers sub(), subn() and findall() from
+this module instead of the ``re`` functions. While no Profiler is active
+they forward straight to ``re``; inside ``with Profiler() as profiler:``
+every call records, per rule and per course, the wall time, the number of
+matches, the bytes matched and the bytes the engine had to scan to find
+each match (from the previous match end to this match end, a lower bound
+on what it examined). RuleSet scans are recorded as a whole and, so each
+rule's own cost is visible, every rule of the set is also timed alone.
+
+scaling_report() compares profiles taken on inputs of increasing size
+and flags rules whose cost grows faster than linearly with their input.
+"""
+
+import re
+import json
+import math
+import time
+from contextlib import contextmanager
+
+__all__ = ['Profiler', 'sub', 'subn', 'findall', 'course', 'active', 'scaling_report']
+
+_active = None
+_course = None
+
+
+def active():
+    """Return the active Profiler, or None."""
+    return _active
+
+
+@contextmanager
+def course(course_id):
+    """Attribute rule calls inside the block to *course_id*."""
+    global _course
+    previous, _course = _course, course_id
+    try:
+        yield
+    finally:
+        _course = previous
+
+
+def _rule_name(pattern, flags):
+    if isinstance(pattern, re.Pattern):
+        pattern, flags = pattern.pattern, pattern.flags & ~re.UNICODE
+    return pattern if not flags else f"{pattern} [flags={int(flags)}]"
+
+
+def subn(pattern, repl, string, count=0, flags=0, rule=None):
+    """Instrumented ``re.subn``."""
+    if _active is None:
+        return re.subn(pattern, repl, string, count=count, flags=flags)
+    return _active.subn(pattern, repl, string, count, flags, rule)
+
+
+def sub(pattern, repl, string, count=0, flags=0, rule=None):
+    """Instrumented ``re.sub``."""
+    if _active is None:
+        return re.sub(pattern, repl, string, count=count, flags=flags)
+    return _active.subn(pattern, repl, string, count, flags, rule)[0]
+
+
+def findall(pattern, string, flags=0, rule=None):
+    """Instrumented ``re.findall``."""
+    if _active is None:
+        return re.findall(pattern, string, flags)
+    return _active.findall(pattern, string, flags, rule)
+
+
+class _Stats:
+    __slots__ = ('calls', 'seconds', 'matches', 'matched_bytes', 'scanned_bytes',
+                 'max_scanned_per_match', 'input_bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.matches = 0
+        self.matched_bytes = 0
+        self.scanned_bytes = 0
+        self.max_scanned_per_match = 0
+        self.input_bytes = 0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.matches += other.matches
+        self.matched_bytes += other.matched_bytes
+        self.scanned_bytes += other.scanned_bytes
+        self.max_scanned_per_match = max(self.max_scanned_per_match, other.max_scanned_per_match)
+        self.input_bytes += other.input_bytes
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """Collects rule statistics while active (use as a context manager)."""
+
+    def __init__(self):
+        self.rules = {}
+        self.standalone = set()
+        self._previous = None
+
+    def start(self):
+        """Make this the active profiler."""
+        global _active
+        self._previous, _active = _active, self
+        return self
+
+    def stop(self):
+        global _active
+        _active = self._previous
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _record(self, rule, seconds, matches, matched, scanned, max_scanned, input_bytes):
+        per_course = self.rules.setdefault(rule, {})
+        stats = per_course.get(_course)
+        if stats is None:
+            stats = per_course[_course] = _Stats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.matches += matches
+        stats.matched_bytes += matched
+        stats.scanned_bytes += scanned
+        stats.max_scanned_per_match = max(stats.max_scanned_per_match, max_scanned)
+        stats.input_bytes += input_bytes
+
+    def _scan(self, regex, string, rule, on_match=None, count=0):
+        """Run *regex* over *string* match by match and record the statistics."""
+        matches = matched = scanned = max_scanned = 0
+        pos = 0
+        results = []
+        start = time.perf_counter()
+        for m in regex.finditer(string):
+            end = m.end()
+            step = end - pos
+            scanned += step
+            if step > max_scanned:
+                max_scanned = step
+            matched += end - m.start()
+            matches += 1
+            pos = end
+            results.append(m if on_match is None else on_match(m))
+            if count and matches >= count:
+                break
+        seconds = time.perf_counter() - start
+        if not count or matches < count:
+            scanned += len(string) - pos
+        self._record(rule, seconds, matches, matched, scanned, max_scanned, len(string))
+        return results
+
+    def subn(self, pattern, repl, string, count=0, flags=0, rule=None):
+        regex = re.compile(pattern, flags) if not isinstance(pattern, re.Pattern) else pattern
+        rule = rule or _rule_name(pattern, flags)
+        literal = isinstance(repl, str) and '\\' not in repl
+        parts = []
+        pos = 0
+
+        def on_match(m):
+            nonlocal pos
+            parts.append(string[pos:m.start()])
+            if literal:
+                parts.append(repl)
+            elif callable(repl):
+                parts.append(repl(m))
+            else:
+                parts.append(m.expand(repl))
+            pos = m.end()
+            return None
+
+        n = len(self._scan(regex, string, rule, on_match, count))
+        if not n:
+            return string, 0
+        parts.append(string[pos:])
+        return ''.join(parts), n
+
+    def findall(self, pattern, string, flags=0, rule=None):
+        regex = re.compile(pattern, flags) if not isinstance(pattern, re.Pattern) else pattern
+        rule = rule or _rule_name(pattern, flags)
+        groups = regex.groups
+
+        def on_match(m):
+            if groups == 0:
+                return m.group()
+            return m.group(1) if groups == 1 else m.groups()
+
+        return self._scan(regex, string, rule, on_match)
+
+    def record_ruleset(self, ruleset, string, seconds, counts):
+        """Record one combined RuleSet scan plus a standalone timing of each rule."""
+        self._record(ruleset.name or f"RuleSet[{len(ruleset)} rules]", seconds, sum(counts.values()), 0,
+                     len(string), 0, len(string))
+        for rule in ruleset:
+            name = f"{_rule_name(rule.pattern, rule.flags)} (standalone)"
+            self.standalone.add(name)
+            self._scan(rule.regex, string, name)
+
+    def totals(self):
+        """Return ``{rule: _Stats}`` summed over all courses."""
+        totals = {}
+        for rule, per_course in self.rules.items():
+            total = totals[rule] = _Stats()
+            for stats in per_course.values():
+                total.add(stats)
+        return totals
+
+    def report(self):
+        """
+        JSON-serialisable report, slowest rules first. Standalone timings
+        of RuleSet members are extra work and are left out of the total.
+        """
+        rows = []
+        for rule, total in sorted(self.totals().items(), key=lambda item: -item[1].seconds):
+            row = {'rule': rule, 'standalone': rule in self.standalone}
+            row.update(total.to_dict())
+            row['courses'] = {
+                course_id: stats.to_dict()
+                for course_id, stats in self.rules[rule].items()
+                if course_id is not None
+            }
+            rows.append(row)
+        return {
+            'total_seconds': sum(row['seconds'] for row in rows if not row['standalone']),
+            'rules': rows,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def scaling_report(reports, max_exponent=1.25, min_seconds=1e-4):
+    """
+    Flag rules whose cost grows super-linearly with their input.
+
+    *reports* maps a label (e.g. catalog size) to a Profiler.report(). For
+    every rule seen in at least two of them, the exponent k of
+    ``seconds ~ input_bytes ** k`` is fitted by least squares on a log-log
+    scale; rules with k above *max_exponent* are flagged. Timings below
+    *min_seconds* are too noisy to use and are skipped.
+    """
+    points = {}
+    for report in reports.values():
+        for row in report['rules']:
+            if row['seconds'] >= min_seconds and row['input_bytes'] > 0:
+                points.setdefault(row['rule'], []).append((row['input_bytes'], row['seconds']))
+    rows = []
+    for rule, samples in points.items():
+        if len({size for size, _ in samples}) < 2:
+            continue
+        xs = [math.log(size) for size, _ in samples]
+        ys = [math.log(seconds) for _, seconds in samples]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        exponent = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        rows.append({
+            'rule': rule,
+            'exponent': round(exponent, 3),
+            'super_linear': exponent > max_exponent,
+            'samples': [{'input_bytes': size, 'seconds': seconds} for size, seconds in sorted(samples)],
+        })
+    rows.sort(key=lambda row: -row['exponent'])
+    return rows
@@ -0,0 +1,199 @@
+"""
+Single-pass multi-pattern replacement engine for the cleaning rule tables.
+
+A RuleSet compiles a table of ``(pattern, replacement)`` rules into one
+alternation and applies all of them in one left-to-right scan, returning
+per-rule hit counts from that same scan.
+
+Matching is deterministic: the leftmost match in the text wins, and when
+several rules match at the same offset the one with the highest priority
+(lowest ``priority`` value, which defaults to the rule's position in the
+table) wins. Put the more specific rule first, e.g. ``In Cloud Shell,``
+before ``Cloud Shell``. Replaced text is never rescanned, so one rule can
+not rewrite the output of another.
+
+Overlaps follow table order as well: a match is dropped when a rule with
+higher priority matches text starting inside it, as it was when the rules
+ran one re.sub() after another. With ``Azure Arc`` listed before
+``in Azure``, "in Azure Arc" becomes "in local management", not
+"on the VM Arc".
+"""
+
+import re
+import time
+
+from . import profile
+
+__all__ = ['Rule', 'RuleSet']
+
+_FLAG_LETTERS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'), (re.VERBOSE, 'x'))
+
+
+def _scoped(pattern, flags):
+    letters = ''.join(letter for flag, letter in _FLAG_LETTERS if flags & flag)
+    return f"(?{letters}:{pattern})" if letters else f"(?:{pattern})"
+
+
+class Rule:
+    """One ``pattern -> replacement`` rule; *name* defaults to the pattern."""
+
+    __slots__ = ('pattern', 'replacement', 'flags', 'priority', 'name', 'regex', 'is_template')
+
+    def __init__(self, pattern, replacement, flags=0, priority=None, name=None):
+        self.pattern = pattern
+        self.replacement = replacement
+        self.flags = flags
+        self.priority = priority
+        self.name = name or pattern
+        self.regex = re.compile(pattern, flags)
+        # Replacements with group references or escapes need re.expand().
+        self.is_template = callable(replacement) or '\\' in replacement
+
+    def __repr__(self):
+        return f"<Rule {self.name!r}>"
+
+
+class RuleSet:
+    """
+    A compiled table of rules applied together in a single scan.
+
+    *rules* may be Rule instances or ``(pattern, replacement)`` tuples;
+    *flags* are the default regex flags for rules given as tuples. *name*
+    labels the set in profiles and reports.
+    """
+
+    def __init__(self, rules, flags=0, name=None):
+        self.name = name
+        self.rules = []
+        for position, rule in enumerate(rules):
+            if not isinstance(rule, Rule):
+                pattern, replacement = rule
+                rule = Rule(pattern, replacement, flags)
+            if rule.priority is None:
+                rule.priority = position
+            self.rules.append(rule)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Rule names must be unique")
+        # Python tries alternation branches in order, which gives priority
+        # among rules that match at the same offset.
+        self._ordered = sorted(self.rules, key=lambda r: r.priority)
+        self._branches = [
+            f"(?P<_r{i}>{_scoped(rule.pattern, rule.flags)})"
+            for i, rule in enumerate(self._ordered)
+        ]
+        self.regex = re.compile('|'.join(self._branches))
+        self._by_group = {f"_r{i}": rule for i, rule in enumerate(self._ordered)}
+        self._rank = {f"_r{i}": i for i in range(len(self._ordered))}
+        self._outranking = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def _outranking_regex(self, rank):
+        """The rules that win an overlap with the rule at *rank*, compiled on first use."""
+        regex = self._outranking.get(rank)
+        if regex is None:
+            regex = self._outranking[rank] = re.compile('|'.join(self._branches[:rank]))
+        return regex
+
+    def _finditer(self, text, pos, endpos):
+        """Yield the matches of one scan, dropping those that lose an overlap."""
+        regex, ranks = self.regex, self._rank
+        while pos <= endpos:
+            match = regex.search(text, pos, endpos)
+            if match is None:
+                return
+            start, end = match.span()
+            rank = ranks[match.lastgroup]
+            if rank and end - start > 1:
+                outranking = self._outranking_regex(rank).match
+                if any(outranking(text, inner, endpos) for inner in range(start + 1, end)):
+                    pos = start + 1
+                    continue
+            yield match
+            pos = end if end > start else end + 1
+
+    def _sub(self, text, replace):
+        pieces = []
+        pos = 0
+        for match in self._finditer(text, 0, len(text)):
+            pieces.append(text[pos:match.start()])
+            pieces.append(replace(match))
+            pos = match.end()
+        pieces.append(text[pos:])
+        return ''.join(pieces)
+
+    def _empty_counts(self):
+        return {rule.name: 0 for rule in self.rules}
+
+    def _replacer(self, text, counts, endpos=None):
+        by_group = self._by_group
+        if endpos is None:
+            endpos = len(text)
+
+        def replace(match):
+            rule = by_group[match.lastgroup]
+            counts[rule.name] += 1
+            if not rule.is_template:
+                return rule.replacement
+            # Re-match the rule alone so group numbers refer to its own pattern.
+            own = rule.regex.match(text, match.start(), endpos)
+            if callable(rule.replacement):
+                return rule.replacement(own)
+            return own.expand(rule.replacement)
+
+        return replace
+
+    def subn(self, text):
+        """Apply every rule in one pass; return ``(new_text, {name: hits})``."""
+        counts = self._empty_counts()
+        replace = self._replacer(text, counts)
+        profiler = profile.active()
+        if profiler is None:
+            return self._sub(text, replace), counts
+        start = time.perf_counter()
+        result = self._sub(text, replace)
+        profiler.record_ruleset(self, text, time.perf_counter() - start, counts)
+        return result, counts
+
+    def sub(self, text):
+        return self.subn(text)[0]
+
+    def edits(self, text, pos=0, endpos=None):
+        """
+        Scan ``text[pos:endpos]`` without building a new string.
+
+        Returns ``([(start, end, replacement), ...], {name: hits})`` with
+        offsets into *text*, ready to record as splices.
+        """
+        if endpos is None:
+            endpos = len(text)
+        counts = self._empty_counts()
+        replace = self._replacer(text, counts, endpos)
+        profiler = profile.active()
+        start = time.perf_counter()
+        edits = [(m.start(), m.end(), replace(m)) for m in self._finditer(text, pos, endpos)]
+        if profiler is not None:
+            profiler.record_ruleset(self, text[pos:endpos], time.perf_counter() - start, counts)
+        return edits, counts
+
+    def matches(self, text, pos=0, endpos=None):
+        """Yield ``(start, end, replacement, rule)`` for every match in ``text[pos:endpos]``."""
+        if endpos is None:
+            endpos = len(text)
+        replace = self._replacer(text, self._empty_counts(), endpos)
+        by_group = self._by_group
+        for match in self._finditer(text, pos, endpos):
+            yield match.start(), match.end(), replace(match), by_group[match.lastgroup]
+
+    def count(self, text):
+        """Return ``{name: hits}`` for *text* without replacing anything."""
+        counts = self._empty_counts()
+        by_group = self._by_group
+        for match in self._finditer(text, 0, len(text)):
+            counts[by_group[match.lastgroup].name] += 1
+        return counts
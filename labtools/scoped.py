@@ -0,0 +1,221 @@
+"""
+Declarative rule files, each applied only to the course blocks in its scope.
+
+A rule file is JSON naming the courses it applies to and its rules, which
+are tried in order like a RuleSet table:
+
+    {
+      "name": "VM-only replacements",
+      "scope": {"classes": ["vm-only"], "families": ["az"]},
+      "flags": "i",
+      "rules": [
+        {"pattern": "In Cloud Shell,?\\s*", "replacement": "In PowerShell, "},
+        {"pattern": "Cloud Shell", "replacement": "PowerShell", "name": "Cloud Shell"}
+      ]
+    }
+
+A scope selects courses by class, by family (the letters the course id
+starts with, see labtools.intern.course_family) and by id; every
+criterion that is given must match, so an empty scope covers every
+course. The classes are ``vm-only``, the courses a run cleans as
+VM-only, and ``cloud-slice``, every other course. Text outside the
+course blocks (the module header, the separators) is only rewritten by
+files with ``"outside_courses": true``.
+
+The files of one tool live in lab-rules/<tool>/ and load into a
+ScopedRules, in file name order. Each file is compiled once; for a block,
+the files whose scope covers it are merged into one RuleSet (compiled the
+first time that combination is needed), so a block is scanned once and a
+block outside every scope is not scanned at all.
+"""
+
+import os
+import re
+import json
+
+from .intern import course_family
+from .rules import Rule, RuleSet
+
+__all__ = ['RULES_DIR', 'COURSE_CLASSES', 'Scope', 'RuleFile', 'ScopedRules']
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lab-rules')
+
+COURSE_CLASSES = ('vm-only', 'cloud-slice')
+
+_FLAGS = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}
+_SCOPE_KEYS = ('classes', 'families', 'courses', 'outside_courses')
+
+
+def _flags(letters, path):
+    flags = 0
+    for letter in letters:
+        if letter not in _FLAGS:
+            raise ValueError(f"{path}: unknown regex flag {letter!r}; use some of {''.join(_FLAGS)}")
+        flags |= _FLAGS[letter]
+    return flags
+
+
+class Scope:
+    """The course blocks a rule file applies to (see the module docstring)."""
+
+    __slots__ = ('classes', 'families', 'courses', 'outside_courses')
+
+    def __init__(self, classes=(), families=(), courses=(), outside_courses=False):
+        unknown = set(classes) - set(COURSE_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown course class {sorted(unknown)[0]!r}; use {' or '.join(COURSE_CLASSES)}")
+        self.classes = frozenset(classes)
+        self.families = frozenset(family.lower() for family in families)
+        self.courses = frozenset(courses)
+        self.outside_courses = bool(outside_courses)
+
+    def __repr__(self):
+        return f"<Scope {self.to_dict()}>"
+
+    @classmethod
+    def from_dict(cls, scope):
+        unknown = set(scope) - set(_SCOPE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown scope key {sorted(unknown)[0]!r}; use {', '.join(_SCOPE_KEYS)}")
+        return cls(**scope)
+
+    def to_dict(self):
+        return {
+            'classes': sorted(self.classes),
+            'families': sorted(self.families),
+            'courses': sorted(self.courses),
+            'outside_courses': self.outside_courses,
+        }
+
+    def covers(self, course_id, vm_only):
+        """True if the block of *course_id* (None for text outside the courses) is in scope."""
+        if course_id is None:
+            return self.outside_courses
+        if self.classes and ('vm-only' if vm_only else 'cloud-slice') not in self.classes:
+            return False
+        if self.families and course_family(course_id) not in self.families:
+            return False
+        return not self.courses or course_id in self.courses
+
+
+class RuleFile:
+    """One loaded rule file: its ``name``, ``scope`` and compiled ``ruleset``."""
+
+    __slots__ = ('name', 'path', 'scope', 'ruleset')
+
+    def __init__(self, name, path, scope, ruleset):
+        self.name = name
+        self.path = path
+        self.scope = scope
+        self.ruleset = ruleset
+
+    def __repr__(self):
+        return f"<RuleFile {self.name!r} {self.path}>"
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        name = spec.get('name') or os.path.splitext(os.path.basename(path))[0]
+        try:
+            scope = Scope.from_dict(spec.get('scope', {}))
+            flags = _flags(spec.get('flags', ''), path)
+            rules = [
+                Rule(rule['pattern'], rule['replacement'], _flags(rule['flags'], path) if 'flags' in rule else flags,
+                     name=rule.get('name'))
+                for rule in spec['rules']
+            ]
+            ruleset = RuleSet(rules, name=name)
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise ValueError(f"{path}: invalid rule file: {e}") from e
+        return cls(name, path, scope, ruleset)
+
+
+class ScopedRules:
+    """
+    The rule files of one tool. Iterating yields every Rule of every
+    file; ruleset() gives the merged RuleSet for one block.
+    """
+
+    def __init__(self, files):
+        self.files = list(files)
+        seen = {}
+        for rule_file in self.files:
+            for rule in rule_file.ruleset:
+                if rule.name in seen:
+                    raise ValueError(f"{rule_file.path}: rule {rule.name!r} is also in {seen[rule.name]}")
+                seen[rule.name] = rule_file.path
+        self._merged = {}
+
+    @classmethod
+    def load(cls, tool, directory=RULES_DIR):
+        """Load ``<directory>/<tool>/*.json`` in file name order."""
+        folder = os.path.join(directory, tool)
+        names = sorted(name for name in os.listdir(folder) if name.endswith('.json'))
+        return cls(RuleFile.load(os.path.join(folder, name)) for name in names)
+
+    def __len__(self):
+        return sum(len(rule_file.ruleset) for rule_file in self.files)
+
+    def __iter__(self):
+        for rule_file in self.files:
+            yield from rule_file.ruleset
+
+    def ruleset(self, course_id, vm_only):
+        """The RuleSet for the block of *course_id* (None outside the courses), or None if no file covers it."""
+        key = tuple(n for n, rule_file in enumerate(self.files) if rule_file.scope.covers(course_id, vm_only))
+        if not key:
+            return None
+        merged = self._merged.get(key)
+        if merged is None:
+            if len(key) == 1:
+                merged = self.files[key[0]].ruleset
+            else:
+                # Earlier files win when rules of several match at one offset
+                rules = [
+                    Rule(rule.pattern, rule.replacement, rule.flags, priority, rule.name)
+                    for priority, rule in enumerate(rule for n in key for rule in self.files[n].ruleset)
+                ]
+                merged = RuleSet(rules, name=' + '.join(self.files[n].name for n in key))
+            self._merged[key] = merged
+        return merged
+
+    def subn(self, text, course_id, vm_only):
+        """Apply the rules in scope for *course_id* to *text*; return ``(new_text, {name: hits})``."""
+        ruleset = self.ruleset(course_id, vm_only)
+        if ruleset is None:
+            return text, {}
+        return ruleset.subn(text)
+
+    def apply(self, editor, vm_only_courses):
+        """
+        Apply the rules to every block of a BlockEditor's index that a
+        file covers, as more splices (see BlockEditor.apply()). Blocks
+        out of every scope are not scanned. Returns the rule hits.
+        """
+        index = editor.index
+        counts = {rule.name: 0 for rule in self}
+        pos = 0
+        spans = []
+        for course_id in index:
+            start, end = index[course_id]
+            if start > pos:
+                spans.append((None, pos, start))
+            spans.append((course_id, start, end))
+            pos = end
+        spans.append((None, pos, len(index.text)))
+        for course_id, start, end in spans:
+            ruleset = self.ruleset(course_id, course_id in vm_only_courses)
+            if ruleset is None or start == end:
+                continue
+            for name, count in editor.apply(ruleset, start, end).items():
+                counts[name] += count
+        return counts
+
+    def describe(self):
+        """``(file name, scope, [(pattern, replacement, flags, priority)])`` of each file, for digests."""
+        return [
+            (rule_file.name, rule_file.scope.to_dict(),
+             [(rule.pattern, rule.replacement, rule.flags, rule.priority) for rule in rule_file.ruleset])
+            for rule_file in self.files
+        ]
@@ -0,0 +1,199 @@
+"""
+Batched NDJSON export of the lab catalog for bulk database seeding.
+
+export_seed() streams LAB_INSTRUCTIONS one course block at a time and
+writes one JSON document per course, with exactly the fields of the app's
+``Lab`` model (src/models/Lab.ts), into ``batch-00001.ndjson``, ``batch-00002.ndjson``... of at most
+*batch_size* documents each. Each file is one ``mongoimport --mode
+upsert`` run, or one ``insertMany`` call once every line has gone
+through ``EJSON.parse()``: the lines are Extended JSON, not plain JSON.
+
+Every field the Lab model requires is present and non-empty. MOCK_COURSES
+has no provider, so every document gets the ``Hexalabs`` one the labs
+search API also falls back to. Courses missing from MOCK_COURSES, or
+missing a field there, get the topic ``Uncategorized`` and a price of 0
+(LAB_DEFAULTS), the upper-cased courseId as the code (the MOCK_COURSES
+convention), and the title as the description if the LabInstruction has
+none.
+
+``_id`` is an ObjectId derived from the courseId (Extended JSON ``$oid``),
+so the same course always gets the same ``_id`` and re-seeding upserts
+instead of duplicating. The content hash of every exported document is
+kept in ``seed-state.json``; in delta mode only added or changed courses
+are exported, and the ``_id`` s of courses that disappeared are listed in
+``deleted.json``.
+
+Each export is written to a staging directory inside the output directory
+and only moved over the previous one once it is complete, so a failed
+export leaves the last good load in place.
+"""
+
+import os
+import glob
+import json
+import shutil
+import hashlib
+import tempfile
+
+from .fileio import AtomicWriter, write_text
+from .stream import iter_course_blocks
+
+__all__ = ['DEFAULT_SEED_DIR', 'STATE_NAME', 'DELETED_NAME', 'LAB_DEFAULTS', 'lab_object_id', 'lab_document',
+           'export_seed']
+
+DEFAULT_SEED_DIR = 'seed/labs'
+STATE_NAME = 'seed-state.json'
+DELETED_NAME = 'deleted.json'
+
+# Required Lab model fields that neither MOCK_COURSES nor the LabInstruction may supply
+LAB_DEFAULTS = {'provider': 'Hexalabs', 'topic': 'Uncategorized', 'price': 0}
+
+_STATE_VERSION = 1
+
+
+def lab_object_id(course_id):
+    """Stable 24-hex-digit ObjectId of the Lab document of *course_id*."""
+    return hashlib.sha256(f"lab:{course_id}".encode('utf-8')).hexdigest()[:24]
+
+
+def lab_document(course_id, lab, course=None):
+    """
+    The Lab document of one course: the Lab model fields taken from the
+    LabInstruction *lab* and, when given, its MOCK_COURSES *course* record.
+    Required fields neither supplies are filled in as the module docstring
+    describes.
+    """
+    course_fields = {}
+    if course is not None:
+        course_fields = {
+            'title': course.title,
+            'code': course.code,
+            'description': course.description,
+            'topic': course.category,
+            'price': course.price,
+        }
+    minutes = lab.get('estimatedTime')
+    title = course_fields.get('title') or lab.get('title') or course_id
+    document = {
+        '_id': {'$oid': lab_object_id(course_id)},
+        'id': course_id,
+        'title': title,
+        'code': course_fields.get('code') or course_id.upper(),
+        'description': course_fields.get('description') or lab.get('description') or title,
+        'topic': course_fields.get('topic') or LAB_DEFAULTS['topic'],
+        'provider': LAB_DEFAULTS['provider'],
+        'price': course_fields['price'] if course_fields.get('price') is not None else LAB_DEFAULTS['price'],
+        'duration': f"{minutes} minutes" if isinstance(minutes, (int, float)) else None,
+        'difficulty': lab.get('difficulty'),
+        'objectives': lab.get('objectives') or [],
+        'prerequisites': lab.get('prerequisites') or [],
+    }
+    return {key: value for key, value in document.items() if value is not None}
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state.get('courses', {}) if state.get('version') == _STATE_VERSION else {}
+
+
+class _BatchWriter:
+    """Writes NDJSON lines to numbered batch files of at most *batch_size* lines."""
+
+    def __init__(self, out_dir, batch_size):
+        self.out_dir = out_dir
+        self.batch_size = batch_size
+        self.files = []
+        self._writer = None
+        self._lines = 0
+
+    def write(self, line):
+        if self._writer is None:
+            path = os.path.join(self.out_dir, f"batch-{len(self.files) + 1:05d}.ndjson")
+            self._writer = AtomicWriter(path).__enter__()
+            self.files.append(path)
+        self._writer.write(line + '\n')
+        self._lines += 1
+        if self._lines >= self.batch_size:
+            self.close()
+
+    def close(self, exc_type=None):
+        if self._writer is not None:
+            self._writer.__exit__(exc_type, None, None)
+            self._writer = None
+            self._lines = 0
+
+
+def _swap_in(staging, out_dir):
+    """Move the complete export in *staging* over the previous one in *out_dir*."""
+    stale = set(glob.glob(os.path.join(out_dir, 'batch-*.ndjson')))
+    stale.add(os.path.join(out_dir, DELETED_NAME))
+    for name in sorted(os.listdir(staging)):
+        if name != STATE_NAME:
+            path = os.path.join(out_dir, name)
+            os.replace(os.path.join(staging, name), path)
+            stale.discard(path)
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+    # Last, so an interrupted swap is exported again in full by the next delta run
+    os.replace(os.path.join(staging, STATE_NAME), os.path.join(out_dir, STATE_NAME))
+
+
+def export_seed(lab_path, out_dir=DEFAULT_SEED_DIR, catalog=None, batch_size=1000, delta=False):
+    """
+    Export the courses of *lab_path* as NDJSON batches in *out_dir*.
+
+    *catalog* (a CourseCatalog) supplies the course metadata. With *delta*
+    only courses whose document changed since the last export are written.
+    The new export replaces the batch files of the previous one only once
+    it is complete, so the directory always holds exactly one load.
+
+    Returns a dict with the ``files`` written and the ``exported``,
+    ``unchanged`` and ``deleted`` course ids.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_NAME)
+    previous = _load_state(state_path) if delta else {}
+
+    staging = tempfile.mkdtemp(prefix='.export-', dir=out_dir)
+    try:
+        state = {}
+        exported = []
+        unchanged = []
+        writer = _BatchWriter(staging, batch_size)
+        try:
+            with open(lab_path, 'r', encoding='utf-8') as f:
+                for block in iter_course_blocks(f):
+                    course_id = block.course_id
+                    lab = block.value.to_python() if block.value.kind == 'object' else {}
+                    course = catalog.get(course_id) if catalog is not None else None
+                    line = json.dumps(lab_document(course_id, lab, course), ensure_ascii=False, separators=(',', ':'))
+                    digest = hashlib.sha256(line.encode('utf-8')).hexdigest()
+                    state[course_id] = digest
+                    if previous.get(course_id) == digest:
+                        unchanged.append(course_id)
+                        continue
+                    writer.write(line)
+                    exported.append(course_id)
+        except BaseException as e:
+            writer.close(type(e))
+            raise
+        writer.close()
+
+        deleted = [course_id for course_id in previous if course_id not in state]
+        if deleted:
+            write_text(os.path.join(staging, DELETED_NAME), json.dumps(
+                [{'_id': {'$oid': lab_object_id(course_id)}, 'id': course_id} for course_id in deleted], indent=2))
+        write_text(os.path.join(staging, STATE_NAME),
+                   json.dumps({'version': _STATE_VERSION, 'source': lab_path, 'courses': state}, indent=2))
+        _swap_in(staging, out_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    files = [os.path.join(out_dir, os.path.basename(path)) for path in writer.files]
+    return {'files': files, 'exported': exported, 'unchanged': unchanged, 'deleted': deleted}
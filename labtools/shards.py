@@ -0,0 +1,108 @@
+"""
+Per-course JSON shards of LAB_INSTRUCTIONS for lazy loading.
+
+export_shards() writes each course's LabInstruction object to
+``<dir>/<courseId>.json`` and a ``manifest.json`` listing, per course, its
+id, title, shard file, SHA-256 and size. The app reads the manifest and
+fetches one shard when a lab opens instead of importing the whole catalog.
+
+The export is incremental: a shard whose hash matches the previous
+manifest and whose file is still in place is not touched, changed shards
+are replaced atomically, and shards of courses that left the catalog are
+removed. Values the parser keeps as raw expressions are exported as their
+source text.
+"""
+
+import os
+import re
+import json
+import hashlib
+
+from .catalog import course_entries
+from .fileio import write_text
+
+__all__ = ['DEFAULT_SHARD_DIR', 'MANIFEST_NAME', 'shard_name', 'export_shards']
+
+DEFAULT_SHARD_DIR = 'public/lab-instructions'
+MANIFEST_NAME = 'manifest.json'
+
+_MANIFEST_VERSION = 1
+
+
+def shard_name(course_id):
+    """File name of the shard of *course_id*; unsafe characters become ``_``."""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', course_id).lstrip('.') + '.json'
+
+
+def _load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != _MANIFEST_VERSION:
+        return {}
+    return {entry['courseId']: entry for entry in manifest.get('courses', [])}
+
+
+def export_shards(instructions, out_dir=DEFAULT_SHARD_DIR, source=None, force=False):
+    """
+    Export the courses of the *instructions* object node to *out_dir*.
+
+    Returns ``(written, unchanged, removed)`` course id lists. With *force*
+    every shard is rewritten whether or not the manifest says it changed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = _load_manifest(manifest_path)
+
+    entries = []
+    written = []
+    unchanged = []
+    files = {}
+    for course_id, prop in course_entries(instructions):
+        lab = prop.value.to_python() if prop.value.kind == 'object' else {}
+        data = json.dumps(lab, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        name = shard_name(course_id)
+        if files.setdefault(name, course_id) != course_id:
+            raise ValueError(f"Courses {files[name]!r} and {course_id!r} map to the same shard {name}")
+        path = os.path.join(out_dir, name)
+
+        old = previous.get(course_id)
+        if (not force and old is not None and old['sha256'] == digest and old['file'] == name
+                and _size(path) == len(data)):
+            unchanged.append(course_id)
+        else:
+            write_text(path, data.decode('utf-8'))
+            written.append(course_id)
+        title = lab.get('title')
+        entries.append({
+            'courseId': course_id,
+            'id': lab.get('id'),
+            'title': title if isinstance(title, str) else None,
+            'file': name,
+            'sha256': digest,
+            'size': len(data),
+        })
+
+    removed = []
+    for course_id, old in previous.items():
+        if old.get('file') in files:
+            continue
+        try:
+            os.remove(os.path.join(out_dir, os.path.basename(old['file'])))
+        except FileNotFoundError:
+            pass
+        removed.append(course_id)
+
+    manifest = {'version': _MANIFEST_VERSION, 'source': source, 'courses': entries}
+    write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+    return written, unchanged, removed
+
+
+def _size(path):
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
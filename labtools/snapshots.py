@@ -0,0 +1,459 @@
+"""
+Content-addressed, delta-compressed snapshots of the lab instructions.
+
+A snapshot (one generation) of a file is its list of segments, the course
+blocks and the text between them (BlockIndex.segments()), stored in SQLite
+as a manifest of ``(course_id, SHA-256, length)`` rows. Segment texts are
+blobs keyed by their hash, so a segment that is already in the store, in
+any earlier generation or course, costs one manifest row: taking a
+snapshot compresses and writes only the blocks that changed.
+
+A new version of a course block is compressed with zlib using the
+course's previous version as the preset dictionary, which stores little
+more than the edit. Chains of such deltas are cut every _MAX_CHAIN
+versions by a blob compressed on its own, so reading any block
+decompresses at most that many small blobs. With ``codec='lzma'`` every
+blob is compressed on its own with LZMA (smaller for large blocks, no
+delta chains).
+
+Every snapshot is a row of the run log: when it was taken, by which run
+(the label), and how many courses it added, changed and removed. A block
+or the whole file of any generation is read back without touching the
+other blocks, and restore() puts single courses back into the current
+text; when that text is itself a snapshot (the usual case) its layout
+comes from the manifest and nothing is parsed.
+
+The clean scripts start from the original generation, the newest
+snapshot labelled ORIGINAL_LABEL that update-lab-instructions.py takes
+before it edits the file (or any generation asked for by id).
+open_original() reads it back one block at a time, so a streamed run
+never holds the whole file. A checkout with no original in the store yet
+starts it from src/data/lab-instructions.ts.backup, the unedited copy
+earlier versions of update-lab-instructions.py left behind.
+"""
+
+import os
+import lzma
+import time
+import zlib
+import sqlite3
+import hashlib
+import contextlib
+
+from .blocks import BlockIndex
+from .catalog import LAB_INSTRUCTIONS_BACKUP_PATH, LAB_INSTRUCTIONS_PATH
+from .fileio import read_text
+
+__all__ = ['DEFAULT_SNAPSHOT_PATH', 'ORIGINAL_LABEL', 'Snapshot', 'SnapshotStore', 'open_original', 'read_original']
+
+DEFAULT_SNAPSHOT_PATH = '.lab-snapshots.sqlite'
+
+# Label of the generation update-lab-instructions.py started from
+ORIGINAL_LABEL = 'update-lab-instructions: before'
+
+# Longest chain of deltas before a block is compressed on its own again
+_MAX_CHAIN = 16
+
+# zlib only uses the last 32 KiB of a preset dictionary
+_WINDOW = 32 * 1024
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class Snapshot:
+    """One generation of a file in the run log."""
+
+    __slots__ = ('id', 'source', 'label', 'taken_at', 'digest', 'size', 'courses',
+                 'added', 'changed', 'removed', 'stored')
+
+    def __init__(self, id, source, label, taken_at, digest, size, courses, added, changed, removed, stored):
+        self.id = id
+        self.source = source
+        self.label = label
+        self.taken_at = taken_at
+        self.digest = digest
+        self.size = size
+        self.courses = courses
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.stored = stored
+
+    def __repr__(self):
+        return f"<Snapshot #{self.id} {self.source} {self.label!r}>"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SnapshotStore:
+    """SQLite-backed generations of lab instruction files (see the module docstring)."""
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, codec='zlib'):
+        if codec not in ('zlib', 'lzma'):
+            raise ValueError(f"Unknown codec {codec!r}; use 'zlib' or 'lzma'")
+        self.path = path
+        self.codec = codec
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, codec TEXT NOT NULL, base TEXT, depth INTEGER NOT NULL,"
+            " size INTEGER NOT NULL, data BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, label TEXT NOT NULL,"
+            " taken_at TEXT NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL,"
+            " courses INTEGER NOT NULL, added INTEGER NOT NULL, changed INTEGER NOT NULL,"
+            " removed INTEGER NOT NULL, stored INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " snapshot INTEGER NOT NULL, position INTEGER NOT NULL, course_id TEXT,"
+            " hash TEXT NOT NULL, length INTEGER NOT NULL,"
+            " PRIMARY KEY (snapshot, position)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS snapshots_digest ON snapshots (source, digest)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._db.close()
+
+    def log(self, source=None, limit=None, label=None):
+        """The snapshots taken, newest first; only those of *source* and with *label* if given."""
+        query = "SELECT * FROM snapshots"
+        where = []
+        params = []
+        if source is not None:
+            where.append("source = ?")
+            params.append(source)
+        if label is not None:
+            where.append("label = ?")
+            params.append(label)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [Snapshot(*row) for row in self._db.execute(query, params)]
+
+    def get(self, ref, source=None):
+        """
+        The Snapshot *ref*: a snapshot id, or ``-n`` for the n-th newest
+        (``-1`` is the latest), counted among the snapshots of *source* if
+        given. Raises KeyError if there is no such snapshot.
+        """
+        if ref < 0:
+            found = self.log(source, -ref)
+            if len(found) == -ref:
+                return found[-1]
+        else:
+            row = self._db.execute("SELECT * FROM snapshots WHERE id = ?", (ref,)).fetchone()
+            if row is not None and (source is None or row[1] == source):
+                return Snapshot(*row)
+        raise KeyError(f"No snapshot {ref}" + (f" of {source}" if source else ""))
+
+    def original(self, ref=None, source=LAB_INSTRUCTIONS_PATH):
+        """
+        The Snapshot of *source* the clean scripts start from: *ref* if
+        given (see get()), else the newest one labelled ORIGINAL_LABEL.
+        Raises KeyError if there is none.
+        """
+        if ref is not None:
+            return self.get(ref, source)
+        found = self.log(source, 1, ORIGINAL_LABEL)
+        if not found:
+            raise KeyError(f"No {ORIGINAL_LABEL!r} snapshot of {source} in {self.path}; "
+                           f"pass --input with the unedited lab instructions")
+        return found[0]
+
+    def find(self, text, source=LAB_INSTRUCTIONS_PATH):
+        """The newest Snapshot of *source* whose text is *text*, or None."""
+        row = self._db.execute(
+            "SELECT * FROM snapshots WHERE source = ? AND digest = ? ORDER BY id DESC LIMIT 1",
+            (source, _hash(text.encode('utf-8')))
+        ).fetchone()
+        return Snapshot(*row) if row is not None else None
+
+    def stats(self):
+        """``{'snapshots', 'blobs', 'raw_bytes', 'stored_bytes'}`` of the whole store."""
+        snapshots, = self._db.execute("SELECT COUNT(*) FROM snapshots").fetchone()
+        blobs, raw, stored = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+        ).fetchone()
+        return {'snapshots': snapshots, 'blobs': blobs, 'raw_bytes': raw, 'stored_bytes': stored}
+
+    def snapshot(self, text, label, source=LAB_INSTRUCTIONS_PATH, segments=None):
+        """
+        Record *text* as the next generation of *source* and return its
+        Snapshot. *segments*, an iterable of ``(course_id, text)`` pairs
+        as from BlockIndex.segments(), saves parsing *text* when the
+        caller has them; *text* may then be None. A text already in the
+        store is not parsed at all.
+        """
+        if text is not None and segments is None:
+            known = self.find(text, source)
+            if known is not None:
+                return self._repeat(known, label)
+            segments = BlockIndex(text).segments()
+
+        previous = self._manifest_of_latest(source)
+        old_blocks = {course_id: block_hash for course_id, block_hash, _ in previous if course_id is not None}
+        rows = []
+        digest = hashlib.sha256()
+        size = 0
+        stored = 0
+        memo = {}
+        blobs = {}
+        for position, (course_id, segment) in enumerate(segments):
+            data = segment.encode('utf-8')
+            digest.update(data)
+            size += len(data)
+            block_hash = _hash(data)
+            rows.append((position, course_id, block_hash, len(segment)))
+            # Only new blocks are compressed and kept until the commit, so
+            # streamed segments are never all held at once
+            if block_hash not in blobs and not self._has(block_hash):
+                codec, base, depth, packed = self._compress(data, old_blocks.get(course_id), memo)
+                blobs[block_hash] = (block_hash, codec, base, depth, len(data), packed)
+                stored += len(packed)
+
+        courses = {course_id: block_hash for _, course_id, block_hash, _ in rows if course_id is not None}
+        added = sum(1 for course_id in courses if course_id not in old_blocks)
+        removed = sum(1 for course_id in old_blocks if course_id not in courses)
+        changed = sum(1 for course_id, block_hash in courses.items()
+                      if course_id in old_blocks and old_blocks[course_id] != block_hash)
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs.values())
+            snapshot_id = self._insert(source, label, digest.hexdigest(), size, len(courses),
+                                       added, changed, removed, stored)
+            self._db.executemany(
+                "INSERT INTO segments VALUES (?, ?, ?, ?, ?)",
+                [(snapshot_id,) + row for row in rows]
+            )
+        return self.get(snapshot_id)
+
+    def _repeat(self, known, label):
+        """Log a generation whose text is the same as snapshot *known*, sharing its manifest."""
+        previous = self.log(known.source, 1)[0]
+        with self._db:
+            changes = (0, 0, 0) if previous.digest == known.digest else self._changes(previous.id, known.id)
+            snapshot_id = self._insert(known.source, label, known.digest, known.size, known.courses,
+                                       *changes, 0)
+            self._db.execute(
+                "INSERT INTO segments SELECT ?, position, course_id, hash, length FROM segments WHERE snapshot = ?",
+                (snapshot_id, known.id)
+            )
+        return self.get(snapshot_id)
+
+    def _insert(self, source, label, digest, size, courses, added, changed, removed, stored):
+        taken_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        cursor = self._db.execute(
+            "INSERT INTO snapshots (source, label, taken_at, digest, size, courses, added, changed, removed, stored)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (source, label, taken_at, digest, size, courses, added, changed, removed, stored)
+        )
+        return cursor.lastrowid
+
+    def _changes(self, old_id, new_id):
+        old, new = self._courses(old_id), self._courses(new_id)
+        return (sum(1 for course_id in new if course_id not in old),
+                sum(1 for course_id in new if course_id in old and old[course_id] != new[course_id]),
+                sum(1 for course_id in old if course_id not in new))
+
+    def _has(self, block_hash):
+        return self._db.execute("SELECT 1 FROM blobs WHERE hash = ?", (block_hash,)).fetchone() is not None
+
+    def _compress(self, data, base, memo):
+        """``(codec, base, depth, packed)`` for a new blob, a delta against *base* when that is smaller."""
+        if self.codec == 'lzma':
+            return 'lzma', None, 0, lzma.compress(data)
+        packed = zlib.compress(data, 9)
+        if base is not None:
+            depth, = self._db.execute("SELECT depth FROM blobs WHERE hash = ?", (base,)).fetchone()
+            if depth < _MAX_CHAIN:
+                compressor = zlib.compressobj(9, zdict=self._read(base, memo)[-_WINDOW:])
+                delta = compressor.compress(data) + compressor.flush()
+                if len(delta) < len(packed):
+                    return 'zlib', base, depth + 1, delta
+        return 'zlib', None, 0, packed
+
+    def _manifest(self, snapshot_id):
+        return self._db.execute(
+            "SELECT course_id, hash, length FROM segments WHERE snapshot = ? ORDER BY position",
+            (snapshot_id,)
+        ).fetchall()
+
+    def _manifest_of_latest(self, source):
+        latest = self.log(source, 1)
+        return self._manifest(latest[0].id) if latest else []
+
+    def _courses(self, snapshot_id):
+        return {course_id: block_hash for course_id, block_hash, _ in self._manifest(snapshot_id)
+                if course_id is not None}
+
+    def _read(self, block_hash, memo):
+        """Bytes of a blob, following its delta chain; *memo* keeps what was decoded."""
+        chain = []
+        while block_hash is not None and block_hash not in memo:
+            row = self._db.execute("SELECT codec, base, data FROM blobs WHERE hash = ?", (block_hash,)).fetchone()
+            if row is None:
+                raise KeyError(f"Snapshot store {self.path} is missing blob {block_hash}")
+            chain.append((block_hash,) + row)
+            block_hash = row[1]
+        for block_hash, codec, base, packed in reversed(chain):
+            if codec == 'lzma':
+                data = lzma.decompress(packed)
+            elif base is None:
+                data = zlib.decompress(packed)
+            else:
+                decompressor = zlib.decompressobj(zdict=memo[base][-_WINDOW:])
+                data = decompressor.decompress(packed) + decompressor.flush()
+            memo[block_hash] = data
+        return memo[chain[0][0]] if chain else memo[block_hash]
+
+    def segments(self, ref, source=None):
+        """The ``(course_id, text)`` segments of snapshot *ref* (see get())."""
+        snapshot = self.get(ref, source)
+        memo = {}
+        return [(course_id, self._read(block_hash, memo).decode('utf-8'))
+                for course_id, block_hash, _ in self._manifest(snapshot.id)]
+
+    def iter_segments(self, ref, source=None):
+        """Like segments(), but decodes one block at a time as the segments are consumed."""
+        snapshot = self.get(ref, source)
+        for course_id, block_hash, _ in self._manifest(snapshot.id):
+            yield course_id, self._read(block_hash, {}).decode('utf-8')
+
+    def open(self, ref, source=None):
+        """A read-only text stream of snapshot *ref*, checked against its digest when read to the end."""
+        snapshot = self.get(ref, source)
+        return _SnapshotReader(snapshot, self.iter_segments(snapshot.id))
+
+    def text(self, ref, source=None):
+        """The whole text of snapshot *ref*, checked against its digest."""
+        snapshot = self.get(ref, source)
+        text = ''.join(segment for _, segment in self.segments(snapshot.id))
+        if _hash(text.encode('utf-8')) != snapshot.digest:
+            raise ValueError(f"Snapshot #{snapshot.id} does not match its digest; the store is corrupt")
+        return text
+
+    def block(self, ref, course_id, source=None):
+        """The block of *course_id* in snapshot *ref*, or None if it has no such course."""
+        snapshot = self.get(ref, source)
+        row = self._db.execute(
+            "SELECT hash FROM segments WHERE snapshot = ? AND course_id = ?", (snapshot.id, course_id)
+        ).fetchone()
+        return self._read(row[0], {}).decode('utf-8') if row is not None else None
+
+    def diff(self, old_ref, new_ref, source=None):
+        """``{'added', 'changed', 'removed'}`` course ids between two snapshots, from their manifests."""
+        old = self._courses(self.get(old_ref, source).id)
+        new = self._courses(self.get(new_ref, source).id)
+        return {
+            'added': [course_id for course_id in new if course_id not in old],
+            'changed': [course_id for course_id in new if course_id in old and old[course_id] != new[course_id]],
+            'removed': [course_id for course_id in old if course_id not in new],
+        }
+
+    def restore(self, ref, text, course_ids, source=LAB_INSTRUCTIONS_PATH):
+        """
+        Return ``(new_text, segments)``: *text* with the blocks of
+        *course_ids* put back as they were in snapshot *ref*. Every other
+        byte of *text* is kept. Raises KeyError for a course missing from
+        the snapshot or from *text*.
+        """
+        snapshot = self.get(ref, source)
+        known = self.find(text, source)
+        if known is not None:
+            segments = []
+            pos = 0
+            for course_id, _, length in self._manifest(known.id):
+                segments.append((course_id, text[pos:pos + length]))
+                pos += length
+        else:
+            segments = BlockIndex(text).segments()
+        positions = {course_id: n for n, (course_id, _) in enumerate(segments) if course_id is not None}
+        for course_id in course_ids:
+            if course_id not in positions:
+                raise KeyError(f"{course_id} is not in the current text; restore the whole file instead")
+            block = self.block(snapshot.id, course_id)
+            if block is None:
+                raise KeyError(f"{course_id} is not in snapshot #{snapshot.id}")
+            segments[positions[course_id]] = (course_id, block)
+        return ''.join(segment for _, segment in segments), segments
+
+
+class _SnapshotReader:
+    """The text of a snapshot as a file-like ``read()`` stream, one segment held at a time."""
+
+    def __init__(self, snapshot, segments):
+        self.snapshot = snapshot
+        self._segments = segments
+        self._buf = ''
+        self._digest = hashlib.sha256()
+        self._eof = False
+
+    def _next(self):
+        item = next(self._segments, None)
+        if item is not None:
+            self._digest.update(item[1].encode('utf-8'))
+            return item[1]
+        if not self._eof:
+            self._eof = True
+            if self._digest.hexdigest() != self.snapshot.digest:
+                raise ValueError(f"Snapshot #{self.snapshot.id} does not match its digest; the store is corrupt")
+        return None
+
+    def read(self, size=-1):
+        pieces = [self._buf]
+        length = len(self._buf)
+        while size is None or size < 0 or length < size:
+            segment = self._next()
+            if segment is None:
+                break
+            pieces.append(segment)
+            length += len(segment)
+        data = ''.join(pieces)
+        if size is None or size < 0:
+            self._buf = ''
+            return data
+        self._buf = data[size:]
+        return data[:size]
+
+
+@contextlib.contextmanager
+def open_original(path=DEFAULT_SNAPSHOT_PATH, ref=None, source=LAB_INSTRUCTIONS_PATH,
+                  backup=LAB_INSTRUCTIONS_BACKUP_PATH):
+    """
+    Open the generation of *source* the clean scripts start from (see
+    SnapshotStore.original()) in the store at *path*, and yield
+    ``(snapshot, stream)``. When no *ref* is given and there is no store
+    at *path* yet, or no original in it, the *backup* file (if it exists)
+    is recorded as the original first. Raises KeyError if there is still
+    no such snapshot.
+    """
+    has_backup = backup is not None and os.path.exists(backup)
+    if not os.path.exists(path) and (ref is not None or not has_backup):
+        raise KeyError(f"No snapshot store at {path}; pass --input with the unedited lab instructions")
+    with SnapshotStore(path) as store:
+        if ref is None and has_backup and not store.log(source, 1, ORIGINAL_LABEL):
+            store.snapshot(read_text(backup), ORIGINAL_LABEL, source)
+        snapshot = store.original(ref, source)
+        yield snapshot, store.open(snapshot.id)
+
+
+def read_original(path=DEFAULT_SNAPSHOT_PATH, ref=None, source=LAB_INSTRUCTIONS_PATH,
+                  backup=LAB_INSTRUCTIONS_BACKUP_PATH):
+    """``(snapshot, text)`` of the generation the clean scripts start from (see open_original())."""
+    with open_original(path, ref, source, backup) as (snapshot, stream):
+        return snapshot, stream.read()
@@ -0,0 +1,284 @@
+"""
+Streaming, bounded-memory access to LAB_INSTRUCTIONS.
+
+The file is read in chunks and cut into a sequence of segments: plain text
+(everything outside the course blocks, returned as ``str``) and one
+StreamBlock per course. Each block is parsed on its own and dropped once
+the caller moves on, so peak memory is about one course block plus the
+read buffer, whatever the size of the catalog. Concatenating the text of
+all segments reproduces the input exactly.
+"""
+
+from .fileio import AtomicWriter
+from .tslex import TSSyntaxError, TOKEN_RE, template_end, OPEN, CLOSE, unescape, parse_value
+
+__all__ = ['StreamBlock', 'iter_segments', 'iter_course_blocks', 'segment_text', 'stream_rewrite']
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamBlock:
+    """
+    One course entry of LAB_INSTRUCTIONS: header comment, key and object.
+
+    ``body_start`` is the offset of the key within ``text``, i.e. where the
+    block starts when its header comment is left out.
+    """
+
+    __slots__ = ('key', 'course_id', 'text', 'body_start', 'value')
+
+    def __init__(self, key, course_id, text, body_start, value):
+        self.key = key
+        self.course_id = course_id
+        self.text = text
+        self.body_start = body_start
+        self.value = value
+
+    def __repr__(self):
+        return f"<StreamBlock {self.course_id!r} {len(self.text)} chars>"
+
+    @property
+    def body(self):
+        """Block text without its header comment."""
+        return self.text[self.body_start:]
+
+
+def segment_text(segment):
+    """Source text of a segment yielded by iter_segments()."""
+    return segment.text if isinstance(segment, StreamBlock) else segment
+
+
+class _ChunkReader:
+    """A sliding window over a text file that only ever yields whole tokens."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.eof = False
+        self.line = 1
+        self.column = 1
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def error(self, message, pos):
+        return TSSyntaxError(message, self.buf, pos, self.line, self.column)
+
+    def token(self, pos):
+        """Return the complete token at *pos*, reading more input as needed."""
+        while True:
+            buf = self.buf
+            if pos >= len(buf):
+                if not self.fill():
+                    return None
+                continue
+            m = TOKEN_RE.match(buf, pos)
+            if m is None:
+                raise self.error(f"Unexpected character {buf[pos]!r}", pos)
+            kind = m.lastgroup
+            end = m.end()
+            if kind == 'template':
+                try:
+                    end = template_end(buf, pos)
+                except TSSyntaxError:
+                    if self.fill():
+                        continue
+                    raise self.error("Unterminated template literal", pos) from None
+            elif kind in ('bad_comment', 'bad_string'):
+                if self.fill():
+                    continue
+                raise self.error("Unterminated " + ("block comment" if kind == 'bad_comment' else "string literal"), pos)
+            # A token touching the end of the window may continue in the next chunk.
+            if end == len(buf) and self.fill():
+                continue
+            return kind, pos, end
+
+    def consume(self, pos):
+        """Drop and return ``buf[:pos]``; offsets shift down by *pos*."""
+        text = self.buf[:pos]
+        self.buf = self.buf[pos:]
+        newlines = text.count('\n')
+        if newlines:
+            self.line += newlines
+            self.column = len(text) - text.rfind('\n')
+        else:
+            self.column += len(text)
+        return text
+
+
+def iter_segments(f, name='LAB_INSTRUCTIONS', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the segments of the TS module in the open file *f*.
+
+    Text outside the entries of the object literal assigned to the
+    top-level const *name* is yielded as ``str`` (in pieces of about
+    *chunk_size*); each entry is yielded as a StreamBlock.
+    """
+    reader = _ChunkReader(f, chunk_size)
+    token = reader.token
+    pos = 0
+
+    # Phase 1: copy everything up to and including `const NAME ... = {`.
+    depth = 0
+    state = None
+    while True:
+        tok = token(pos)
+        if tok is None:
+            raise KeyError(f"{name} is not declared at the top level")
+        kind, start, end = tok
+        pos = end
+        if kind in ('ws', 'line_comment', 'block_comment'):
+            continue
+        word = reader.buf[start:end]
+        if state == 'value':
+            if word != '{':
+                raise reader.error(f"{name} is not an object literal", start)
+            break
+        if kind == 'punct':
+            if state == 'type' and depth == 0 and word == '=':
+                state = 'value'
+            else:
+                if word in OPEN:
+                    depth += 1
+                elif word in CLOSE:
+                    depth -= 1
+                if state != 'type':
+                    state = None
+        elif state != 'type':
+            if depth == 0 and word in ('const', 'let', 'var'):
+                state = 'decl'
+            elif state == 'decl' and word == name:
+                state = 'type'
+            else:
+                state = None
+        if pos > chunk_size:
+            yield reader.consume(pos)
+            pos = 0
+    yield reader.consume(pos)
+    pos = 0
+
+    # Phase 2: one StreamBlock per entry, separators as text.
+    while True:
+        doc_start = None
+        while True:
+            tok = token(pos)
+            if tok is None:
+                raise reader.error(f"Unclosed {name} object", pos)
+            kind, start, end = tok
+            if kind == 'ws':
+                pos = end
+            elif kind in ('line_comment', 'block_comment'):
+                if doc_start is None:
+                    doc_start = start
+                pos = end
+            else:
+                break
+        word = reader.buf[start:end]
+        if kind == 'punct' and word == '}':
+            break
+        if kind == 'punct' and word == ',':
+            pos = end
+            continue
+        block_start = start if doc_start is None else doc_start
+        if block_start:
+            yield reader.consume(block_start)
+            start -= block_start
+            end -= block_start
+        body_start = start
+        if kind == 'string':
+            key = unescape(reader.buf[start + 1:end - 1])
+        elif kind in ('ident', 'number'):
+            key = word
+        else:
+            raise reader.error("Expected property name", start)
+        pos = end
+        # Skip to the ':' and then over the value, tracking nesting.
+        value_start = None
+        depth = 0
+        value_end = None
+        while True:
+            tok = token(pos)
+            if tok is None:
+                raise reader.error(f"Unclosed {name} object", pos)
+            kind, tstart, tend = tok
+            pos = tend
+            if kind in ('ws', 'line_comment', 'block_comment'):
+                continue
+            ch = reader.buf[tstart:tend]
+            if value_start is None:
+                if ch == '?':
+                    continue
+                if ch != ':':
+                    raise reader.error("Expected ':' after property name", tstart)
+                value_start = tend
+                continue
+            if kind == 'punct':
+                if ch in OPEN:
+                    depth += 1
+                elif ch in CLOSE:
+                    if depth == 0:
+                        pos = tstart
+                        break
+                    depth -= 1
+                elif ch == ',' and depth == 0:
+                    pos = tstart
+                    break
+            value_end = tend
+        if value_end is None:
+            raise reader.error("Expected a value", pos)
+        text = reader.consume(value_end)
+        pos -= value_end
+        try:
+            value = parse_value(text, value_start)
+        except TSSyntaxError as exc:
+            raise TSSyntaxError(f"Invalid course block {key!r}: {exc}", text, value_start,
+                                reader.line, reader.column) from None
+        course_id = value.get('courseId') if value.kind == 'object' else None
+        course_id = course_id.to_python() if course_id is not None and course_id.kind == 'string' else key
+        yield StreamBlock(key, course_id, text, body_start, value)
+
+    # Phase 3: the rest of the file is plain text.
+    yield reader.consume(len(reader.buf))
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_course_blocks(f, name='LAB_INSTRUCTIONS', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield only the StreamBlocks of iter_segments()."""
+    for segment in iter_segments(f, name, chunk_size):
+        if isinstance(segment, StreamBlock):
+            yield segment
+
+
+def stream_rewrite(src_path, dst_path, transform, name='LAB_INSTRUCTIONS', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write ``transform(segment)`` for every segment of *src_path* to *dst_path*.
+
+    *src_path* may also be an open text stream (anything with ``read()``,
+    such as SnapshotStore.open()). Output is written incrementally to a
+    temporary file next to *dst_path* which then replaces it, so *src_path*
+    and *dst_path* may be the same. An unchanged *dst_path* is left
+    untouched. Returns True if it changed.
+    """
+    if hasattr(src_path, 'read'):
+        return _rewrite(src_path, dst_path, transform, name, chunk_size)
+    with open(src_path, 'r', encoding='utf-8') as src:
+        return _rewrite(src, dst_path, transform, name, chunk_size)
+
+
+def _rewrite(src, dst_path, transform, name, chunk_size):
+    with AtomicWriter(dst_path) as out:
+        for segment in iter_segments(src, name, chunk_size):
+            out.write(transform(segment))
+    return out.changed
@@ -0,0 +1,476 @@
+"""
+Post-edit syntax check of only the course blocks a run touched.
+
+A cleaning run rewrites a handful of course blocks inside a file of
+hundreds; re-parsing the whole output just to prove it still compiles
+costs more than the run itself. check_edits() takes the run's edits (as
+recorded by a BlockEditor, or one whole-segment edit per changed segment)
+and re-parses only the output ranges they landed in:
+
+* every touched course block must tokenize (terminated strings, template
+  literals and comments) and parse as ``id: { ... }`` with balanced
+  braces and brackets, still under the same courseId;
+* its value must have the shape of the ``LabInstruction`` interface of
+  src/types/lab-instructions.ts (required keys, value types, enums, no
+  unknown keys);
+* text outside the course blocks (the export header, separators and the
+  footer) must keep its punctuation.
+
+Each Problem names the course, task and instruction step it is in, so a
+broken rule points at the exact block it broke. verify_or_exit() is the
+check every cleaning script runs before it writes: it prints the problems
+and exits unless the script was run with --no-verify.
+"""
+
+import sys
+import time
+from bisect import bisect_right
+
+from .tslex import TSSyntaxError, line_col, parse_value, tokenize
+
+__all__ = ['LAB_INSTRUCTION', 'INTERFACES', 'Problem', 'SyntaxCheckError', 'check_block', 'check_segment', 'check_edits',
+           'edit_list', 'report_problems', 'verify_or_exit']
+
+# Shapes of src/types/lab-instructions.ts. A dict is an object (keys ending
+# in '?' are optional), a one-item list an array of that shape, a tuple a
+# string enum; 'string' and 'number' are primitives.
+_RESOURCE = {'title': 'string', 'url': 'string', 'type': ('documentation', 'video', 'article', 'tutorial')}
+_KNOWLEDGE_BLOCK = {'type': ('note', 'warning', 'tip', 'important'), 'title': 'string', 'content': 'string'}
+_INSTRUCTION_STEP = {'step': 'number', 'action': 'string', 'context?': 'string', 'screenshot?': 'string'}
+_QUIZ = {'question': 'string', 'options': ['string'], 'correctAnswer': 'number',
+                  'explanation?': 'string'}
+_TASK_VERIFICATION = {
+    'type': ('manual', 'automated', 'quiz'),
+    'description': 'string',
+    'expectedResult?': 'string',
+    'script?': 'string',
+    'expectedOutput?': 'string',
+    'quiz?': _QUIZ,
+}
+_CODE_SNIPPET = {'language': 'string', 'code': 'string', 'filename?': 'string', 'description?': 'string'}
+_LAB_TASK = {
+    'id': 'string',
+    'order': 'number',
+    'title': 'string',
+    'description': 'string',
+    'instructions': [_INSTRUCTION_STEP],
+    'verification': _TASK_VERIFICATION,
+    'knowledgeBlocks?': [_KNOWLEDGE_BLOCK],
+    'codeSnippets?': [_CODE_SNIPPET],
+    'hint?': 'string',
+    'troubleshooting?': ['string'],
+    'resources?': [_RESOURCE],
+    'solution?': 'string',
+}
+LAB_INSTRUCTION = {
+    'id': 'string',
+    'courseId': 'string',
+    'title': 'string',
+    'description': 'string',
+    'scenario': 'string',
+    'estimatedTime': 'number',
+    'difficulty': ('beginner', 'intermediate', 'advanced'),
+    'objectives': ['string'],
+    'prerequisites': ['string'],
+    'introduction': {'overview': 'string', 'scenario': 'string', 'architecture?': 'string'},
+    'tasks': [_LAB_TASK],
+    'summary': {'whatYouLearned': ['string'], 'nextSteps': ['string'], 'additionalResources?': [_RESOURCE]},
+}
+
+# The shapes above by the name of their exported interface
+INTERFACES = {
+    'LabInstruction': LAB_INSTRUCTION,
+    'LabTask': _LAB_TASK,
+    'InstructionStep': _INSTRUCTION_STEP,
+    'KnowledgeBlock': _KNOWLEDGE_BLOCK,
+    'CodeSnippet': _CODE_SNIPPET,
+    'TaskVerification': _TASK_VERIFICATION,
+    'Quiz': _QUIZ,
+    'Resource': _RESOURCE,
+}
+
+_TRIVIA = ('ws', 'line_comment', 'block_comment')
+
+
+class Problem:
+    """One defect in the edited text, at ``offset`` (line/column) inside a course, task and step."""
+
+    __slots__ = ('course_id', 'task_id', 'step', 'offset', 'line', 'column', 'message')
+
+    def __init__(self, course_id, task_id, step, offset, line, column, message):
+        self.course_id = course_id
+        self.task_id = task_id
+        self.step = step
+        self.offset = offset
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __repr__(self):
+        return f"<Problem {self.course_id} {self.task_id} {self.step} {self.message!r}>"
+
+    def __str__(self):
+        where = self.course_id or '(outside courses)'
+        if self.task_id is not None:
+            where += f", task {self.task_id}"
+        if self.step is not None:
+            where += f", step {self.step}"
+        return f"{where} (line {self.line}, column {self.column}): {self.message}"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SyntaxCheckError(ValueError):
+    """Raised with the ``problems`` an edit introduced."""
+
+    def __init__(self, problems):
+        super().__init__(f"{len(problems)} syntax problem(s) in edited blocks, first: {problems[0]}")
+        self.problems = problems
+
+
+def _scalar(node):
+    if node is not None and node.kind in ('string', 'template', 'number'):
+        return node.to_python()
+    return None
+
+
+def _kind_ok(node, shape):
+    if node.kind == 'expr':
+        # Computed values have no static type here; tsc checks those
+        return True
+    if shape == 'string':
+        return node.kind in ('string', 'template')
+    if shape == 'number':
+        return node.kind == 'number'
+    if isinstance(shape, tuple):
+        return node.kind in ('string', 'template') and node.to_python() in shape
+    if isinstance(shape, list):
+        return node.kind == 'array'
+    return node.kind == 'object'
+
+
+def _bad_expression(node):
+    """
+    Why an ``expr`` node cannot be a value, or None. The parser already
+    rejects an expression that swallowed the next ``key: value``, so a
+    deleted value can only leave an empty expression behind.
+    """
+    for kind, _, _ in tokenize(node.src, node.start, node.end):
+        if kind not in _TRIVIA:
+            return None
+    return "has no value"
+
+
+def _describe(shape):
+    if isinstance(shape, tuple):
+        return ' | '.join(repr(value) for value in shape)
+    if isinstance(shape, list):
+        return 'an array'
+    if isinstance(shape, dict):
+        return 'an object'
+    return f"a {shape}"
+
+
+class _ShapeChecker:
+    """Walks a parsed LabInstruction and collects ``(offset, task_id, step, message)`` tuples."""
+
+    def __init__(self):
+        self.found = []
+
+    def check(self, node, shape, path, task_id=None, step=None):
+        if not _kind_ok(node, shape):
+            self.found.append((node.start, task_id, step, f"{path} must be {_describe(shape)}"))
+            return
+        if node.kind == 'expr':
+            reason = _bad_expression(node)
+            if reason is not None:
+                self.found.append((node.start, task_id, step, f"{path} {reason}"))
+            return
+        if isinstance(shape, list):
+            for n, item in enumerate(node.children):
+                item_task, item_step = task_id, step
+                if shape[0] is _LAB_TASK:
+                    item_task = _scalar(item.get('id')) or str(n + 1)
+                elif shape[0] is _INSTRUCTION_STEP:
+                    item_step = _scalar(item.get('step')) or n + 1
+                self.check(item, shape[0], f"{path}[{n}]", item_task, item_step)
+        elif isinstance(shape, dict):
+            seen = set()
+            for prop in node.children:
+                if prop.key is None:
+                    # A spread can supply any key; nothing more to check statically
+                    return
+                name = prop.key if prop.key in shape else prop.key + '?'
+                if name not in shape:
+                    self.found.append((prop.start, task_id, step, f"{path}.{prop.key} is not a known property"))
+                    continue
+                seen.add(name)
+                self.check(prop.value, shape[name], f"{path}.{prop.key}", task_id, step)
+            for name in shape:
+                if not name.endswith('?') and name not in seen:
+                    self.found.append((node.start, task_id, step, f"{path} is missing {name!r}"))
+
+
+def _syntax_location(block, offset):
+    """``(task_id, step)`` of the innermost task and step objects still open at *offset* of *block*."""
+    # Frames are [bracket, key the container is the value of, items, id, step]
+    stack = []
+    key = None
+    in_value = False
+    try:
+        for kind, start, end in tokenize(block, 0, offset):
+            if kind in _TRIVIA:
+                continue
+            token = block[start:end]
+            if in_value:
+                in_value = False
+                if key in ('id', 'step') and stack and kind in ('string', 'template', 'number'):
+                    stack[-1][3 if key == 'id' else 4] = int(token) if kind == 'number' else token[1:-1]
+            if token in ('{', '['):
+                if stack and stack[-1][0] == '[':
+                    stack[-1][2] += 1
+                stack.append([token, key, 0, None, None])
+                key = None
+            elif token in ('}', ']'):
+                if stack:
+                    stack.pop()
+                key = None
+            elif token == ':':
+                in_value = True
+            elif token == ',':
+                key = None
+            elif key is None and stack and stack[-1][0] == '{' and kind in ('ident', 'string', 'number'):
+                key = token.strip('\'"')
+    except TSSyntaxError:
+        pass
+    task_id = step = None
+    for parent, frame in zip(stack, stack[1:]):
+        if frame[0] != '{' or parent[0] != '[':
+            continue
+        if parent[1] == 'tasks':
+            task_id, step = frame[3] or str(parent[2]), None
+        elif parent[1] == 'instructions' and task_id is not None:
+            step = frame[4] or parent[2]
+    return task_id, step
+
+
+def check_block(course_id, block, text=None, base=0):
+    """
+    Problems in the course block *block*, which should be the single
+    property ``course_id: {...}``. Offsets are reported as ``base`` plus
+    the offset in *block*; *text*, the full edited text, gives the line
+    numbers (the block alone is used without it).
+    """
+    problems = []
+
+    def report(offset, task_id, step, message, owner=course_id):
+        line, column = line_col(text if text is not None else block, base + offset)
+        problems.append(Problem(owner, task_id, step, base + offset, line, column, message))
+
+    ids = [course_id] if isinstance(course_id, str) else list(course_id)
+    source = '{' + block + '}'
+    try:
+        node = parse_value(source)
+        for kind, start, _ in tokenize(source, node.end):
+            if kind not in _TRIVIA:
+                raise TSSyntaxError("Unexpected text after the course block", source, start)
+    except TSSyntaxError as e:
+        offset = max(0, min(e.offset - 1, len(block)))
+        task_id, step = _syntax_location(block, offset)
+        owner = ids[0] if len(ids) == 1 else _owner(block, offset, ids)
+        report(offset, task_id, step, str(e).rsplit(' at line ', 1)[0], owner)
+        return problems
+
+    props = [prop for prop in node.children if prop.key is not None]
+    keys = [prop.key for prop in props]
+    if keys != ids:
+        report(0, None, None, f"expected course block(s) {', '.join(ids)}, found {', '.join(keys) or 'none'}")
+        return problems
+    for prop in props:
+        checker = _ShapeChecker()
+        checker.check(prop.value, LAB_INSTRUCTION, prop.key)
+        for offset, task_id, step, message in sorted(checker.found, key=lambda found: found[0]):
+            report(offset - 1, task_id, step, message, prop.key)
+    return problems
+
+
+def _owner(block, offset, ids):
+    """The course of *ids* whose key last appears before *offset* in a multi-course *block*."""
+    owner = ids[0]
+    pos = 0
+    for course_id in ids:
+        for quoted in (f"'{course_id}'", f'"{course_id}"', course_id):
+            found = block.find(quoted, pos, offset)
+            if found != -1:
+                owner, pos = course_id, found + len(quoted)
+                break
+    return owner
+
+
+def _punctuation(text):
+    """Kinds of the significant tokens of *text*, with punctuation and identifiers spelled out."""
+    return [text[start:end] if kind in ('punct', 'ident') else kind
+            for kind, start, end in tokenize(text) if kind not in _TRIVIA]
+
+
+def check_segment(course_id, old, new):
+    """
+    Problems in the edited segment *new* of the original segment *old*
+    (a course block, or text outside the blocks when *course_id* is None),
+    with lines counted from the start of the segment.
+    """
+    if new == old:
+        return []
+    if course_id is not None:
+        return check_block(course_id, new)
+    return _check_punctuation(old, new, new, 0)
+
+
+def edit_list(segments, new_texts):
+    """One whole-segment ``(start, end, replacement)`` edit per segment whose text changed."""
+    edits = []
+    pos = 0
+    for (_, text), new_text in zip(segments, new_texts):
+        if new_text != text:
+            edits.append((pos, pos + len(text), new_text))
+        pos += len(text)
+    return edits
+
+
+def check_edits(segments, edits, output, courses=None):
+    """
+    Problems introduced into *output* by *edits*.
+
+    *segments* are the ``(course_id, text)`` segments of the original text
+    (BlockIndex.segments()); *edits* are sorted, non-overlapping
+    ``(start, end, replacement)`` splices of the original text that
+    produced *output*. Only the segments an edit changed are re-checked,
+    and of the course blocks only those in *courses* when it is given.
+    """
+    original = ''.join(text for _, text in segments)
+    starts = []
+    pos = 0
+    for _, text in segments:
+        starts.append(pos)
+        pos += len(text)
+    touched = set()
+    for start, end, replacement in edits:
+        if original[start:end] == replacement:
+            continue
+        first = bisect_right(starts, start) - 1
+        last = bisect_right(starts, max(start, end - 1)) - 1
+        touched.update(range(first, last + 1))
+    if courses is not None:
+        touched = {i for i in touched if segments[i][0] is None or segments[i][0] in courses}
+    if not touched:
+        return []
+
+    # Group touched segments into runs; a separator between two courses is
+    # checked together with both of them
+    groups = []
+    for i in sorted(touched):
+        lo = hi = i
+        if segments[i][0] is None:
+            if 0 < i:
+                lo = i - 1
+            if i < len(segments) - 1:
+                hi = i + 1
+        if groups and lo <= groups[-1][1] + 1:
+            groups[-1][1] = max(groups[-1][1], hi)
+        else:
+            groups.append([lo, hi])
+
+    # Output offset of each group boundary: no edit straddles one, since
+    # an edit marks every segment it overlaps
+    bounds = sorted({starts[lo] for lo, _ in groups} | {starts[hi] + len(segments[hi][1]) for _, hi in groups})
+    shift = {}
+    delta = 0
+    i = 0
+    for bound in bounds:
+        while i < len(edits) and edits[i][0] < bound:
+            delta += len(edits[i][2]) - (edits[i][1] - edits[i][0])
+            i += 1
+        shift[bound] = bound + delta
+
+    problems = []
+    for lo, hi in groups:
+        if segments[lo][0] is None and lo == 0 or segments[hi][0] is None and hi == len(segments) - 1:
+            problems.extend(_check_outer(segments, lo, hi, starts, shift, output))
+            continue
+        out_start = shift[starts[lo]]
+        out_end = shift[starts[hi] + len(segments[hi][1])]
+        ids = [course_id for course_id, _ in segments[lo:hi + 1] if course_id is not None]
+        problems.extend(check_block(ids[0] if len(ids) == 1 else ids, output[out_start:out_end], output, out_start))
+    return problems
+
+
+def report_problems(problems, seconds=None, no_verify=False):
+    """
+    Print the outcome of a syntax check that took *seconds*. Problems end
+    the script with exit status 1, before anything is written, unless
+    *no_verify* is set; then they are only printed as a warning.
+    """
+    if not problems:
+        took = f" ({seconds * 1000:.1f} ms)" if seconds is not None else ""
+        print(f"🔎 Syntax check of changed blocks passed{took}\n")
+        return
+    if not no_verify:
+        print(f"\n❌ Syntax check failed, nothing written:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print(f"\n⚠️  Syntax check found {len(problems)} problem(s), writing anyway (--no-verify):")
+    for problem in problems:
+        print(f"  - {problem}")
+    print()
+
+
+def verify_or_exit(segments, edits, output, no_verify=False):
+    """check_edits() for a script about to write *output*, reported by report_problems(); returns the problems."""
+    start = time.perf_counter()
+    problems = check_edits(segments, edits, output)
+    report_problems(problems, time.perf_counter() - start, no_verify)
+    return problems
+
+
+def _check_outer(segments, lo, hi, starts, shift, output):
+    """Check a group that includes the export header or the footer, piece by piece."""
+    problems = []
+    courses = [i for i in range(lo, hi + 1) if segments[i][0] is not None]
+    if courses:
+        first, last = courses[0], courses[-1]
+        out_start = shift.get(starts[first])
+        out_end = shift.get(starts[last] + len(segments[last][1]))
+        if out_start is None or out_end is None:
+            # The edit straddles the header or footer; check the whole range
+            out_start, out_end = shift[starts[lo]], shift[starts[hi] + len(segments[hi][1])]
+            return _check_punctuation(''.join(text for _, text in segments[lo:hi + 1]),
+                                      output[out_start:out_end], output, out_start)
+        ids = [segments[i][0] for i in courses]
+        problems.extend(check_block(ids[0] if len(ids) == 1 else ids, output[out_start:out_end], output, out_start))
+        before = ''.join(text for _, text in segments[lo:first])
+        after = ''.join(text for _, text in segments[last + 1:hi + 1])
+        problems.extend(_check_punctuation(before, output[shift[starts[lo]]:out_start], output, shift[starts[lo]]))
+        problems.extend(_check_punctuation(after, output[out_end:shift[starts[hi] + len(segments[hi][1])]],
+                                           output, out_end))
+        return problems
+    out_start = shift[starts[lo]]
+    out_end = shift[starts[hi] + len(segments[hi][1])]
+    return _check_punctuation(''.join(text for _, text in segments[lo:hi + 1]), output[out_start:out_end],
+                              output, out_start)
+
+
+def _check_punctuation(before, after, output, base):
+    """Problems if the text outside the course blocks lost or gained tokens."""
+    def problem(offset, message):
+        line, column = line_col(output, base + offset)
+        return [Problem(None, None, None, base + offset, line, column, message)]
+
+    try:
+        new = _punctuation(after)
+    except TSSyntaxError as e:
+        return problem(e.offset, str(e).rsplit(' at line ', 1)[0])
+    if new != _punctuation(before):
+        return problem(0, "text outside the course blocks changed its tokens")
+    return []
@@ -0,0 +1,302 @@
+"""
+Synthetic lab catalogs for benchmarking the lab-maintenance tooling.
+
+generate_catalog() produces a `lab-instructions.ts` / `mock-data.ts` pair
+shaped like the real files: a `Record<string, LabInstruction>` with tasks,
+knowledge blocks, instruction steps, code snippets and quizzes, and a
+`Course[]` where part of the courses carry `requiresAzurePortal: true`.
+Output is deterministic for a given (courses, seed).
+"""
+
+import os
+import random
+
+from .snapshots import DEFAULT_SNAPSHOT_PATH, ORIGINAL_LABEL, SnapshotStore
+
+__all__ = ['generate_catalog', 'write_catalog']
+
+_FAMILIES = ['az', 'ai', 'dp', 'sc', 'ms', 'md', 'mb', 'pl', 'ws', 'm556']
+_CATEGORIES = ['Microsoft Azure', 'Microsoft Security', 'Microsoft Data Platform',
+               'Microsoft 365', 'Microsoft Dynamics 365', 'Windows Server']
+_LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+_ACTIONS = [
+    'Open the Azure Portal using the credentials provided in the Resources tab',
+    'In the Azure Portal, search for **{thing}** and select it',
+    'Open Cloud Shell and select **PowerShell**',
+    'In Cloud Shell, run the deployment script',
+    'Create a resource group named **RG-{name}** in **East US**',
+    'Create a new Azure virtual machine named **VM-{name}**',
+    'Deploy the sample application to Azure',
+    'Onboard the server to Azure Arc',
+    'Navigate to the Azure Portal and open **{thing}**',
+    'Connect to the VM using RDP (credentials in Resources tab)',
+    'Open PowerShell as Administrator',
+    'Open **Server Manager** and click **Add roles and features**',
+    'Select **{thing}** and click **Next**',
+    'Review the configuration and click **Install**',
+    'Verify that **{thing}** shows a status of **Running**',
+    'Browse to portal.azure.com and sign in',
+    'Enter **{name}** as the name and click **Create**',
+]
+_THINGS = ['Hyper-V', 'Storage Account', 'App Service', 'Virtual Network', 'Key Vault',
+           'Microsoft Sentinel', 'Log Analytics', 'DNS Server', 'Active Directory', 'IIS']
+_KNOWLEDGE = [
+    ('note', 'Lab Environment', 'This lab uses a pre-configured Windows VM. All tasks are performed locally on the VM using RDP.'),
+    ('tip', 'Keyboard Shortcuts', 'Press Ctrl+Alt+End to send Ctrl+Alt+Del to the remote session.'),
+    ('warning', 'Azure Resource Costs', 'Resources created in Azure incur costs. Delete the resource group when you are done.'),
+    ('important', 'Naming', 'Use the exact names given in each step so verification scripts can find your resources.'),
+]
+_WORDS = ('configure deploy monitor secure manage validate review create update server network '
+          'storage identity policy workload pipeline cluster database service role feature').split()
+
+
+def _sentence(rng, words=10):
+    text = ' '.join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _quote(text):
+    return "'" + text.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _course_id(rng, i):
+    family = _FAMILIES[i % len(_FAMILIES)]
+    return f"{family}-{1000 + i}t{rng.randint(0, 9)}0-a"
+
+
+def _task(rng, n, course_name):
+    lines = [
+        "            {",
+        f"                id: 'task-{n}',",
+        f"                order: {n},",
+        f"                title: {_quote(_sentence(rng, 4)[:-1])},",
+        f"                description: {_quote(_sentence(rng, 14))},",
+        "",
+        "                knowledgeBlocks: [",
+    ]
+    blocks = rng.sample(_KNOWLEDGE, rng.randint(1, 2))
+    for j, (kind, title, content) in enumerate(blocks):
+        lines += [
+            "                    {",
+            f"                        type: '{kind}',",
+            f"                        title: {_quote(title)},",
+            f"                        content: {_quote(content)}",
+            "                    }" + (',' if j < len(blocks) - 1 else ''),
+        ]
+    lines += ["                ],", "", "                instructions: ["]
+    steps = rng.randint(4, 9)
+    for step in range(1, steps + 1):
+        action = rng.choice(_ACTIONS).format(thing=rng.choice(_THINGS), name=course_name)
+        sep = ',' if step < steps else ''
+        if rng.random() < 0.3:
+            lines += [
+                "                    {",
+                f"                        step: {step},",
+                f"                        action: {_quote(action)},",
+                f"                        context: {_quote(_sentence(rng, 8))}",
+                "                    }" + sep,
+            ]
+        else:
+            lines.append(f"                    {{ step: {step}, action: {_quote(action)} }}{sep}")
+    lines += ["                ],", ""]
+    if rng.random() < 0.4:
+        lines += [
+            "                codeSnippets: [",
+            "                    {",
+            "                        language: 'powershell',",
+            f"                        code: `# Configure {course_name}",
+            f"New-Item -Path C:\\Labs\\{course_name} -ItemType Directory",
+            "Get-Service | Where-Object { $_.Status -eq 'Running' }`,",
+            "                        description: 'Prepare the lab folder'",
+            "                    }",
+            "                ],",
+            "",
+        ]
+    if rng.random() < 0.3:
+        lines += [
+            "                verification: {",
+            "                    type: 'quiz',",
+            f"                    description: {_quote(_sentence(rng, 6))},",
+            "                    quiz: {",
+            f"                        question: {_quote(_sentence(rng, 8)[:-1] + '?')},",
+            f"                        options: [{', '.join(_quote(rng.choice(_THINGS)) for _ in range(4))}],",
+            f"                        correctAnswer: {rng.randint(0, 3)},",
+            f"                        explanation: {_quote(_sentence(rng, 10))}",
+            "                    }",
+            "                },",
+        ]
+    else:
+        lines += [
+            "                verification: {",
+            "                    type: 'manual',",
+            f"                    description: {_quote(_sentence(rng, 6))},",
+            f"                    expectedResult: {_quote(_sentence(rng, 10))}",
+            "                },",
+        ]
+    lines += [f"                hint: {_quote(_sentence(rng, 12))}", "            }"]
+    return lines
+
+
+def _instruction(rng, course_id, cloud_slice):
+    name = course_id.split('-')[0].upper() + str(rng.randint(10, 99))
+    header = "Enables Azure Portal Access" if cloud_slice or rng.random() < 0.5 else "VM-based lab"
+    lines = [
+        "    /**",
+        f"     * {course_id.upper()}: {_sentence(rng, 5)[:-1]}",
+        f"     * {header}",
+        "     */",
+        f"    '{course_id}': {{",
+        f"        id: '{course_id}-lab-1',",
+        f"        courseId: '{course_id}',",
+        f"        title: {_quote(_sentence(rng, 6)[:-1])},",
+        f"        description: {_quote(_sentence(rng, 16))},",
+        f"        scenario: {_quote(_sentence(rng, 24))},",
+        f"        estimatedTime: {rng.choice([30, 45, 60, 90])},",
+        f"        difficulty: '{rng.choice(_LEVELS).lower()}',",
+        "",
+        "        objectives: [",
+        "            'Deploy the core services to Azure',",
+        f"            {_quote(_sentence(rng, 6)[:-1])},",
+        "            'Configure hybrid management with Azure Arc',",
+        f"            {_quote(_sentence(rng, 6)[:-1])}",
+        "        ],",
+        "",
+        "        prerequisites: [",
+        "            'Access to Azure Portal',",
+        f"            {_quote(_sentence(rng, 6)[:-1])}",
+        "        ],",
+        "",
+        "        introduction: {",
+        f"            overview: {_quote(_sentence(rng, 30))},",
+        f"            scenario: {_quote(_sentence(rng, 20))},",
+        f"            architecture: {_quote(_sentence(rng, 12))}",
+        "        },",
+        "",
+        "        tasks: [",
+    ]
+    tasks = rng.randint(2, 5)
+    for n in range(1, tasks + 1):
+        task = _task(rng, n, name)
+        if n < tasks:
+            task[-1] += ','
+        lines += task
+    lines += [
+        "        ],",
+        "",
+        "        summary: {",
+        f"            whatYouLearned: [{_quote(_sentence(rng, 4))}, {_quote(_sentence(rng, 4))}],",
+        f"            nextSteps: [{_quote(_sentence(rng, 5))}],",
+        "            additionalResources: [",
+        "                { title: 'Documentation', url: 'https://learn.microsoft.com/', type: 'documentation' }",
+        "            ]",
+        "        }",
+        "    }",
+    ]
+    return lines
+
+
+def _course(rng, course_id, cloud_slice):
+    title = _sentence(rng, 5)[:-1] + (' [Cloud Slice Provided]' if cloud_slice else '')
+    lines = [
+        "    {",
+        f"        id: '{course_id}',",
+        f"        code: '{course_id.upper()}',",
+        f"        title: {_quote(title)},",
+        f"        description: {_quote(_sentence(rng, 8))},",
+        f"        price: {rng.randint(15, 95)}.0,",
+        "        image: '/images/course.png',",
+        f"        category: {_quote(rng.choice(_CATEGORIES))},",
+        f"        tags: [{_quote(rng.choice(_THINGS))}, {_quote(rng.choice(_THINGS))}],",
+        f"        level: '{rng.choice(_LEVELS)}',",
+    ]
+    if cloud_slice:
+        lines.append("        requiresAzurePortal: true,")
+    lines.append("    }")
+    return lines
+
+
+def generate_catalog(courses, seed=0, cloud_slice_ratio=0.45):
+    """
+    Return ``(lab_instructions_ts, mock_data_ts)`` for *courses* courses.
+
+    Every course gets lab instructions; about *cloud_slice_ratio* of them
+    are flagged as Cloud Slice in the mock data.
+    """
+    rng = random.Random(seed)
+    ids = []
+    seen = set()
+    for i in range(courses):
+        course_id = _course_id(rng, i)
+        while course_id in seen:
+            course_id += 'x'
+        seen.add(course_id)
+        ids.append((course_id, rng.random() < cloud_slice_ratio))
+
+    lab = [
+        "import { LabInstruction } from '@/types/lab-instructions';",
+        "",
+        "/**",
+        " * Synthetic lab instructions generated for benchmarking",
+        " */",
+        "",
+        "export const LAB_INSTRUCTIONS: Record<string, LabInstruction> = {",
+    ]
+    for n, (course_id, cloud_slice) in enumerate(ids):
+        block = _instruction(rng, course_id, cloud_slice)
+        block[-1] += ','
+        lab += block
+        if n < len(ids) - 1:
+            lab.append("")
+    lab += [
+        "};",
+        "",
+        "export function getLabInstructions(courseId: string): LabInstruction | null {",
+        "    return LAB_INSTRUCTIONS[courseId] || null;",
+        "}",
+        "",
+    ]
+
+    mock = [
+        "export interface Course {",
+        "    id: string;",
+        "    code: string;",
+        "    title: string;",
+        "    description: string;",
+        "    price: number;",
+        "    image: string;",
+        "    category: string;",
+        "    tags: string[];",
+        "    level: 'Beginner' | 'Intermediate' | 'Advanced';",
+        "    requiresAzurePortal?: boolean;",
+        "}",
+        "",
+        "export const MOCK_COURSES: Course[] = [",
+    ]
+    for course_id, cloud_slice in ids:
+        block = _course(rng, course_id, cloud_slice)
+        block[-1] += ','
+        mock += block
+    mock += ["];", ""]
+    return '\n'.join(lab), '\n'.join(mock)
+
+
+def write_catalog(directory, courses, seed=0):
+    """
+    Write a synthetic catalog using the repository layout under *directory*,
+    and snapshot the instructions as the original the clean scripts start from.
+    """
+    lab, mock = generate_catalog(courses, seed)
+    paths = {
+        os.path.join(directory, 'src', 'data', 'lab-instructions.ts'): lab,
+        os.path.join(directory, 'src', 'data', 'lab-instructions.ts.backup'): lab,
+        os.path.join(directory, 'src', 'lib', 'mock-data.ts'): mock,
+    }
+    for path, text in paths.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    store_path = os.path.join(directory, DEFAULT_SNAPSHOT_PATH)
+    with SnapshotStore(store_path) as store:
+        store.snapshot(lab, ORIGINAL_LABEL)
+    return list(paths) + [store_path]
@@ -0,0 +1,517 @@
+"""
+Tokenizer and parser for the subset of TypeScript used by the lab data files.
+
+Understands strings, template literals (including ${...} expressions),
+comments, numbers, identifiers and nested braces/brackets/parens, which is
+everything `src/data/lab-instructions.ts` and `src/lib/mock-data.ts` contain.
+The whole file is tokenized in a single left-to-right pass; exported
+declarations are parsed into a tree of nodes that keep exact source offsets,
+so callers can slice or splice the original text without searching it.
+"""
+
+import re
+
+__all__ = [
+    'TSSyntaxError',
+    'Node',
+    'Property',
+    'Declaration',
+    'tokenize',
+    'parse_value',
+    'parse_module',
+    'find_export',
+    'line_col',
+    'unescape',
+    'template_end',
+    'TOKEN_RE',
+    'OPEN',
+    'CLOSE',
+]
+
+# One token per match, named by its group; the streaming reader in
+# labtools.stream uses the same table.
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<bad_comment>/\*)
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<bad_string>['"])
+  | (?P<number>(?:0[xXbBoO][0-9a-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)n?)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<template>`)
+  | (?P<punct>\.\.\.|=>|\?\?|\?\.|[{}\[\]():;,=<>?|&.!*+\-/%@^~#])
+""", re.VERBOSE | re.DOTALL)
+
+# Inside a template literal only these three things are interesting.
+_TEMPLATE_RE = re.compile(r"`|\\.|\$\{", re.DOTALL)
+
+# Opening bracket -> its closing bracket
+OPEN = {'{': '}', '[': ']', '(': ')'}
+CLOSE = {'}', ']', ')'}
+
+_TRIVIA = ('ws', 'line_comment', 'block_comment')
+
+_ESCAPES = {
+    'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v',
+    '0': '\0', '\n': '', '\\': '\\', "'": "'", '"': '"', '`': '`', '$': '$',
+}
+_ESCAPE_RE = re.compile(r"\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|.)", re.DOTALL)
+
+
+class TSSyntaxError(ValueError):
+    """Raised when the source leaves the supported TypeScript subset."""
+
+    def __init__(self, message, text, offset, start_line=1, start_column=1):
+        # start_line/start_column locate text[0] when *text* is only a window
+        # of a larger file, as in streaming mode.
+        line, col = line_col(text, offset)
+        if line == 1:
+            col += start_column - 1
+        line += start_line - 1
+        super().__init__(f"{message} at line {line}, column {col}")
+        self.offset = offset
+        self.line = line
+        self.column = col
+
+
+def line_col(text, offset):
+    """Return the 1-based (line, column) of *offset* in *text*."""
+    line = text.count('\n', 0, offset) + 1
+    col = offset - (text.rfind('\n', 0, offset) + 1) + 1
+    return line, col
+
+
+def unescape(body):
+    """Return the value of a string literal's *body*, the text between its quotes."""
+    def sub(match):
+        esc = match.group(1)
+        if esc[0] == 'u':
+            return chr(int(esc[2:-1] if esc[1] == '{' else esc[1:], 16))
+        if esc[0] == 'x':
+            return chr(int(esc[1:], 16))
+        if esc == '\r\n':
+            return ''
+        return _ESCAPES.get(esc, esc)
+
+    return _ESCAPE_RE.sub(sub, body) if '\\' in body else body
+
+
+def template_end(text, pos):
+    """Return the offset just past the template literal opening at *pos*."""
+    search = _TEMPLATE_RE.search
+    i = pos + 1
+    while True:
+        match = search(text, i)
+        if match is None:
+            raise TSSyntaxError("Unterminated template literal", text, pos)
+        tok = match.group()
+        i = match.end()
+        if tok == '`':
+            return i
+        if tok == '${':
+            # Skip the embedded expression, which may nest braces and templates.
+            depth = 1
+            for kind, start, end in tokenize(text, i):
+                if kind == 'punct':
+                    ch = text[start]
+                    if ch == '{':
+                        depth += 1
+                    elif ch == '}':
+                        depth -= 1
+                        if depth == 0:
+                            i = end
+                            break
+            else:
+                raise TSSyntaxError("Unterminated template expression", text, match.start())
+
+
+def tokenize(text, pos=0, endpos=None):
+    """
+    Yield ``(kind, start, end)`` tuples covering *text* from *pos*.
+
+    Kinds are ``ws``, ``line_comment``, ``block_comment``, ``string``,
+    ``template``, ``number``, ``ident`` and ``punct``.
+    """
+    match = TOKEN_RE.match
+    if endpos is None:
+        endpos = len(text)
+    while pos < endpos:
+        m = match(text, pos)
+        if m is None:
+            raise TSSyntaxError(f"Unexpected character {text[pos]!r}", text, pos)
+        kind = m.lastgroup
+        if kind == 'template':
+            end = template_end(text, pos)
+        elif kind == 'bad_comment':
+            raise TSSyntaxError("Unterminated block comment", text, pos)
+        elif kind == 'bad_string':
+            raise TSSyntaxError("Unterminated string literal", text, pos)
+        else:
+            end = m.end()
+        yield kind, pos, end
+        pos = end
+
+
+class Node:
+    """
+    A parsed value with its exact ``[start, end)`` span in ``src``.
+
+    ``kind`` is one of ``object``, ``array``, ``string``, ``template``,
+    ``number``, ``literal`` (true/false/null/undefined/identifiers) or
+    ``expr`` for anything more complex, which is kept as raw source.
+    Objects carry their properties and arrays their items in ``children``.
+    """
+
+    __slots__ = ('kind', 'start', 'end', 'children', 'src')
+
+    def __init__(self, kind, start, end, children, src):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.children = children
+        self.src = src
+
+    def __repr__(self):
+        return f"<Node {self.kind} {self.start}:{self.end}>"
+
+    @property
+    def text(self):
+        return self.src[self.start:self.end]
+
+    def __iter__(self):
+        return iter(self.children or ())
+
+    def __len__(self):
+        return len(self.children or ())
+
+    def get(self, key, default=None):
+        """Return the value node of property *key* of an object node."""
+        if self.kind == 'object':
+            for prop in self.children:
+                if prop.key == key:
+                    return prop.value
+        return default
+
+    def prop(self, key):
+        """Return the Property named *key* of an object node, or None."""
+        if self.kind == 'object':
+            for prop in self.children:
+                if prop.key == key:
+                    return prop
+        return None
+
+    def keys(self):
+        return [prop.key for prop in self.children] if self.kind == 'object' else []
+
+    def to_python(self):
+        """Convert the node into plain Python objects (dict/list/str/...)."""
+        kind = self.kind
+        if kind == 'object':
+            return {p.key: p.value.to_python() for p in self.children if p.key is not None}
+        if kind == 'array':
+            return [item.to_python() for item in self.children]
+        raw = self.src[self.start:self.end]
+        if kind in ('string', 'template'):
+            return unescape(raw[1:-1])
+        if kind == 'number':
+            raw = raw.replace('_', '').rstrip('n')
+            try:
+                return int(raw, 0)
+            except ValueError:
+                return float(raw)
+        if kind == 'literal':
+            return {'true': True, 'false': False, 'null': None, 'undefined': None}.get(raw, raw)
+        return raw
+
+
+class Property:
+    """
+    One ``key: value`` entry of an object literal.
+
+    ``start`` is the offset of the key and ``end`` the end of the value;
+    ``doc_start`` extends ``start`` backwards over any comments that sit
+    directly above the key, so a course block can be moved together with
+    its header comment. Spread entries (``...x``) have ``key`` set to None.
+    """
+
+    __slots__ = ('key', 'start', 'end', 'doc_start', 'value')
+
+    def __init__(self, key, start, end, doc_start, value):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.doc_start = doc_start
+        self.value = value
+
+    def __repr__(self):
+        return f"<Property {self.key!r} {self.start}:{self.end}>"
+
+
+class Declaration:
+    """A top-level ``[export] const NAME[: Type] = value`` declaration."""
+
+    __slots__ = ('name', 'start', 'end', 'exported', 'value')
+
+    def __init__(self, name, start, end, exported, value):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.exported = exported
+        self.value = value
+
+    def __repr__(self):
+        return f"<Declaration {self.name} {self.start}:{self.end}>"
+
+
+class _Parser:
+    """Recursive-descent parser over the significant tokens of the lexer."""
+
+    def __init__(self, text, pos=0, endpos=None):
+        self.text = text
+        self._tokens = tokenize(text, pos, endpos)
+        self._comment_start = None
+        self.tok = None
+        self.advance()
+
+    def advance(self):
+        """Move to the next significant token, remembering leading comments."""
+        self._comment_start = None
+        for tok in self._tokens:
+            kind = tok[0]
+            if kind == 'ws':
+                continue
+            if kind in _TRIVIA:
+                if self._comment_start is None:
+                    self._comment_start = tok[1]
+                continue
+            self.tok = tok
+            return tok
+        self.tok = None
+        return None
+
+    def error(self, message):
+        offset = self.tok[1] if self.tok else len(self.text)
+        raise TSSyntaxError(message, self.text, offset)
+
+    def is_punct(self, ch):
+        tok = self.tok
+        return tok is not None and tok[0] == 'punct' and self.text[tok[1]:tok[2]] == ch
+
+    def expect(self, ch):
+        if not self.is_punct(ch):
+            self.error(f"Expected {ch!r}")
+        tok = self.tok
+        self.advance()
+        return tok
+
+    def skip_balanced(self):
+        """Consume one token, or a whole bracketed group if it opens one."""
+        text = self.text
+        kind, start, end = self.tok
+        ch = text[start:end]
+        if kind == 'punct' and ch in OPEN:
+            stack = [OPEN[ch]]
+            while stack:
+                if self.advance() is None:
+                    raise TSSyntaxError(f"Unclosed {ch!r}", text, start)
+                k, s, e = self.tok
+                if k == 'punct':
+                    c = text[s:e]
+                    if c in OPEN:
+                        stack.append(OPEN[c])
+                    elif c in CLOSE:
+                        if c != stack.pop():
+                            self.error(f"Mismatched {c!r}")
+            end = self.tok[2]
+        elif kind == 'punct' and ch in CLOSE:
+            self.error(f"Unexpected {ch!r}")
+        self.advance()
+        return end
+
+    def value(self):
+        tok = self.tok
+        if tok is None:
+            self.error("Unexpected end of input")
+        text = self.text
+        kind, start, end = tok
+        if kind == 'punct':
+            ch = text[start:end]
+            if ch == '{':
+                node = self.object()
+            elif ch == '[':
+                node = self.array()
+            else:
+                node = None
+        elif kind in ('string', 'template', 'number'):
+            node = Node(kind, start, end, None, text)
+            self.advance()
+        else:
+            node = Node('literal', start, end, None, text)
+            self.advance()
+        if node is not None and self.at_value_end():
+            return node
+        # Anything beyond a plain literal (calls, `as const`, arithmetic,
+        # arrow functions...) is kept verbatim as an expression node. A
+        # top-level ':' can only close a ternary; any other one means a value
+        # or a ',' is missing and the next `key:` was swallowed.
+        last = node.end if node is not None else start
+        ternaries = 0
+        while not self.at_value_end():
+            if self.is_punct('?'):
+                ternaries += 1
+            elif self.is_punct(':'):
+                if not ternaries:
+                    self.error("Unexpected ':' (missing value or ',')")
+                ternaries -= 1
+            last = self.skip_balanced()
+        return Node('expr', start, last, None, text)
+
+    def at_value_end(self):
+        tok = self.tok
+        if tok is None:
+            return True
+        if tok[0] != 'punct':
+            return False
+        return self.text[tok[1]:tok[2]] in (',', ';', '}', ']', ')')
+
+    def object(self):
+        text = self.text
+        start = self.tok[1]
+        self.advance()
+        props = []
+        while not self.is_punct('}'):
+            if self.tok is None:
+                raise TSSyntaxError("Unclosed '{'", text, start)
+            doc_start = self._comment_start
+            kind, kstart, kend = self.tok
+            if kind == 'punct' and text[kstart:kend] == '...':
+                self.advance()
+                value = self.value()
+                prop = Property(None, kstart, value.end, doc_start or kstart, value)
+            else:
+                if kind in ('ident', 'number'):
+                    key = text[kstart:kend]
+                elif kind == 'string':
+                    key = unescape(text[kstart + 1:kend - 1])
+                else:
+                    self.error("Expected property name")
+                self.advance()
+                if self.is_punct('?'):
+                    self.advance()
+                if self.is_punct(':'):
+                    self.advance()
+                    value = self.value()
+                elif self.is_punct(',') or self.is_punct('}'):
+                    # Shorthand property: `{ foo }`.
+                    value = Node('literal', kstart, kend, None, text)
+                else:
+                    self.error("Expected ':' after property name")
+                prop = Property(key, kstart, value.end, doc_start or kstart, value)
+            props.append(prop)
+            if self.is_punct(','):
+                self.advance()
+            elif not self.is_punct('}'):
+                self.error("Expected ',' or '}'")
+        end = self.tok[2]
+        self.advance()
+        return Node('object', start, end, props, text)
+
+    def array(self):
+        text = self.text
+        start = self.tok[1]
+        self.advance()
+        items = []
+        while not self.is_punct(']'):
+            if self.tok is None:
+                raise TSSyntaxError("Unclosed '['", text, start)
+            items.append(self.value())
+            if self.is_punct(','):
+                self.advance()
+            elif not self.is_punct(']'):
+                self.error("Expected ',' or ']'")
+        end = self.tok[2]
+        self.advance()
+        return Node('array', start, end, items, text)
+
+    def module(self, wanted=None):
+        """
+        Parse the top-level ``const`` declarations of a module.
+
+        Everything else (imports, interfaces, functions) is skipped token by
+        token. With *wanted* set, parsing stops once all of those names have
+        been found.
+        """
+        text = self.text
+        decls = {}
+        remaining = set(wanted) if wanted else None
+        depth = 0
+        exported = False
+        while self.tok is not None:
+            kind, start, end = self.tok
+            word = text[start:end]
+            if kind == 'punct':
+                if word in OPEN:
+                    depth += 1
+                elif word in CLOSE:
+                    depth -= 1
+                exported = False
+                self.advance()
+                continue
+            if depth or kind != 'ident':
+                exported = False
+                self.advance()
+                continue
+            if word == 'export':
+                exported = True
+                decl_start = start
+                self.advance()
+                continue
+            if word not in ('const', 'let', 'var'):
+                exported = False
+                self.advance()
+                continue
+            if not exported:
+                decl_start = start
+            self.advance()
+            if self.tok is None or self.tok[0] != 'ident':
+                exported = False
+                continue
+            name = text[self.tok[1]:self.tok[2]]
+            self.advance()
+            # Skip an optional type annotation up to the initializer.
+            while self.tok is not None and not self.is_punct('=') and not self.is_punct(';'):
+                self.skip_balanced()
+            if self.is_punct('='):
+                self.advance()
+                value = self.value()
+                decls[name] = Declaration(name, decl_start, value.end, exported, value)
+                if remaining is not None:
+                    remaining.discard(name)
+                    if not remaining:
+                        break
+            exported = False
+        return decls
+
+
+def parse_value(text, pos=0, endpos=None):
+    """Parse a single value literal starting at the first token after *pos*."""
+    parser = _Parser(text, pos, endpos)
+    return parser.value()
+
+
+def parse_module(text, names=None):
+    """
+    Parse *text* and return ``{name: Declaration}`` for its top-level consts.
+
+    If *names* is given, parsing stops as soon as all of them were found.
+    """
+    return _Parser(text).module(names)
+
+
+def find_export(text, name):
+    """Return the value Node of top-level const *name*, or raise KeyError."""
+    decl = parse_module(text, [name]).get(name)
+    if decl is None:
+        raise KeyError(f"{name} is not declared at the top level")
+    return decl.value
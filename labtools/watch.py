@@ -0,0 +1,120 @@
+"""
+File change notification for --watch modes.
+
+watch() yields the set of watched paths that changed. On Linux it uses
+inotify through ctypes on the parent directories, which also catches
+editors that save by writing a new file and renaming it over the old
+one. Elsewhere, or when inotify is unavailable, it falls back to polling
+each file's mtime, size and inode.
+"""
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from .fileio import file_signature
+
+__all__ = ['watch', 'inotify_available']
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+def _libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available():
+    return _libc() is not None
+
+
+def _poll(paths, interval):
+    seen = {path: file_signature(path) for path in paths}
+    while True:
+        time.sleep(interval)
+        changed = set()
+        for path in paths:
+            signature = file_signature(path)
+            if signature != seen[path]:
+                seen[path] = signature
+                changed.add(path)
+        if changed:
+            yield changed
+
+
+def _inotify(libc, paths, debounce):
+    fd = libc.inotify_init1(_IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    try:
+        directories = {}
+        for path in paths:
+            directory = os.path.dirname(path)
+            if directory in directories.values():
+                continue
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            directories[wd] = directory
+        wanted = set(paths)
+        while True:
+            changed = set()
+            timeout = None
+            # Block for the first event, then collect what follows within
+            # *debounce* seconds so one save gives one notification
+            while True:
+                try:
+                    ready, _, _ = select.select([fd], [], [], timeout)
+                except InterruptedError:
+                    continue
+                if not ready:
+                    break
+                data = os.read(fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    wd, _, _, length = _EVENT.unpack_from(data, offset)
+                    name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                    offset += _EVENT.size + length
+                    path = os.path.join(directories.get(wd, ''), os.fsdecode(name))
+                    if path in wanted:
+                        changed.add(path)
+                timeout = debounce
+            if changed:
+                yield changed
+    finally:
+        os.close(fd)
+
+
+def watch(paths, interval=0.5, debounce=0.05, poll=False):
+    """
+    Yield the set of *paths* (as given) that changed, forever.
+
+    Uses inotify unless *poll* is true or it is unavailable, in which case
+    the files are polled every *interval* seconds.
+    """
+    absolute = {os.path.abspath(path): path for path in paths}
+    libc = None if poll else _libc()
+    if libc is not None:
+        try:
+            events = _inotify(libc, list(absolute), debounce)
+            for changed in events:
+                yield {absolute[path] for path in changed}
+            return
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EMFILE, errno.ENOSPC, errno.EPERM):
+                raise
+    for changed in _poll(list(absolute), interval):
+        yield {absolute[path] for path in changed}
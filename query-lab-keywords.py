@@ -0,0 +1,60 @@
+"""
+Query the keyword index of lab-instructions.ts without rescanning the file.
+
+The index maps every Azure keyword occurrence to its (course, task, step) and
+is cached in .lab-keywords.json; it is rebuilt only when the file changes.
+
+    python query-lab-keywords.py                                # counts per keyword
+    python query-lab-keywords.py portal.azure.com --non-cloud   # non-Cloud Slice courses mentioning it
+    python query-lab-keywords.py 'Azure Portal' --course ws011wv-2025
+"""
+
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH, MOCK_DATA_PATH, parse_mock_courses, cloud_slice_course_ids
+from labtools.fileio import read_text
+from labtools.keywords import INDEX_KEYWORDS, KeywordIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the cached keyword index of the lab instructions")
+    parser.add_argument('keyword', nargs='?', choices=INDEX_KEYWORDS, metavar='KEYWORD',
+                        help=f"one of: {', '.join(INDEX_KEYWORDS)}")
+    parser.add_argument('--file', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions file (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--non-cloud', action='store_true',
+                        help="only courses without requiresAzurePortal in mock-data.ts")
+    parser.add_argument('--course', metavar='ID', help="list the task and step of every occurrence in one course")
+    args = parser.parse_args()
+
+    index = KeywordIndex.cached(args.file)
+
+    if args.keyword is None:
+        print(f"📊 Keyword occurrences in {args.file}:")
+        for keyword, count in index.counts().items():
+            print(f"  '{keyword}': {count} in {len(index.by_course(keyword))} courses")
+        return
+
+    if args.course:
+        locations = index.locations(args.keyword, args.course)
+        print(f"🔍 '{args.keyword}' in {args.course}: {len(locations)}")
+        for _, task_id, step, offset in locations:
+            where = f"task {task_id}" if task_id else "outside tasks"
+            if step is not None:
+                where += f", step {step}"
+            print(f"  - {where} (offset {offset})")
+        return
+
+    counts = index.by_course(args.keyword)
+    if args.non_cloud:
+        cloud_slice = set(cloud_slice_course_ids(parse_mock_courses(read_text(MOCK_DATA_PATH))))
+        counts = {course_id: count for course_id, count in counts.items() if course_id not in cloud_slice}
+
+    label = "non-Cloud Slice courses" if args.non_cloud else "courses"
+    print(f"🔍 {len(counts)} {label} mention '{args.keyword}':")
+    for course_id, count in counts.items():
+        print(f"  - {course_id}: {count}")
+
+
+if __name__ == '__main__':
+    main()
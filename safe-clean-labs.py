@@ -1,18 +1,51 @@
 """
 SAFE script to remove Azure Portal references - only replaces text, doesn't restructure
+
+The course blocks the run changed are re-parsed and checked against the
+LabInstruction shape before anything is written; a run that would leave broken
+TypeScript reports what it broke and writes nothing (--no-verify writes it anyway).
+
+Input: the original update-lab-instructions.py snapshotted, or --from-snapshot N
+or --input PATH (see final-clean-labs.py).
 """
 
 import re
+import sys
+import argparse
 
-# Read from backup
-with open('src/data/lab-instructions.ts.backup', 'r', encoding='utf-8') as f:
-    content = f.read()
+from labtools import BlockIndex, BlockEditor, RuleSet
+from labtools.fileio import read_text, write_text
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, read_original
+from labtools.syntax import verify_or_exit
 
-print("✅ Loaded backup file\n")
+parser = argparse.ArgumentParser(description="Replace Azure Portal wording without restructuring courses")
+parser.add_argument('--no-verify', action='store_true',
+                    help="write the output even if the syntax check of the changed blocks fails")
+parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                    help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+parser.add_argument('--from-snapshot', type=int, metavar='N',
+                    help="start from snapshot N, or the N-th newest for -N (default: the newest original "
+                         "taken by update-lab-instructions.py)")
+parser.add_argument('--input', metavar='PATH', help="start from this file instead of a snapshot")
+args = parser.parse_args()
+if args.input and args.from_snapshot is not None:
+    parser.error("--input cannot be combined with --from-snapshot")
+
+# Start from the original, not from a file an earlier run already cleaned
+if args.input:
+    content = read_text(args.input)
+    print(f"✅ Reading {args.input}\n")
+else:
+    try:
+        original, content = read_original(args.snapshots, args.from_snapshot)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+    print(f"✅ Reading snapshot #{original.id} ({original.label}, {original.taken_at})\n")
 print("🔧 Applying safe text replacements...\n")
 
 # Only do safe text replacements that won't break syntax
-safe_replacements = [
+safe_replacements = RuleSet([
     # Comments
     (r'/\*\*\n\s+\*\s+Enables Azure Portal Access \(for hybrid scenarios\)\n\s+\*/', 
      '/**\n     * VM-ONLY LAB: No Azure Portal access required\n     */'),
@@ -25,17 +58,24 @@ safe_replacements = [
     (r"'In the Azure Portal,", "'In the VM,"),
     (r"'Open Cloud Shell'", "'Open PowerShell'"),
     (r"'In Cloud Shell,", "'In PowerShell,"),
-]
+])
 
-for pattern, replacement in safe_replacements:
-    count = len(re.findall(pattern, content))
+# Every pattern is applied in one scan of the file, recorded as edits so
+# the changed course blocks can be checked
+index = BlockIndex(content)
+editor = BlockEditor(index)
+hit_counts = editor.apply(safe_replacements)
+content = editor.render()
+for count in hit_counts.values():
     if count > 0:
-        content = re.sub(pattern, replacement, content)
         print(f"  ✅ Replaced pattern ({count} times)")
 
+# Check the changed blocks before anything is written
+verify_or_exit(index.segments(), editor.edits(), content, args.no_verify)
+
 # Write the cleaned content
-with open('src/data/lab-instructions.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if not write_text('src/data/lab-instructions.ts', content):
+    print("✅ File already up to date, not rewritten")
 
 print("\n✅ Safe replacements complete!")
 print("✅ File syntax preserved")
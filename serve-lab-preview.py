@@ -0,0 +1,74 @@
+"""
+Local preview service for the super-admin UI.
+
+Loads and indexes the lab instructions and mock data once, then answers
+clean-preview and keyword-report requests per courseId from memory. Both
+files are re-checked on every request and only the edited course blocks are
+re-parsed, so previews follow the files without a restart. By default it
+previews src/data/lab-instructions.ts, the file the app serves (--input for
+another one).
+
+    python serve-lab-preview.py                         # http://127.0.0.1:8765
+    python serve-lab-preview.py --socket /tmp/lab-preview.sock
+
+    curl http://127.0.0.1:8765/courses/ws011wv-2025/preview
+    curl http://127.0.0.1:8765/courses/ws011wv-2025/keywords?cleaned=1
+"""
+
+import os
+import stat
+import signal
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_PATH, MOCK_DATA_PATH
+from labtools.preview import PreviewCatalog, make_server
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve clean previews and keyword reports per course")
+    parser.add_argument('--input', default=LAB_INSTRUCTIONS_PATH,
+                        help=f"lab instructions to preview (default: {LAB_INSTRUCTIONS_PATH})")
+    parser.add_argument('--mock-data', default=MOCK_DATA_PATH,
+                        help=f"mock course data to read (default: {MOCK_DATA_PATH})")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="TCP port (default: 8765)")
+    parser.add_argument('--socket', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--quiet', action='store_true', help="do not log requests")
+    args = parser.parse_args()
+    if args.socket and os.path.lexists(args.socket) and not _is_socket(args.socket):
+        parser.error(f"--socket {args.socket} exists and is not a socket")
+
+    catalog = PreviewCatalog(args.input, args.mock_data)
+    print(f"✅ Loaded {args.input} ({len(catalog.courses())} courses) and {args.mock_data}"
+          f" in {catalog.last_reload['ms']} ms")
+
+    if args.socket and _is_socket(args.socket):
+        # Left behind by a server that did not shut down cleanly
+        os.remove(args.socket)
+    server = make_server(catalog, args.host, args.port, args.socket, args.quiet)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"👀 Serving previews on {where}; press Ctrl+C to stop")
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        server.server_close()
+        if args.socket and _is_socket(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
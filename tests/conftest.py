@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from labtools.synth import generate_catalog  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def catalog():
+    """A small synthetic ``(lab_instructions_ts, mock_data_ts)`` pair."""
+    return generate_catalog(12, seed=7)
+
+
+@pytest.fixture(scope='session')
+def lab(catalog):
+    return catalog[0]
+
+
+@pytest.fixture(scope='session')
+def mock(catalog):
+    return catalog[1]
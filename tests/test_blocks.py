@@ -0,0 +1,50 @@
+import re
+
+from labtools.blocks import BlockEditor, BlockIndex
+from labtools.rules import RuleSet
+
+SHELL = RuleSet([(r'Cloud Shell', 'PowerShell'), (r'Azure Portal', 'Server Manager')], re.IGNORECASE)
+
+
+def test_segments_join_to_the_text(lab):
+    index = BlockIndex(lab)
+    segments = index.segments()
+    assert ''.join(text for _, text in segments) == lab
+    assert [course_id for course_id, _ in segments if course_id is not None] == list(index)
+
+
+def test_apply_never_matches_across_an_edit(lab):
+    index = BlockIndex(lab)
+    pos = lab.index("Cloud Shell")
+    editor = BlockEditor(index)
+    # "Cloud" + the original " Shell" reads as a match only once rendered
+    editor.splice(pos, pos + len("Cloud"), "Cloud")
+    assert editor.render() == lab
+    editor.apply(SHELL)
+    end = pos + len("Cloud")
+    assert editor.render() == SHELL.sub(lab[:pos]) + "Cloud" + SHELL.sub(lab[end:])
+    assert editor.render() != SHELL.sub(lab)
+
+
+def test_apply_rewrites_gaps_and_replacements_separately(lab):
+    index = BlockIndex(lab)
+    editor = BlockEditor(index)
+    courses = list(index)
+    for course_id in courses[::3]:
+        block = index.block(course_id)
+        editor.replace_block(course_id, block.replace("Open", "Open the Azure Portal and open"))
+    pieces = list(editor.pieces())
+    counts = editor.apply(SHELL)
+    assert editor.render() == ''.join(SHELL.sub(piece) for piece in pieces)
+    assert sum(counts.values()) == sum(sum(SHELL.subn(piece)[1].values()) for piece in pieces)
+
+
+def test_apply_within_a_range_leaves_the_rest(lab):
+    index = BlockIndex(lab)
+    editor = BlockEditor(index)
+    course_id = next(c for c in index if re.search('Cloud Shell|Azure Portal', index.block(c), re.IGNORECASE))
+    start, end = index[course_id]
+    editor.apply(SHELL, start, end)
+    expected = lab[:start] + SHELL.sub(lab[start:end]) + lab[end:]
+    assert editor.render() == expected
+    assert editor.render() != lab
@@ -0,0 +1,149 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from labtools import clean
+from labtools.blocks import BlockIndex
+from labtools.cache import CleanCache
+from labtools.clean import clean_course_section, clean_segments, rules_digest
+from labtools.rules import Rule, RuleSet
+from labtools.scoped import RuleFile, Scope, ScopedRules
+from labtools.syntax import check_block
+from labtools.synth import write_catalog
+
+from conftest import ROOT
+
+MODES = [
+    ['--no-cache'],
+    ['--no-cache', '--stream'],
+    ['--no-cache', '--jobs', '2'],
+    # The first cached run fills the cache, --stream then reuses the
+    # cached segments and the last run the cached file
+    [],
+    ['--stream'],
+    [],
+]
+
+
+def _run(directory, script, *args):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, script), *args], cwd=directory,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+@pytest.fixture(scope='module')
+def catalog_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('catalog'))
+    write_catalog(directory, 12, seed=7)
+    _run(directory, 'analyze-lab-instructions.py')
+    return directory
+
+
+def _clean_all_modes(directory, modes):
+    output = os.path.join(directory, 'src', 'data', 'lab-instructions.ts')
+    results = {}
+    for mode in modes:
+        log = _run(directory, 'final-clean-labs.py', '--no-snapshot', *mode)
+        with open(output, encoding='utf-8') as f:
+            results.setdefault(f.read(), []).append((mode, log))
+    assert len(results) == 1, [[mode for mode, _ in runs] for runs in results.values()]
+    return next(iter(results.items()))
+
+
+def test_every_mode_writes_the_same_file(catalog_dir):
+    text, runs = _clean_all_modes(catalog_dir, MODES)
+    assert 'reused the cleaned file' in runs[-1][1]
+    original = os.path.join(catalog_dir, 'src', 'data', 'lab-instructions.ts.backup')
+    with open(original, encoding='utf-8') as f:
+        assert text != f.read()
+
+
+def test_objective_rules_keep_property_values(lab):
+    index = BlockIndex(lab, with_comments=False)
+    block = index.block('dp-1002t10-a')
+    cleaned = clean_course_section(block)
+    # Array elements go; the action of a step that mentions Azure Arc stays
+    assert "'Deploy the core services to Azure'" in block and "'Deploy the core services to Azure'" not in cleaned
+    assert "'Configure hybrid management with Azure Arc'" not in cleaned
+    assert "action: 'Onboard the server to Azure Arc'" in cleaned
+    for course_id in index:
+        assert check_block(course_id, clean_course_section(index.block(course_id))) == []
+
+
+STEP_CATALOG = """export const LAB_INSTRUCTIONS: Record<string, LabInstruction> = {
+    'az-1000t50-a': {
+        id: 'az-1000t50-a-lab-1',
+        courseId: 'az-1000t50-a',
+        title: 'Local accounts',
+        description: 'Manage local accounts.',
+        scenario: 'A new server.',
+        estimatedTime: 30,
+        difficulty: 'beginner',
+        objectives: ['Create a local administrator'],
+        prerequisites: ['RDP client'],
+        introduction: { overview: 'Local accounts.', scenario: 'A new server.' },
+        tasks: [
+            {
+                id: 'task-1',
+                order: 1,
+                title: 'Add an administrator',
+                description: 'Add a second administrator.',
+                instructions: [
+                    { step: 1, action: 'Create a local administrator account' },
+                    { step: 2, action: 'Restart the server' }
+                ],
+                verification: { type: 'manual', description: 'Sign in; no Azure subscription is needed' }
+            }
+        ],
+        summary: { whatYouLearned: ['Local accounts'], nextSteps: ['Domain accounts'] }
+    },
+};
+"""
+
+
+def test_step_removal_stays_inside_one_step(catalog_dir, tmp_path):
+    # "Create ... Azure" used to run from step 1 to the verification and drop
+    # the end of the instructions array
+    os.makedirs(tmp_path / 'src' / 'data')
+    shutil.copy(os.path.join(catalog_dir, 'lab-instructions-analysis.json'), tmp_path)
+    (tmp_path / 'input.ts').write_text(STEP_CATALOG, encoding='utf-8')
+    _run(str(tmp_path), 'fix-lab-instructions.py', '--input', 'input.ts')
+    output = (tmp_path / 'src' / 'data' / 'lab-instructions.ts').read_text(encoding='utf-8')
+    assert "{ step: 1, action: 'Create a local administrator account' }" in output
+
+
+def test_cached_segments_match_uncached(lab, tmp_path):
+    segments = BlockIndex(lab).segments()
+    items = [(text, n % 2 == 0, course_id) for n, (course_id, text) in enumerate(segments)]
+    with CleanCache(str(tmp_path / 'cache.sqlite')) as cache:
+        # Identical separators share one key
+        keys = len({cache.key(text, vm_only) for text, vm_only, _ in items})
+        cold = clean_segments(items, cache=cache)
+        warm = clean_segments(items, cache=cache)
+        assert (cache.hits, cache.misses) == (keys, keys)
+    assert cold == warm == clean_segments(items)
+
+
+def test_cache_misses_after_a_rule_change(lab, tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    segments = BlockIndex(lab).segments()
+    items = [(text, True, course_id) for course_id, text in segments]
+    with CleanCache(path) as cache:
+        keys = len({cache.key(text, vm_only) for text, vm_only, _ in items})
+        clean_segments(items, cache=cache)
+    with CleanCache(path) as cache:
+        clean_segments(items, cache=cache)
+        assert (cache.hits, cache.misses) == (keys, 0)
+
+    before = rules_digest()
+    extra = RuleFile('extra', 'extra.json', Scope(), RuleSet([Rule(r'Hyper-V', 'HyperV', name='hyper-v')]))
+    monkeypatch.setattr(clean, 'CLEAN_RULES', ScopedRules(list(clean.CLEAN_RULES.files) + [extra]))
+    assert rules_digest() != before
+    with CleanCache(path) as cache:
+        results = clean_segments(items, cache=cache)
+        assert (cache.hits, cache.misses) == (0, keys)
+    assert any(hits.get('hyper-v') for _, _, hits in results)
@@ -0,0 +1,50 @@
+import os
+import re
+
+from labtools.blocks import BlockIndex
+from labtools.keywords import DEFAULT_KEYWORDS_PATH, INDEX_KEYWORDS, KeywordIndex
+
+
+def test_counts_match_findall(lab):
+    index = KeywordIndex(lab)
+    assert index.counts() == {keyword: len(re.findall(keyword, lab, re.IGNORECASE)) for keyword in INDEX_KEYWORDS}
+    assert index.count('Azure Portal') and index.count('Create.*?Azure')
+
+
+def test_counts_per_course_match_findall_on_the_block(lab):
+    blocks = BlockIndex(lab, with_comments=False)
+    index = KeywordIndex(lab, block_index=blocks)
+    for keyword in INDEX_KEYWORDS:
+        expected = {course_id: len(re.findall(keyword, blocks.block(course_id), re.IGNORECASE)) for course_id in blocks}
+        assert index.by_course(keyword) == {course_id: n for course_id, n in expected.items() if n}
+
+
+def test_overlapping_and_adjacent_matches():
+    keywords = ['Azure Portal', 'Azure', 'Create.*?Azure', 'aa']
+    text = "export const LAB_INSTRUCTIONS = {};\n// Create in Azure Portal, create Azure, AZURE PORTAL. aaaa aaa\n"
+    index = KeywordIndex(text, keywords)
+    assert index.counts() == {keyword: len(re.findall(keyword, text, re.IGNORECASE)) for keyword in keywords}
+
+
+def test_locations_name_task_and_step(lab):
+    index = KeywordIndex(lab)
+    course_id, task_id, step, offset = index.locations('Cloud Shell')[0]
+    assert lab[offset:offset + len('Cloud Shell')].lower() == 'cloud shell'
+    assert course_id is not None and task_id is not None and step is not None
+
+
+def test_cache_lives_outside_the_source_tree(lab, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / 'src' / 'data' / 'lab-instructions.ts'
+    source.parent.mkdir(parents=True)
+    source.write_text(lab, encoding='utf-8')
+    index = KeywordIndex.cached(str(source))
+    assert os.listdir(source.parent) == ['lab-instructions.ts']
+    assert (tmp_path / DEFAULT_KEYWORDS_PATH).exists()
+    assert KeywordIndex.cached(str(source)).to_dict() == index.to_dict()
+
+    # One cache file serves one source file at a time
+    other = tmp_path / 'other.ts'
+    other.write_text(lab.replace('Azure Portal', 'the console'), encoding='utf-8')
+    assert KeywordIndex.cached(str(other)).count('Azure Portal') == 0
+    assert KeywordIndex.cached(str(source)).counts() == index.counts()
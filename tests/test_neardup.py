@@ -0,0 +1,50 @@
+import io
+import random
+
+from labtools.neardup import Unit, _shingles, find_near_duplicates, lab_units
+from labtools.synth import generate_catalog
+
+
+def _jaccard(a, b):
+    a, b = _shingles(a, 3), _shingles(b, 3)
+    return len(a & b) / len(a | b)
+
+
+def _tweak(text, rng):
+    words = text.split(' ')
+    for _ in range(rng.randint(0, 2)):
+        words[rng.randrange(len(words))] = rng.choice(['quickly', 'then', 'VM', 'server'])
+    return ' '.join(words)
+
+
+def test_cloned_tasks_are_found():
+    lab, _ = generate_catalog(60, seed=11)
+    units = list(lab_units(io.StringIO(lab)))
+    rng = random.Random(3)
+    clones = [Unit(unit.course_id + '-clone', unit.task_id, unit.title, _tweak(unit.text, rng)) for unit in units]
+    planted = [(unit, clone) for unit, clone in zip(units, clones) if _jaccard(unit.text, clone.text) >= 0.8]
+    assert len(planted) > 100
+
+    clusters, stats = find_near_duplicates(units + clones, threshold=0.8)
+    cluster_of = {unit.label: n for n, cluster in enumerate(clusters) for unit in cluster.units}
+    found = sum(1 for unit, clone in planted
+                if unit.label in cluster_of and cluster_of[unit.label] == cluster_of.get(clone.label))
+    assert found / len(planted) >= 0.95
+    # LSH keeps the exact comparisons near the number of duplicates
+    assert stats['candidates'] < 3 * len(units)
+    assert all(similarity >= 0.8 for cluster in clusters for _, _, similarity in cluster.pairs)
+
+
+def test_dissimilar_units_are_not_clustered():
+    rng = random.Random(5)
+    vocabulary = [f"word{n}" for n in range(500)]
+    units = [Unit(f"c{n}", None, None, ' '.join(rng.choice(vocabulary) for _ in range(80))) for n in range(200)]
+    clusters, stats = find_near_duplicates(units)
+    assert clusters == [] and stats['confirmed'] == 0
+
+
+def test_copies_in_one_bucket_are_compared_once_each():
+    units = [Unit(f"c{n}", None, None, "Open PowerShell and run the setup script on the server") for n in range(2000)]
+    clusters, stats = find_near_duplicates(units)
+    assert [len(cluster.units) for cluster in clusters] == [2000]
+    assert stats['candidates'] == stats['confirmed'] == 1999
@@ -0,0 +1,80 @@
+import pytest
+
+from labtools import pipeline
+from labtools.blocks import BlockIndex
+from labtools.pipeline import IncrementalPipeline, _splice_segments
+from labtools.synth import write_catalog
+
+
+def _edits(lab):
+    index = BlockIndex(lab)
+    courses = list(index)
+    first, second, last = index[courses[1]], index[courses[2]], index[courses[-1]]
+    step = lab.index("action: '", first[0]) + len("action: '")
+    block = index.block(courses[3])
+    return {
+        'one step': lab[:step] + 'Carefully ' + lab[step:],
+        'two courses': lab[:first[1] - 20] + lab[first[1] - 20:second[0] + 30].replace('e', 'E') + lab[second[0] + 30:],
+        'removed course': lab[:first[0]] + lab[second[0]:],
+        'added course': lab[:second[0]] + block.replace(courses[3], courses[3] + '-copy') + ',\n    '
+                        + lab[second[0]:],
+        'last course': lab[:last[1] - 2] + ' ' + lab[last[1] - 2:],
+    }
+
+
+@pytest.mark.parametrize('name', ['one step', 'two courses', 'removed course', 'added course', 'last course'])
+def test_spliced_segments_match_a_full_parse(lab, name):
+    new_text = _edits(lab)[name]
+    segments = _splice_segments(lab, BlockIndex(lab).segments(), new_text)
+    assert segments is not None
+    assert segments == BlockIndex(new_text).segments()
+
+
+def test_unchanged_text_reuses_the_segments(lab):
+    segments = BlockIndex(lab).segments()
+    assert _splice_segments(lab, segments, lab) is segments
+
+
+@pytest.mark.parametrize('edit', [
+    lambda lab: lab.replace('Synthetic', 'Generated', 1),
+    lambda lab: lab.replace("{\n        id:", "{\n        id: {", 1),
+])
+def test_header_edits_and_broken_blocks_need_a_full_parse(lab, edit):
+    assert _splice_segments(lab, BlockIndex(lab).segments(), edit(lab)) is None
+
+
+def test_duplicate_course_id_needs_a_full_parse(lab):
+    index = BlockIndex(lab)
+    courses = list(index)
+    start, end = index[courses[1]]
+    new_text = lab[:start] + index.block(courses[1]).replace(courses[1], courses[2]) + lab[end:]
+    assert _splice_segments(lab, index.segments(), new_text) is None
+
+
+def test_watch_run_cleans_only_changed_blocks(tmp_path, monkeypatch):
+    write_catalog(str(tmp_path), 12, seed=7)
+    lab_path = tmp_path / 'src' / 'data' / 'lab-instructions.ts'
+    mock_path = tmp_path / 'src' / 'lib' / 'mock-data.ts'
+    output_path = tmp_path / 'cleaned.ts'
+    cleaned = []
+    clean_segments = pipeline.clean_segments
+    monkeypatch.setattr(pipeline, 'clean_segments', lambda items, jobs, cache: (
+        cleaned.append([course_id for _, _, course_id in items]) or clean_segments(items, jobs, cache)))
+
+    watcher = IncrementalPipeline(str(lab_path), str(mock_path), str(output_path))
+    first = watcher.run()
+    assert first['written'] and None in cleaned[0] and len(cleaned[0]) > len(first['changed'])
+
+    lab = lab_path.read_text(encoding='utf-8')
+    course_id = first['changed'][1]
+    step = lab.index("action: '", BlockIndex(lab)[course_id][0]) + len("action: '")
+    lab_path.write_text(lab[:step] + 'Carefully ' + lab[step:], encoding='utf-8')
+    second = watcher.run()
+    assert second['changed'] == cleaned[1] == [course_id]
+
+    fresh = IncrementalPipeline(str(lab_path), str(mock_path), str(tmp_path / 'fresh.ts'))
+    fresh.run()
+    assert output_path.read_text(encoding='utf-8') == (tmp_path / 'fresh.ts').read_text(encoding='utf-8')
+
+    # Nothing changed: nothing is cleaned at all
+    assert watcher.run()['changed'] == [] and len(cleaned) == 3
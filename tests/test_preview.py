@@ -0,0 +1,49 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from labtools.preview import PreviewCatalog, make_server
+from labtools.synth import write_catalog
+
+
+@pytest.fixture
+def served(tmp_path):
+    write_catalog(str(tmp_path), 12, seed=7)
+    catalog = PreviewCatalog(str(tmp_path / 'src' / 'data' / 'lab-instructions.ts'),
+                             str(tmp_path / 'src' / 'lib' / 'mock-data.ts'))
+    server = make_server(catalog, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield catalog, get
+    server.shutdown()
+    server.server_close()
+
+
+def test_unknown_course_is_a_404(served):
+    catalog, get = served
+    course_id = catalog.courses()[0]['courseId']
+    assert get(f"/courses/{course_id}/preview")[0] == 200
+    assert get("/courses/no-such-course/preview") == (404, {'error': "Unknown course no-such-course"})
+
+
+def test_refresh_errors_are_a_500(served, monkeypatch):
+    catalog, get = served
+
+    def refresh():
+        raise KeyError('broken')
+
+    monkeypatch.setattr(catalog, 'refresh', refresh)
+    assert get("/status")[0] == 500
+    monkeypatch.undo()
+    assert get("/status")[0] == 200
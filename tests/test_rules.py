@@ -0,0 +1,75 @@
+import re
+
+from labtools.rules import Rule, RuleSet
+
+# No replacement can create or break a match of another rule, so applying
+# them one re.sub() at a time must give the same text as one scan
+DISJOINT = [
+    (r'Azure Portal', 'Server Manager'),
+    (r'portal\.azure\.com', 'the local console'),
+    (r'Cloud Shell', 'PowerShell'),
+    (r'resource group named \*\*(RG-\w+)\*\*', r'folder named **\1**'),
+]
+
+
+def test_single_scan_matches_sequential_sub(lab):
+    ruleset = RuleSet(DISJOINT, re.IGNORECASE)
+    expected = lab
+    expected_counts = {}
+    for pattern, replacement in DISJOINT:
+        expected, expected_counts[pattern] = re.subn(pattern, replacement, expected, flags=re.IGNORECASE)
+    result, counts = ruleset.subn(lab)
+    assert result == expected
+    assert counts == expected_counts
+    assert all(counts.values())
+
+
+def test_edits_splice_to_subn(lab):
+    ruleset = RuleSet(DISJOINT, re.IGNORECASE)
+    edits, counts = ruleset.edits(lab)
+    pieces = []
+    pos = 0
+    for start, end, replacement in edits:
+        pieces.append(lab[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(lab[pos:])
+    assert (''.join(pieces), counts) == ruleset.subn(lab)
+
+
+def test_priority_breaks_ties_at_one_offset():
+    text = "In Cloud Shell, run it. Cloud Shell again."
+    specific_first = RuleSet([(r'In Cloud Shell,?\s*', 'In PowerShell, '), (r'Cloud Shell', 'PowerShell')])
+    assert specific_first.sub(text) == "In PowerShell, run it. PowerShell again."
+    rules = [(r'Cloud Shell,?', 'PowerShell;'), (r'Cloud Shell', 'PowerShell')]
+    assert RuleSet([Rule(p, r, priority=n) for n, (p, r) in enumerate(rules)]).sub(text) == \
+        "In PowerShell; run it. PowerShell; again."
+    assert RuleSet([Rule(p, r, priority=1 - n) for n, (p, r) in enumerate(rules)]).sub(text) == \
+        "In PowerShell, run it. PowerShell again."
+
+
+def test_leftmost_match_wins_over_priority():
+    ruleset = RuleSet([(r'Portal', 'P'), (r'Azure', 'A')])
+    assert ruleset.sub("Azure Portal") == "A P"
+
+
+def test_replacements_are_not_rescanned():
+    ruleset = RuleSet([(r'a', 'b'), (r'b', 'c')])
+    assert ruleset.sub("ab") == "bc"
+    assert re.sub('b', 'c', re.sub('a', 'b', "ab")) == "cc"
+
+
+def test_group_references_are_per_rule():
+    ruleset = RuleSet([(r'(x)(y)', r'\2\1'), (r'(\w+)@(\w+)', r'\2 at \1')])
+    assert ruleset.subn("xy me@host") == ("yx host at me", {r'(x)(y)': 1, r'(\w+)@(\w+)': 1})
+
+
+def test_earlier_rule_wins_an_overlap():
+    rules = [(r'Azure Arc', 'local management'), (r'in Azure', 'on the VM')]
+    text = "Connect it in Azure Arc, then work in Azure."
+    expected = text
+    for pattern, replacement in rules:
+        expected = re.sub(pattern, replacement, expected)
+    assert RuleSet(rules).sub(text) == expected == "Connect it in local management, then work on the VM."
+    assert RuleSet(rules[::-1]).sub(text) == "Connect it on the VM Arc, then work on the VM."
+    assert RuleSet(rules).count(text) == {'Azure Arc': 1, 'in Azure': 1}
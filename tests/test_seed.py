@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from labtools import seed
+from labtools.courses import CourseCatalog
+from labtools.seed import STATE_NAME, export_seed
+from labtools.synth import write_catalog
+
+# src/models/Lab.ts, plus the _id the export sets
+LAB_FIELDS = {'_id', 'id', 'title', 'code', 'description', 'topic', 'provider', 'price', 'duration', 'difficulty',
+              'objectives', 'prerequisites'}
+
+
+@pytest.fixture
+def catalog_dir(tmp_path):
+    write_catalog(str(tmp_path), 12, seed=7)
+    return tmp_path
+
+
+def _export(root, **kwargs):
+    catalog = CourseCatalog((root / 'src' / 'lib' / 'mock-data.ts').read_text(encoding='utf-8'))
+    return export_seed(str(root / 'src' / 'data' / 'lab-instructions.ts'), str(root / 'seed'), catalog, **kwargs)
+
+
+def test_documents_have_only_lab_model_fields(catalog_dir):
+    result = _export(catalog_dir, batch_size=5)
+    assert len(result['files']) == 3 and sorted(os.listdir(catalog_dir / 'seed')) == [
+        'batch-00001.ndjson', 'batch-00002.ndjson', 'batch-00003.ndjson', STATE_NAME]
+    for path in result['files']:
+        with open(path, encoding='utf-8') as f:
+            assert all(set(json.loads(line)) <= LAB_FIELDS for line in f)
+
+
+def test_failed_export_keeps_the_previous_load(catalog_dir, monkeypatch):
+    first = _export(catalog_dir, batch_size=5)
+    before = {name: (catalog_dir / 'seed' / name).read_bytes() for name in os.listdir(catalog_dir / 'seed')}
+
+    def broken(course_id, lab, course=None):
+        if course_id == first['exported'][7]:
+            raise ValueError(course_id)
+        return lab_document(course_id, lab, course)
+
+    lab_document = seed.lab_document
+    monkeypatch.setattr(seed, 'lab_document', broken)
+    with pytest.raises(ValueError):
+        _export(catalog_dir, batch_size=2)
+    after = {name: (catalog_dir / 'seed' / name).read_bytes() for name in os.listdir(catalog_dir / 'seed')}
+    assert after == before
+
+    monkeypatch.setattr(seed, 'lab_document', lab_document)
+    assert len(_export(catalog_dir, batch_size=20)['files']) == 1
+    assert sorted(os.listdir(catalog_dir / 'seed')) == ['batch-00001.ndjson', STATE_NAME]
@@ -0,0 +1,92 @@
+import pytest
+
+from labtools.blocks import BlockIndex
+from labtools.snapshots import ORIGINAL_LABEL, SnapshotStore, read_original
+
+
+def _edit(lab, course_ids):
+    index = BlockIndex(lab)
+    text = lab
+    for course_id in reversed(sorted(course_ids, key=lambda c: index[c][0])):
+        start, end = index[course_id]
+        text = text[:start] + index.block(course_id).replace("Open", "Launch") + text[end:]
+    return text
+
+
+@pytest.fixture
+def store(tmp_path):
+    with SnapshotStore(str(tmp_path / 'snapshots.sqlite')) as store:
+        yield store
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_restore_round_trip(lab, tmp_path, codec):
+    courses = list(BlockIndex(lab))
+    edited = _edit(lab, courses[1::4])
+    assert edited != lab
+    with SnapshotStore(str(tmp_path / 'snapshots.sqlite'), codec) as store:
+        before = store.snapshot(lab, ORIGINAL_LABEL)
+        after = store.snapshot(edited, 'edited')
+        assert (after.added, after.changed, after.removed) == (0, len(courses[1::4]), 0)
+        assert store.diff(before.id, after.id)['changed'] == courses[1::4]
+        assert store.text(before.id) == lab and store.text(-1) == edited
+
+        restored, segments = store.restore(before.id, edited, courses[1::4])
+        assert restored == lab
+        assert segments == BlockIndex(lab).segments()
+        partial, _ = store.restore(before.id, edited, courses[1:2])
+        assert partial == _edit(lab, courses[5::4])
+
+
+def test_unchanged_blocks_are_stored_once(lab, store):
+    courses = list(BlockIndex(lab))
+    store.snapshot(lab, ORIGINAL_LABEL)
+    first = store.stats()
+    after = store.snapshot(_edit(lab, courses[:1]), 'edited')
+    assert store.stats()['blobs'] == first['blobs'] + 1
+    assert after.stored < first['stored_bytes'] / len(courses)
+    again = store.snapshot(lab, 'back')
+    assert again.stored == 0 and store.segments(again.id) == store.segments(1)
+
+
+def test_stream_reads_the_same_text(lab, store):
+    snapshot = store.snapshot(lab, ORIGINAL_LABEL)
+    stream = store.open(snapshot.id)
+    pieces = []
+    while True:
+        piece = stream.read(1000)
+        if not piece:
+            break
+        pieces.append(piece)
+    assert ''.join(pieces) == store.text(snapshot.id) == lab
+
+
+def test_original_is_the_newest_before_snapshot(lab, store):
+    with pytest.raises(KeyError):
+        store.original()
+    edited = _edit(lab, list(BlockIndex(lab))[:2])
+    store.snapshot(edited, ORIGINAL_LABEL)
+    newest = store.snapshot(lab, ORIGINAL_LABEL)
+    store.snapshot(edited, 'update-lab-instructions: after')
+    assert store.original().id == newest.id
+    snapshot, text = read_original(store.path)
+    assert (snapshot.id, text) == (newest.id, lab)
+    assert read_original(store.path, ref=1)[1] == edited
+
+
+def test_read_original_without_a_store_or_backup(tmp_path):
+    with pytest.raises(KeyError, match='No snapshot store'):
+        read_original(str(tmp_path / 'missing.sqlite'), backup=str(tmp_path / 'missing.ts.backup'))
+
+
+def test_backup_starts_a_missing_store(lab, tmp_path):
+    backup = tmp_path / 'lab-instructions.ts.backup'
+    backup.write_text(lab, encoding='utf-8')
+    path = str(tmp_path / 'snapshots.sqlite')
+    with pytest.raises(KeyError, match='No snapshot store'):
+        read_original(path, ref=1, backup=str(backup))
+    snapshot, text = read_original(path, backup=str(backup))
+    assert (snapshot.label, text) == (ORIGINAL_LABEL, lab)
+    # Recorded once; later runs read the same generation
+    backup.write_text(lab.replace('Open', 'Launch'), encoding='utf-8')
+    assert read_original(path, backup=str(backup))[0].id == snapshot.id
@@ -0,0 +1,33 @@
+import pytest
+
+from labtools.blocks import BlockEditor, BlockIndex
+from labtools.syntax import verify_or_exit
+
+
+def _edit(lab, old, new):
+    index = BlockIndex(lab)
+    editor = BlockEditor(index)
+    course_id = list(index)[1]
+    start, end = index[course_id]
+    pos = lab.index(old, start, end)
+    editor.splice(pos, pos + len(old), new)
+    return index.segments(), editor.edits(), editor.render()
+
+
+def test_clean_edit_passes(lab, capsys):
+    assert verify_or_exit(*_edit(lab, "action: '", "action: 'Now ")) == []
+    assert 'passed' in capsys.readouterr().out
+
+
+def test_broken_edit_exits_before_writing(lab, capsys):
+    segments, edits, output = _edit(lab, "action: '", "action: ")
+    with pytest.raises(SystemExit) as e:
+        verify_or_exit(segments, edits, output)
+    assert e.value.code == 1
+    assert 'nothing written' in capsys.readouterr().out
+
+
+def test_no_verify_only_warns(lab, capsys):
+    problems = verify_or_exit(*_edit(lab, "title: '", "titel: '"), no_verify=True)
+    assert problems and all(problem.course_id == list(BlockIndex(lab))[1] for problem in problems)
+    assert 'writing anyway' in capsys.readouterr().out
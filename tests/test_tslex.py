@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+from labtools.blocks import BlockIndex
+from labtools.catalog import (
+    cloud_slice_course_ids,
+    course_entries,
+    course_ids,
+    parse_lab_instructions,
+    parse_mock_courses,
+)
+from labtools.tslex import TSSyntaxError, parse_value, tokenize
+
+
+def test_course_ids_match_baseline_regex(lab):
+    parsed = [course_id for course_id, _ in course_entries(parse_lab_instructions(lab))]
+    assert parsed == re.findall(r"courseId:\s*'([^']+)'", lab)
+
+
+def test_mock_courses_match_baseline_regexes(mock):
+    courses = parse_mock_courses(mock)
+    assert course_ids(courses) == re.findall(r"id:\s*'([^']+)'", mock)
+    baseline = re.findall(r"id:\s*'([^']+)'[^}]*requiresAzurePortal:\s*true", mock, re.DOTALL)
+    assert baseline
+    assert cloud_slice_course_ids(courses) == baseline
+
+
+def test_block_spans_start_at_the_course_key(lab):
+    index = BlockIndex(lab, with_comments=False)
+    for course_id in index:
+        block = index.block(course_id)
+        assert re.match(rf"'{re.escape(course_id)}':\s*\{{", block)
+        assert block.endswith('}')
+
+
+def test_tokens_cover_the_source(lab):
+    pos = 0
+    for _, start, end in tokenize(lab):
+        assert start == pos
+        pos = end
+    assert pos == len(lab)
+
+
+def test_string_values_are_unescaped():
+    node = parse_value(r"""{a: 'it\'s', b: "tab\there", c: `x${1}y`, d: 4.5}""")
+    assert node.to_python() == {'a': "it's", 'b': 'tab\there', 'c': 'x${1}y', 'd': 4.5}
+
+
+@pytest.mark.parametrize('source', [
+    "{a: b ? c : d, e: 1}",
+    "{a: x ? y ? 1 : 2 : 3}",
+    "{a: f(x: 1), b: {c: 1} as const}",
+])
+def test_expressions_with_colons_still_parse(source):
+    assert [prop.value.kind for prop in parse_value(source).children][0] == 'expr'
+
+
+@pytest.mark.parametrize('source', [
+    "{a: ident: 'x'}",
+    "{a:\n b: 'x'}",
+    "{a: foo\n b: 'x'}",
+])
+def test_expression_running_into_next_property_is_rejected(source):
+    with pytest.raises(TSSyntaxError, match="Unexpected ':'"):
+        parse_value(source)
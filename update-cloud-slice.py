@@ -1,30 +1,66 @@
-import re
-
-# Read the file
-with open('src/lib/mock-data.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Find all course objects with "[Cloud Slice Provided]" that don't have requiresAzurePortal
-# Pattern to match course objects
-pattern = r'(\{[^}]*title:\s*[\'"].*?\[Cloud Slice Provided\].*?[\'"][^}]*)(level:\s*[\'"](?:Beginner|Intermediate|Advanced)[\'"],?\s*)(\})'
-
-def add_requires_azure_portal(match):
-    before = match.group(1)
-    level = match.group(2)
-    after = match.group(3)
-    
-    # Check if requiresAzurePortal already exists
-    if 'requiresAzurePortal' in before:
-        return match.group(0)  # Don't modify if already exists
-    
-    # Add requiresAzurePortal: true after level
-    return f"{before}{level}\n        requiresAzurePortal: true,\n    {after}"
-
-# Apply the replacement
-updated_content = re.sub(pattern, add_requires_azure_portal, content, flags=re.DOTALL)
-
-# Write back
-with open('src/lib/mock-data.ts', 'w', encoding='utf-8') as f:
-    f.write(updated_content)
-
-print("Updated Cloud Slice courses with requiresAzurePortal flag")
+"""
+Add ``requiresAzurePortal: true`` to every course titled "[Cloud Slice Provided]"
+that does not have the flag yet.
+
+    python update-cloud-slice.py                       # this repository
+    python update-cloud-slice.py 'tenants/*' other/    # many catalog directories in one run
+"""
+
+import argparse
+
+from labtools import MOCK_DATA_PATH
+from labtools.batch import catalog_dirs, run_batch
+from labtools.courses import CourseCatalog
+
+
+def flag_cloud_slice(root, texts):
+    # Load MOCK_COURSES into the indexed catalog
+    catalog = CourseCatalog(texts[MOCK_DATA_PATH])
+
+    # Courses titled "[Cloud Slice Provided]" that don't have requiresAzurePortal yet
+    unflagged = catalog.query(requires_azure_portal=None)
+    missing = [
+        course.id for course in catalog
+        if course.id in unflagged and '[Cloud Slice Provided]' in (course.title or '')
+    ]
+
+    # Add requiresAzurePortal: true to all of them in one pass
+    flagged = catalog.set_flag(missing, True)
+    return {MOCK_DATA_PATH: catalog.text}, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag Cloud Slice courses with requiresAzurePortal")
+    parser.add_argument('catalogs', nargs='*', metavar='DIR',
+                        help="catalog directories or globs to update (default: the current directory)")
+    parser.add_argument('--threads', type=int, default=8, metavar='N',
+                        help="read and write files on N threads (default: 8)")
+    args = parser.parse_args()
+    try:
+        roots = catalog_dirs(args.catalogs or ['.'])
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = run_batch(roots, [MOCK_DATA_PATH], flag_cloud_slice, args.threads)
+    failed = 0
+    for result in results:
+        label = f"{result.root}: " if args.catalogs else ''
+        if result.error is not None:
+            failed += 1
+            print(f"{label}❌ {result.error}")
+            continue
+        for course_id in result.summary:
+            print(f"  + {course_id}")
+        # Only changed files are written, so an up-to-date file keeps its mtime
+        if result.written:
+            print(f"{label}Updated {len(result.summary)} Cloud Slice courses with requiresAzurePortal flag")
+        else:
+            print(f"{label}Cloud Slice courses already have the requiresAzurePortal flag; mock-data.ts not rewritten")
+    if len(results) > 1:
+        flagged = sum(len(result.summary) for result in results if result.error is None)
+        print(f"\n📊 {len(results) - failed}/{len(results)} catalogs processed, {flagged} courses flagged")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,46 @@
 """
 Script to remove Azure Portal and resource creation tasks from non-Cloud Slice courses.
 Updates lab instructions to be VM-only for courses without requiresAzurePortal flag.
+
+The Azure Portal action rewrites are the rule files in
+lab-rules/update-lab-instructions/; each applies only to the courses in its scope.
+
+Use --profile PATH to write per-rule regex timings and match counts as JSON.
+
+The file is snapshotted before and after the update (--no-snapshot to skip), so
+any earlier generation of a course stays restorable with lab-snapshots.py. The
+"before" snapshot is the original the clean scripts (final-clean-labs.py,
+fix-lab-instructions.py, safe-clean-labs.py) start from. --backup also writes
+the original to src/data/lab-instructions.ts.backup, for tools that still read
+that file.
+
+The course blocks the run changed are re-parsed and checked against the
+LabInstruction shape before anything is written; a run that would leave broken
+TypeScript reports what it broke and writes nothing (--no-verify writes it anyway).
 """
 
-import re
 import json
+import argparse
+
+from labtools import LAB_INSTRUCTIONS_BACKUP_PATH, BlockIndex, BlockEditor, profile
+from labtools.fileio import read_text, write_text
+from labtools.scoped import ScopedRules
+from labtools.syntax import verify_or_exit
+from labtools.snapshots import DEFAULT_SNAPSHOT_PATH, ORIGINAL_LABEL, SnapshotStore
+
+parser = argparse.ArgumentParser(description="Mark non-Cloud Slice courses as VM-only labs")
+parser.add_argument('--profile', metavar='PATH', help="write a per-rule regex profile to PATH (JSON)")
+parser.add_argument('--no-verify', action='store_true',
+                    help="write the output even if the syntax check of the changed blocks fails")
+parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, metavar='PATH',
+                    help=f"snapshot store (default: {DEFAULT_SNAPSHOT_PATH})")
+parser.add_argument('--no-snapshot', action='store_true',
+                    help="take no snapshots of the file (the clean scripts then start from an older original)")
+parser.add_argument('--backup', action='store_true',
+                    help="also write the original to src/data/lab-instructions.ts.backup")
+args = parser.parse_args()
+
+profiler = profile.Profiler().start() if args.profile else None
 
 # Load analysis report
 with open('lab-instructions-analysis.json', 'r') as f:
@@ -16,39 +52,11 @@ print(f"Updating {len(non_cloud_courses)} non-Cloud Slice courses...")
 print("Courses to update:", sorted(non_cloud_courses)[:10], "...")
 
 # Read lab instructions
-with open('src/data/lab-instructions.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Backup original file
-with open('src/data/lab-instructions.ts.backup', 'w', encoding='utf-8') as f:
-    f.write(content)
-print("✅ Backup created: lab-instructions.ts.backup")
+content = read_text('src/data/lab-instructions.ts')
 
 # Strategy: For each non-Cloud Slice course, update instructions to remove Azure Portal tasks
 # We'll do this by finding each course block and modifying it
 
-# Azure-specific terms to remove/replace
-azure_replacements = [
-    # Remove Azure Portal references
-    (r'Open the Azure Portal.*?(?=\n)', 'Open the VM using RDP (credentials in Resources tab)'),
-    (r'In the Azure Portal,?\s*', ''),
-    (r'portal\.azure\.com', ''),
-    
-    # Remove Cloud Shell references
-    (r'Cloud Shell.*?(?=\n)', 'PowerShell on the VM'),
-    (r'click the.*?Cloud Shell.*?icon.*?(?=\n)', 'open PowerShell'),
-    
-    # Remove resource creation
-    (r'Create.*?resource group.*?(?=\n)', 'Use the pre-configured VM environment'),
-    (r'Create.*?App Service.*?(?=\n)', 'Use the local IIS server'),
-    (r'Create.*?Virtual Network.*?(?=\n)', 'Use the VM network configuration'),
-    (r'Create.*?Storage Account.*?(?=\n)', 'Use local storage'),
-    
-    # Replace Azure-specific actions with VM-based alternatives
-    (r'Navigate to.*?Azure.*?(?=\n)', 'Open Server Manager or relevant tool'),
-    (r'Search for.*?in the Azure Portal', 'Open the application from Start menu'),
-]
-
 # For non-Cloud Slice courses, we need to be more surgical
 # Let's create a note that explains the environment
 
@@ -62,42 +70,25 @@ vm_environment_note = """
                 ],
 """
 
-# Function to clean Azure references from a course block
-def clean_course_block(course_id, course_block):
-    """Remove Azure Portal references from a course block"""
-    
-    # Remove Azure Portal specific instructions
-    cleaned = course_block
-    
-    # Replace Azure Portal references
-    for pattern, replacement in azure_replacements:
-        cleaned = re.sub(pattern, replacement, cleaned, flags=re.IGNORECASE)
-    
-    # Remove Azure-specific knowledge blocks
-    cleaned = re.sub(
-        r'\{\s*type:\s*[\'"](?:note|tip|warning)[\'"],\s*title:\s*[\'"].*?Azure Portal.*?[\'"],[^}]*\}',
-        '',
-        cleaned,
-        flags=re.DOTALL | re.IGNORECASE
-    )
-    
-    return cleaned
-
 # Process the file
 # Find all course blocks and update non-Cloud Slice ones
 course_pattern = r"'([a-z0-9-]+)':\s*\{([^}]*courseId:\s*'\1'[^}]*)\}"
 
-updated_content = content
 changes_made = 0
 
 # For now, let's add a simpler approach: add a comment to non-Cloud Slice courses
-for course_id in non_cloud_courses:
-    # Find the course block
-    pattern = f"'{course_id}':\\s*{{\\s*id:"
-    if re.search(pattern, updated_content):
+index = BlockIndex(content)
+editor = BlockEditor(index)
+for course_id in index:
+    if course_id not in non_cloud_courses:
+        continue
+    prop = index.props[course_id]
+    # Only courses whose object starts with `id:` and has no marker yet
+    first = prop.value.children[0] if prop.value.kind == 'object' and prop.value.children else None
+    if first is not None and first.key == 'id' and first.doc_start == first.start:
         # Add a comment indicating this is VM-only
-        replacement = f"'{course_id}': {{\n        // VM-ONLY LAB: No Azure Portal access required\n        id:"
-        updated_content = re.sub(pattern, replacement, updated_content)
+        replacement = f"'{prop.key}': {{\n        // VM-ONLY LAB: No Azure Portal access required\n        "
+        editor.splice(prop.start, first.start, replacement)
         changes_made += 1
 
 print(f"\n✅ Added VM-only markers to {changes_made} courses")
@@ -105,34 +96,55 @@ print(f"\n✅ Added VM-only markers to {changes_made} courses")
 # Also, let's create a comprehensive note about removing specific Azure tasks
 # We'll do a more targeted replacement for common Azure Portal patterns
 
-azure_portal_patterns = [
-    (r'action:\s*[\'"]Open the Azure Portal[^\'\"]*[\'"]', 
-     'action: "Connect to the VM using RDP (credentials in Resources tab)"'),
-    
-    (r'action:\s*[\'"].*?navigate to.*?Azure Portal.*?[\'"]',
-     'action: "Open Server Manager or the relevant Windows administrative tool"'),
-    
-    (r'action:\s*[\'"].*?Cloud Shell.*?[\'"]',
-     'action: "Open PowerShell on the VM"'),
-    
-    (r'action:\s*[\'"]Create a resource group[^\'\"]*[\'"]',
-     'action: "Use the pre-configured VM environment"'),
-]
-
-for pattern, replacement in azure_portal_patterns:
-    count = len(re.findall(pattern, updated_content, re.IGNORECASE))
+# Applied only to the VM-only courses (lab-rules/update-lab-instructions/)
+azure_portal_patterns = ScopedRules.load('update-lab-instructions')
+
+# Recorded as more edits on the original text
+hit_counts = azure_portal_patterns.apply(editor, non_cloud_courses)
+for count in hit_counts.values():
     if count > 0:
-        updated_content = re.sub(pattern, replacement, updated_content, flags=re.IGNORECASE)
         print(f"  Replaced {count} occurrences of Azure Portal action")
 
-# Write updated content
-with open('src/data/lab-instructions.ts', 'w', encoding='utf-8') as f:
-    f.write(updated_content)
+# Rendered once: the same text is written and snapshotted
+updated_content = editor.render()
+
+# Check the changed blocks before anything is written
+verify_or_exit(index.segments(), editor.edits(), updated_content, args.no_verify)
+
+if args.backup:
+    write_text(LAB_INSTRUCTIONS_BACKUP_PATH, content)
+    print(f"✅ Backup created: {LAB_INSTRUCTIONS_BACKUP_PATH}")
+
+# Snapshot the original generation, then the update; only changed course
+# blocks are stored
+store = None if args.no_snapshot else SnapshotStore(args.snapshots)
+try:
+    if store is not None:
+        original = store.snapshot(content, ORIGINAL_LABEL)
+        print(f"📸 Snapshot #{original.id} taken ({original.stored:,} bytes stored)")
+
+    # Write updated content
+    if not write_text('src/data/lab-instructions.ts', updated_content):
+        print("✅ File already up to date, not rewritten")
+    if store is not None:
+        snapshot = store.snapshot(updated_content, 'update-lab-instructions')
+        print(f"📸 Snapshot #{snapshot.id} taken: {snapshot.changed} courses changed ({snapshot.stored:,} bytes stored)")
+finally:
+    if store is not None:
+        store.close()
 
 print("\n" + "="*60)
 print("✅ UPDATE COMPLETE!")
 print("="*60)
 print(f"✅ Updated {changes_made} non-Cloud Slice courses")
 print(f"✅ Removed Azure Portal references")
-print(f"✅ Original file backed up to: lab-instructions.ts.backup")
+if store is not None:
+    print(f"✅ Original kept as snapshot #{original.id}; the clean scripts start from it")
+if args.backup:
+    print(f"✅ Original file backed up to: {LAB_INSTRUCTIONS_BACKUP_PATH}")
 print("\nNon-Cloud Slice courses now have VM-only instructions!")
+
+if profiler is not None:
+    profiler.stop()
+    profiler.dump(args.profile)
+    print(f"📈 Rule profile saved to {args.profile}")